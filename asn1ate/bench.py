@@ -0,0 +1,817 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import print_function  # Python 2 compatibility
+
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+import pickle
+import subprocess
+import argparse  # Requires Python 2.7 or later, but that's OK for a benchmark driver
+import pyparsing
+from asn1ate import parser, sema, pyasn1gen, berdecgen, derencgen, upergen, columngen, viewgen, recordgen, codecgen
+from asn1ate.support import pygen
+from asn1ate.benchworker import sample_value  # For callers that built sample values with asn1ate.bench
+
+try:
+    # Python 2
+    from cStringIO import StringIO
+except ImportError:
+    # Python 3
+    from io import StringIO
+
+
+def nested_spec(depth, width):
+    """ Build a synthetic ASN.1 module with a SEQUENCE nested ``depth`` levels
+    deep, with ``width`` simple components next to the nested one on every
+    level. Alternate levels are CHOICEs, and every other nested component is
+    tagged, to exercise the tagged and constructed inline generators.
+    """
+    def nested_type(level):
+        kind = 'CHOICE' if level % 2 else 'SEQUENCE'
+        components = ['f%d-%d INTEGER (0..%d)' % (level, i, i + 1) for i in range(width)]
+        if level < depth:
+            tag = '[%d] ' % width if level % 2 == 0 else ''
+            components.append('n%d %s%s' % (level, tag, nested_type(level + 1)))
+
+        return '%s {\n%s\n}' % (kind, ',\n'.join(components))
+
+    lines = ['Bench DEFINITIONS AUTOMATIC TAGS ::= BEGIN',
+             'Nested ::= %s' % nested_type(1),
+             'END']
+    return '\n'.join(lines)
+
+
+def _time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def bench_nested(args):
+    print('%8s %10s %10s %10s %10s' % ('depth', 'parse', 'sema', 'codegen', 'lines'))
+    for depth in args.depth or [25, 50, 100, 200]:
+        asn1def = nested_spec(depth, args.width)
+        parse_tree = parser.parse_asn1(asn1def)
+        modules = sema.build_semantic_model(parse_tree)
+
+        def generate():
+            out = StringIO()
+            pyasn1gen.generate_pyasn1(modules[0], out, modules)
+            return out.getvalue()
+
+        parse_time = _time(lambda: parser.parse_asn1(asn1def), args.repeat)
+        sema_time = _time(lambda: sema.build_semantic_model(parse_tree), args.repeat)
+        codegen_time = _time(generate, args.repeat)
+
+        print('%8d %9.3fs %9.3fs %9.3fs %10d' % (depth, parse_time, sema_time, codegen_time,
+                                                 generate().count('\n')))
+
+
+
+def _worker_env(**variables):
+    # Workers need to import asn1ate.benchworker and the BER runtime from
+    # this package.
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        [p for p in [os.environ.get('PYTHONPATH')] if p]), **variables)
+
+
+def _run_worker(cwd, env, worker, *args):
+    """ Run ``worker`` of asn1ate.benchworker with ``args`` in a fresh
+    interpreter in ``cwd``, and return the fields of its output. If it
+    fails, prints the end of its error output to stderr and raises
+    CalledProcessError.
+    """
+    command = [sys.executable, '-m', 'asn1ate.benchworker', worker] + [str(arg) for arg in args]
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    if process.returncode:
+        print('%s failed in %s:' % (worker, cwd), file=sys.stderr)
+        for line in errors.decode(errors='replace').splitlines()[-_ERROR_LINES:]:
+            print('    ' + line, file=sys.stderr)
+        raise subprocess.CalledProcessError(process.returncode, command, output)
+
+    return output.decode().split()
+
+
+# Lines of the error output of failed workers to print, enough for the
+# end of a traceback.
+_ERROR_LINES = 5
+
+
+def _repeat_worker(repeat, cwd, env, worker, *args):
+    """ Run ``worker`` like ``_run_worker`` ``repeat`` times, and return the
+    fields of every run.
+    """
+    return [_run_worker(cwd, env, worker, *args) for _ in range(repeat)]
+
+
+def _read_modules(path):
+    with open(path) as f:
+        asn1def = f.read()
+
+    return sema.build_semantic_model(parser.parse_asn1(asn1def))
+
+
+_IMPORT_MODES = [
+    ('eager', {}),
+    ('hoist', {'hoist': True}),
+    ('lazy', {'lazy': True}),
+    ('lazy+hoist', {'lazy': True, 'hoist': True}),
+    ('package', None),
+]
+
+
+def bench_import(args):
+    modules = _read_modules(args.import_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        print('%-40s %-10s %10s %10s %10s %10s' % ('module', 'mode', 'size', 'import', 'access', 'rss'))
+        for mode, options in _IMPORT_MODES:
+            mode_dir = os.path.join(outdir, mode)
+            os.mkdir(mode_dir)
+            for module in modules:
+                module_name = pyasn1gen._sanitize_module(module.name)
+                if options is None:
+                    pyasn1gen.generate_pyasn1_package(module, os.path.join(mode_dir, module_name), modules)
+                    continue
+
+                with open(os.path.join(mode_dir, module_name + '.py'), 'w') as f:
+                    pyasn1gen.generate_pyasn1(module, f, modules, **options)
+
+            for module in modules:
+                module_name = pyasn1gen._sanitize_module(module.name)
+                if options is None:
+                    package_dir = os.path.join(mode_dir, module_name)
+                    size = sum(os.path.getsize(os.path.join(package_dir, f)) for f in os.listdir(package_dir))
+                else:
+                    size = os.path.getsize(os.path.join(mode_dir, module_name + '.py'))
+
+                # Access a few types after import, like a worker using a
+                # handful of types would. Take them in dependency order, so
+                # they don't pull in most of the module.
+                names = [pyasn1gen._translate_type(a.type_name)
+                         for component in sema.dependency_sort(module.assignments) for a in component
+                         if isinstance(a, sema.TypeAssignment)][:args.access]
+
+                try:
+                    runs = _repeat_worker(args.repeat, mode_dir, env, 'time_import', module_name, *names)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %9dB %10s' % (module.name, mode, size, 'failed'))
+                    continue
+
+                import_time, access_time, rss = min((float(i), float(a), int(r)) for i, a, r in runs)
+                print('%-40s %-10s %9dB %8.1fms %8.1fms %8dkB' % (module.name, mode, size, import_time * 1000,
+                                                                    access_time * 1000, rss))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def bench_cold_import(args):
+    modules = _read_modules(args.cold_import_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    try:
+        # Source files, the same files byte-compiled ahead of time, and a zip
+        # bundle with bytecode.
+        source_dir = os.path.join(outdir, 'source')
+        compiled_dir = os.path.join(outdir, 'compiled')
+        zip_path = os.path.join(outdir, 'bundle.zip')
+        os.mkdir(source_dir)
+        paths = []
+        for module in modules:
+            path = os.path.join(source_dir, pyasn1gen._sanitize_module(module.name) + '.py')
+            with open(path, 'w') as f:
+                pyasn1gen.generate_pyasn1(module, f, modules)
+            paths.append(path)
+
+        shutil.copytree(source_dir, compiled_dir)
+        for path in paths:
+            pygen.compile_file(os.path.join(compiled_dir, os.path.basename(path)))
+        pygen.write_zip_bundle(zip_path, source_dir, paths)
+
+        # Keep Python from caching bytecode, so every source import is cold.
+        env = _worker_env(PYTHONDONTWRITEBYTECODE='1')
+
+        print('%-40s %-10s %10s' % ('module', 'layout', 'import'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+            for layout, path in (('source', source_dir), ('compiled', compiled_dir), ('zip', zip_path)):
+                try:
+                    runs = _repeat_worker(args.repeat, outdir, env, 'time_cold_import', path, module_name)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %10s' % (module.name, layout, 'failed'))
+                    continue
+
+                print('%-40s %-10s %8.1fms' % (module.name, layout, min(float(t) for t, in runs) * 1000))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def _generate_modes(outdir, modes, modules):
+    for mode, generate, _ in modes:
+        mode_dir = os.path.join(outdir, mode)
+        os.mkdir(mode_dir)
+        for module in modules:
+            with open(os.path.join(mode_dir, pyasn1gen._sanitize_module(module.name) + '.py'), 'w') as f:
+                generate(module, f, modules)
+
+
+def _generate_pyasn1(module, f, modules):
+    pyasn1gen.generate_pyasn1(module, f, modules)
+
+
+def _write_samples(outdir, codec, module, messages_path):
+    """ Write sample messages of every type in ``module``, encoded with the
+    pyasn1 ``codec``, to ``messages_path``. Returns False if that fails.
+    """
+    module_name = pyasn1gen._sanitize_module(module.name)
+    names = [pyasn1gen._translate_type(a.type_name) for a in module.assignments
+             if isinstance(a, sema.TypeAssignment)]
+    try:
+        _run_worker(outdir, _worker_env(), 'write_samples', codec, messages_path, module_name, *names)
+    except subprocess.CalledProcessError:
+        return False
+
+    return True
+
+
+_DECODE_MODES = [
+    ('instances', _generate_pyasn1, 'time_pyasn1_decode'),
+    ('classes', lambda module, f, modules: pyasn1gen.generate_pyasn1(module, f, modules, named_classes=True),
+     'time_pyasn1_decode'),
+    ('berdec', berdecgen.generate_berdec, 'time_berdec'),
+]
+
+
+def bench_decode(args):
+    modules = _read_modules(args.decode_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, _DECODE_MODES, modules)
+
+        print('%-40s %-10s %10s %12s %12s' % ('module', 'mode', 'messages', 'decode', 'messages/s'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+
+            # Every mode decodes the same messages, encoded by pyasn1.
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(os.path.join(outdir, _DECODE_MODES[0][0]), 'ber', module, messages_path):
+                print('%-40s %-10s %10s' % (module.name, '', 'failed'))
+                continue
+
+            for mode, _, worker in _DECODE_MODES:
+                try:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, mode), env, worker, args.iterations,
+                                          messages_path, module_name)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %10s' % (module.name, mode, 'failed'))
+                    continue
+
+                decode_time, count = min((float(t), int(c)) for c, t in runs)
+                decoded = count * args.iterations
+                rate = decoded / decode_time if decode_time else 0
+                print('%-40s %-10s %10d %10.1fms %12.0f' % (module.name, mode, decoded, decode_time * 1000, rate))
+    finally:
+        shutil.rmtree(outdir)
+
+
+_ENCODE_MODES = [
+    ('pyasn1', _generate_pyasn1, 'time_pyasn1_encode'),
+    ('derenc', lambda module, f, modules: derencgen.generate_derenc(module, f, modules, decoders=True),
+     'time_derenc'),
+]
+
+
+def bench_encode(args):
+    modules = _read_modules(args.encode_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, _ENCODE_MODES, modules)
+
+        print('%-40s %-10s %10s %12s %12s %10s' % ('module', 'mode', 'messages', 'encode', 'messages/s',
+                                                   'mismatches'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+
+            # Every mode encodes the values of the same messages, encoded
+            # by pyasn1.
+            pyasn1_dir = os.path.join(outdir, _ENCODE_MODES[0][0])
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(pyasn1_dir, 'der', module, messages_path):
+                print('%-40s %-10s %10s' % (module.name, '', 'failed'))
+                continue
+
+            for mode, _, worker in _ENCODE_MODES:
+                encodings_path = os.path.join(outdir, '%s.%s.encodings' % (module_name, mode))
+                try:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, mode), env, worker, args.iterations,
+                                          messages_path, module_name, encodings_path)
+
+                    # Encodings that differ from pyasn1's must at least
+                    # decode to the same values.
+                    mismatches, = _run_worker(pyasn1_dir, env, 'check_round_trips', messages_path,
+                                              encodings_path, module_name)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %10s' % (module.name, mode, 'failed'))
+                    continue
+
+                encode_time, count = min((float(t), int(c)) for c, t in runs)
+                encoded = count * args.iterations
+                rate = encoded / encode_time if encode_time else 0
+                print('%-40s %-10s %10d %10.1fms %12.0f %10s' % (module.name, mode, encoded, encode_time * 1000, rate,
+                                                                 mismatches))
+    finally:
+        shutil.rmtree(outdir)
+
+
+_UPER_MODES = [
+    ('pyasn1', _generate_pyasn1, None),
+    ('berdec', berdecgen.generate_berdec, None),
+    ('uper', upergen.generate_uper, 'time_uper'),
+]
+
+
+def bench_uper(args):
+    modules = _read_modules(args.uper_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, _UPER_MODES, modules)
+
+        print('%-40s %10s %12s %12s %10s %10s %10s' % ('module', 'messages', 'encode', 'decode', 'DER bytes',
+                                                       'PER bytes', 'mismatches'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+
+            # Values are decoded from sample messages encoded by pyasn1, as
+            # plain Python objects.
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            values_path = os.path.join(outdir, module_name + '.values')
+            if not _write_samples(os.path.join(outdir, 'pyasn1'), 'der', module, messages_path):
+                print('%-40s %10s' % (module.name, 'failed'))
+                continue
+
+            with open(messages_path, 'rb') as f:
+                der_size = sum(len(substrate) for _, substrate in pickle.load(f))
+
+            try:
+                _run_worker(os.path.join(outdir, 'berdec'), env, 'write_values', messages_path, values_path,
+                            module_name)
+                runs = _repeat_worker(args.repeat, os.path.join(outdir, 'uper'), env, 'time_uper', args.iterations,
+                                      values_path, module_name)
+            except subprocess.CalledProcessError:
+                print('%-40s %10s' % (module.name, 'failed'))
+                continue
+
+            encode_time = min(float(run[1]) for run in runs)
+            decode_time = min(float(run[2]) for run in runs)
+            count, size, mismatches = int(runs[0][0]), int(runs[0][3]), int(runs[0][4])
+            print('%-40s %10d %10.1fms %10.1fms %10d %10d %10d' % (module.name, count * args.iterations,
+                                                                   encode_time * 1000, decode_time * 1000,
+                                                                   der_size, size, mismatches))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def bench_views(args):
+    modules = _read_modules(args.view_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, [('pyasn1', _generate_pyasn1, None),
+                                 ('views', viewgen.generate_views, 'time_views')], modules)
+
+        print('%-40s %10s %12s %12s %12s %10s' % ('module', 'messages', 'decode', 'view %d' % args.view_fields,
+                                                  'view all', 'mismatches'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(os.path.join(outdir, 'pyasn1'), 'ber', module, messages_path):
+                print('%-40s %10s' % (module.name, 'failed'))
+                continue
+
+            try:
+                runs = _repeat_worker(args.repeat, os.path.join(outdir, 'views'), env, 'time_views', args.iterations,
+                                      messages_path, module_name, args.view_fields)
+            except subprocess.CalledProcessError:
+                print('%-40s %10s' % (module.name, 'failed'))
+                continue
+
+            decode_time, sparse_time, all_time = [min(float(run[i]) for run in runs) for i in range(1, 4)]
+            count, mismatches = int(runs[0][0]), int(runs[0][4])
+            print('%-40s %10d %10.1fms %10.1fms %10.1fms %10d' % (module.name, count * args.iterations,
+                                                                  decode_time * 1000, sparse_time * 1000,
+                                                                  all_time * 1000, mismatches))
+    finally:
+        shutil.rmtree(outdir)
+
+
+_VALIDATE_MODES = [
+    ('pyasn1', _generate_pyasn1, 'time_pyasn1_constraints'),
+    ('validators', lambda module, f, modules: berdecgen.generate_berdec(module, f, modules, validators=True),
+     'time_validators'),
+]
+
+
+def bench_validate(args):
+    modules = _read_modules(args.validate_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, _VALIDATE_MODES, modules)
+
+        print('%-40s %-10s %10s %12s %12s %10s' % ('module', 'mode', 'messages', 'validate', 'messages/s',
+                                                   'rejected'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+
+            # Every mode checks the same messages, encoded by pyasn1, so
+            # none of them should be rejected.
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(os.path.join(outdir, _VALIDATE_MODES[0][0]), 'ber', module, messages_path):
+                print('%-40s %-10s %10s' % (module.name, '', 'failed'))
+                continue
+
+            for mode, _, worker in _VALIDATE_MODES:
+                try:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, mode), env, worker, args.iterations,
+                                          messages_path, module_name)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %10s' % (module.name, mode, 'failed'))
+                    continue
+
+                validate_time, count, rejected = min((float(t), int(c), int(r)) for c, t, r in runs)
+                validated = count * args.iterations
+                rate = validated / validate_time if validate_time else 0
+                print('%-40s %-10s %10d %10.1fms %12.0f %10d' % (module.name, mode, validated,
+                                                                  validate_time * 1000, rate, rejected))
+    finally:
+        shutil.rmtree(outdir)
+
+
+# Every mode runs the time_records worker, which builds values of the kind
+# named after the mode.
+_RECORD_MODES = [
+    ('pyasn1', _generate_pyasn1, 'time_records'),
+    ('dicts', berdecgen.generate_berdec, 'time_records'),
+    ('records', lambda module, f, modules: recordgen.generate_records(module, f, modules, decoders=True),
+     'time_records'),
+]
+
+
+def bench_records(args):
+    modules = _read_modules(args.record_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, _RECORD_MODES, modules)
+
+        print('%-40s %-10s %10s %12s %12s %14s' % ('module', 'mode', 'messages', 'build', 'access',
+                                                   'bytes/message'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(os.path.join(outdir, _RECORD_MODES[0][0]), 'ber', module, messages_path):
+                print('%-40s %-10s %10s' % (module.name, '', 'failed'))
+                continue
+
+            for mode, _, worker in _RECORD_MODES:
+                try:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, mode), env, worker, args.iterations,
+                                          messages_path, module_name, mode)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %10s' % (module.name, mode, 'failed'))
+                    continue
+
+                build_time = min(float(run[1]) for run in runs)
+                access_time = min(float(run[2]) for run in runs)
+                count, size = int(runs[0][0]), int(runs[0][3])
+                print('%-40s %-10s %10d %10.1fms %10.1fms %14.0f' % (module.name, mode, count * args.iterations,
+                                                                     build_time * 1000, access_time * 1000,
+                                                                     size / count if count else 0))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def _find_type_module(modules, type_name):
+    return next((m for m in modules for a in m.assignments
+                 if isinstance(a, sema.TypeAssignment) and a.type_name == type_name), None)
+
+
+def _sample_record(outdir, module, type_name):
+    """ Return the DER encoding of a sample value of ``type_name`` in
+    ``module``, from the pyasn1 modules generated in ``outdir``, or None if
+    there is none.
+    """
+    module_name = pyasn1gen._sanitize_module(module.name)
+    messages_path = os.path.join(outdir, module_name + '.messages')
+    if not _write_samples(os.path.join(outdir, 'pyasn1'), 'der', module, messages_path):
+        print('ERROR: failed to encode a sample value of %s' % type_name)
+        return None
+    with open(messages_path, 'rb') as f:
+        record = dict(pickle.load(f)).get(pyasn1gen._translate_type(type_name))
+    if record is None:
+        print('ERROR: no sample value of %s' % type_name)
+
+    return record
+
+
+def _write_records(path, record, size):
+    # Write copies of record to a file of about size MB.
+    block = record * max((1 << 20) // len(record), 1)
+    with open(path, 'wb') as f:
+        for _ in range(size * (1 << 20) // len(block)):
+            f.write(block)
+
+
+def bench_stream(args):
+    modules = _read_modules(args.stream_spec)
+    module = _find_type_module(modules, args.stream_type)
+    if module is None:
+        print('ERROR: no type %s in %s' % (args.stream_type, args.stream_spec))
+        return
+
+    module_name = pyasn1gen._sanitize_module(module.name)
+    python_name = pyasn1gen._translate_type(args.stream_type)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        modes = [('pyasn1', _generate_pyasn1, None),
+                 ('berdec', lambda m, f, modules: berdecgen.generate_berdec(m, f, modules, records=[args.stream_type]),
+                  'time_stream')]
+        _generate_modes(outdir, modes, modules)
+
+        # Records are copies of a sample value encoded by pyasn1.
+        record = _sample_record(outdir, module, args.stream_type)
+        if record is None:
+            return
+
+        print('%10s %10s %10s %12s %10s %12s %10s' % ('size', 'records', 'scan', 'records/s', 'decode', 'records/s',
+                                                      'rss'))
+        records_path = os.path.join(outdir, 'records.ber')
+        for size in args.stream_size or [128, 1024]:
+            _write_records(records_path, record, size)
+
+            try:
+                runs = _repeat_worker(args.repeat, os.path.join(outdir, 'berdec'), env, 'time_stream', records_path,
+                                      module_name, python_name)
+            except subprocess.CalledProcessError:
+                print('%9dM %10s' % (size, 'failed'))
+                continue
+
+            scan_time = min(float(run[1]) for run in runs)
+            decode_time = min(float(run[2]) for run in runs)
+            count = int(runs[0][0])
+            rss = max(int(run[3]) for run in runs)
+            print('%9dM %10d %8.2fs %12.0f %8.2fs %12.0f %8dkB' % (size, count, scan_time, count / scan_time,
+                                                                  decode_time, count / decode_time, rss))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def bench_columns(args):
+    modules = _read_modules(args.columns_spec)
+    module = _find_type_module(modules, args.stream_type)
+    if module is None:
+        print('ERROR: no type %s in %s' % (args.stream_type, args.columns_spec))
+        return
+
+    module_name = pyasn1gen._sanitize_module(module.name)
+    python_name = pyasn1gen._translate_type(args.stream_type)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        modes = [('pyasn1', _generate_pyasn1, None),
+                 ('columns', lambda m, f, modules: columngen.generate_columns(m, f, modules,
+                                                                              records=[args.stream_type]),
+                  'time_columns')]
+        _generate_modes(outdir, modes, modules)
+
+        record = _sample_record(outdir, module, args.stream_type)
+        if record is None:
+            return
+
+        print('%10s %10s %10s %12s %10s %10s %12s %10s' % ('size', 'records', 'convert', 'records/s', 'rss',
+                                                           'columns', 'records/s', 'rss'))
+        records_path = os.path.join(outdir, 'records.ber')
+        for size in args.stream_size or [16, 128]:
+            _write_records(records_path, record, size)
+
+            # Decode-then-convert first, then the batch decoder, each in
+            # processes of their own for peak RSS.
+            results = []
+            try:
+                for method in ['convert', 'columns']:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, 'columns'), env, 'time_columns',
+                                          records_path, module_name, python_name, method)
+                    results.append((min(float(run[1]) for run in runs), int(runs[0][0]),
+                                    max(int(run[2]) for run in runs)))
+            except subprocess.CalledProcessError:
+                print('%9dM %10s' % (size, 'failed'))
+                continue
+
+            (convert_time, count, convert_rss), (columns_time, _, columns_rss) = results
+            print('%9dM %10d %8.2fs %12.0f %8dkB %8.2fs %12.0f %8dkB' % (
+                size, count, convert_time, count / convert_time, convert_rss,
+                columns_time, count / columns_time, columns_rss))
+    finally:
+        shutil.rmtree(outdir)
+
+
+_LAYOUT_MODES = [
+    ('generic', lambda module, f, modules: derencgen.generate_derenc(module, f, modules, decoders=True,
+                                                                     fixed_layouts=False), 'time_layouts'),
+    ('layouts', lambda module, f, modules: derencgen.generate_derenc(module, f, modules, decoders=True),
+     'time_layouts'),
+]
+
+
+def _fixed_layout_types(module, modules):
+    """ Return the names of the types in ``module`` with fixed layouts. """
+    backend = codecgen.CodecBackend(module, codecgen.CodecModule(codecgen.CodecBackend.runtime_module), modules)
+    return [pyasn1gen._translate_type(a.type_name) for a in module.assignments
+            if isinstance(a, sema.TypeAssignment) and backend.fixed_layout(a.type_decl) is not None]
+
+
+def bench_layouts(args):
+    modules = _read_modules(args.layout_spec)
+    outdir = tempfile.mkdtemp(prefix='asn1ate-bench-')
+    env = _worker_env()
+    try:
+        _generate_modes(outdir, [('pyasn1', _generate_pyasn1, None)] + _LAYOUT_MODES, modules)
+
+        print('%-40s %-10s %6s %10s %12s %12s %12s %12s %10s' % ('module', 'mode', 'types', 'messages', 'decode',
+                                                                 'messages/s', 'encode', 'messages/s', 'mismatches'))
+        for module in modules:
+            module_name = pyasn1gen._sanitize_module(module.name)
+            names = _fixed_layout_types(module, modules)
+            if not names:
+                continue
+
+            messages_path = os.path.join(outdir, module_name + '.messages')
+            if not _write_samples(os.path.join(outdir, 'pyasn1'), 'der', module, messages_path):
+                print('%-40s %-10s %6d %10s' % (module.name, '', len(names), 'failed'))
+                continue
+
+            # Both modes must decode the same values and encode the same
+            # octets, so the results of every mode are compared with those
+            # of the generic codecs.
+            expected = None
+            for mode, _, worker in _LAYOUT_MODES:
+                results_path = os.path.join(outdir, '%s.%s.results' % (module_name, mode))
+                try:
+                    runs = _repeat_worker(args.repeat, os.path.join(outdir, mode), env, worker, args.iterations,
+                                          messages_path, module_name, results_path, args.batch_size, *names)
+                except subprocess.CalledProcessError:
+                    print('%-40s %-10s %6d %10s' % (module.name, mode, len(names), 'failed'))
+                    continue
+
+                with open(results_path, 'rb') as f:
+                    values, encodings = pickle.load(f)
+                if expected is None:
+                    expected = values, encodings
+                mismatches = sum(value != other for value, other in zip(values, expected[0]))
+                mismatches += sum(encoding != other for encoding, other in zip(encodings, expected[1]))
+
+                decode_time, encode_time = [min(float(run[i]) for run in runs) for i in range(1, 3)]
+                messages = int(runs[0][0]) * args.iterations
+                print('%-40s %-10s %6d %10d %10.1fms %12.0f %10.1fms %12.0f %10d' % (
+                    module.name, mode, len(names), messages, decode_time * 1000,
+                    messages / decode_time if decode_time else 0, encode_time * 1000,
+                    messages / encode_time if encode_time else 0, mismatches))
+    finally:
+        shutil.rmtree(outdir)
+
+
+def _arg_parser():
+    ap = argparse.ArgumentParser(prog='asn1ate.bench',
+                                 description='Benchmark asn1ate on deeply nested synthetic specs, '
+                                             'or import time of the code generated for a spec.')
+    ap.add_argument('--depth', type=int, action='append', default=None,
+                    help='Nesting depth to benchmark (can be repeated, default 25, 50, 100 and 200).')
+    ap.add_argument('--width', type=int, default=4, help='Simple components per level (default 4).')
+    ap.add_argument('--repeat', type=int, default=3, help='Best of this many runs (default 3).')
+    ap.add_argument('--import-spec', metavar='FILE', default=None,
+                    help='Measure size, import time and peak RSS of modules generated from FILE, '
+                         'with and without --lazy, --hoist and --package.')
+    ap.add_argument('--access', type=int, default=3,
+                    help='Types to access after import with --import-spec (default 3).')
+    ap.add_argument('--decode-spec', metavar='FILE', default=None,
+                    help='Measure BER decoding throughput of sample messages of every type in FILE, '
+                         'with pyasn1, with and without --named-classes, and with the decoders generated '
+                         'by asn1ate.berdecgen.')
+    ap.add_argument('--encode-spec', metavar='FILE', default=None,
+                    help='Measure DER encoding throughput of sample values of every type in FILE, with pyasn1 '
+                         'and with the encoders generated by asn1ate.derencgen, and check that both agree.')
+    ap.add_argument('--uper-spec', metavar='FILE', default=None,
+                    help='Measure encoding and decoding throughput of sample values of every type in FILE '
+                         'with the UPER codecs generated by asn1ate.upergen, and compare sizes with DER.')
+    ap.add_argument('--view-spec', metavar='FILE', default=None,
+                    help='Measure how fast sample messages of SEQUENCE and SET types in FILE are decoded, '
+                         'compared to making views of them with asn1ate.viewgen and accessing a few or all of '
+                         'their components.')
+    ap.add_argument('--view-fields', metavar='N', type=int, default=3,
+                    help='Components to access in every view with --view-spec (default 3).')
+    ap.add_argument('--validate-spec', metavar='FILE', default=None,
+                    help='Measure how fast sample values of every type in FILE are checked against the '
+                         'constraints of their types, with pyasn1 and with the validators generated by '
+                         'asn1ate.validgen.')
+    ap.add_argument('--record-spec', metavar='FILE', default=None,
+                    help='Measure memory per message, decoding time and component access time of sample messages '
+                         'of every type in FILE as pyasn1 objects, as values decoded by asn1ate.berdecgen, and as '
+                         'records generated by asn1ate.recordgen.')
+    ap.add_argument('--stream-spec', metavar='FILE', default=None,
+                    help='Measure how fast the streaming reader generated by asn1ate.berdecgen scans and decodes '
+                         'files of concatenated values of --stream-type in FILE, and its peak RSS.')
+    ap.add_argument('--columns-spec', metavar='FILE', default=None,
+                    help='Measure how fast the batch decoder generated by asn1ate.columngen decodes files of '
+                         'concatenated values of --stream-type in FILE into NumPy columns, compared to decoding '
+                         'them with the streaming reader and converting them to columns, and peak RSS of both.')
+    ap.add_argument('--layout-spec', metavar='FILE', default=None,
+                    help='Measure how fast batches of sample messages of the types in FILE with a fixed DER layout '
+                         'are decoded and encoded by the codecs generated by asn1ate.derencgen, with and without '
+                         'their struct fast paths, and check that both agree.')
+    ap.add_argument('--batch-size', metavar='N', type=int, default=100,
+                    help='Copies of every sample message in batches with --layout-spec (default 100).')
+    ap.add_argument('--stream-type', metavar='NAME', default=None,
+                    help='Type of the values in files with --stream-spec or --columns-spec.')
+    ap.add_argument('--stream-size', metavar='MB', type=int, action='append', default=None,
+                    help='Size of files with --stream-spec or --columns-spec (can be repeated, default 128 and '
+                         '1024, or 16 and 128 with --columns-spec).')
+    ap.add_argument('--iterations', type=int, default=20,
+                    help='Times to decode, encode or check every message with --decode-spec, --encode-spec, '
+                         '--uper-spec, --view-spec, --validate-spec, --record-spec or --layout-spec (default 20).')
+    ap.add_argument('--cold-import-spec', metavar='FILE', default=None,
+                    help='Measure cold import time of modules generated from FILE, as source files, '
+                         'byte-compiled ahead of time, and bundled in a zip file.')
+    return ap
+
+
+# The benchmark of every --*-spec option, in order of precedence, and
+# whether it needs --stream-type. Without any, deeply nested synthetic
+# specs are benchmarked.
+_BENCHMARKS = [
+    ('import_spec', bench_import, False),
+    ('cold_import_spec', bench_cold_import, False),
+    ('decode_spec', bench_decode, False),
+    ('encode_spec', bench_encode, False),
+    ('uper_spec', bench_uper, False),
+    ('view_spec', bench_views, False),
+    ('validate_spec', bench_validate, False),
+    ('record_spec', bench_records, False),
+    ('stream_spec', bench_stream, True),
+    ('columns_spec', bench_columns, True),
+    ('layout_spec', bench_layouts, False),
+]
+
+
+def main(argv=None):
+    ap = _arg_parser()
+    args = ap.parse_args(argv)
+
+    # Without memoization the parser backtracks exponentially on nested
+    # types, and deep specs nest the parser and semantic model deeply too.
+    pyparsing.ParserElement.enablePackrat()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    for option, benchmark, needs_type in _BENCHMARKS:
+        if getattr(args, option):
+            if needs_type and not args.stream_type:
+                ap.error('--%s requires --stream-type' % option.replace('_', '-'))
+            benchmark(args)
+            break
+    else:
+        bench_nested(args)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
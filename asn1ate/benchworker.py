@@ -0,0 +1,607 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+""" Workers of asn1ate.bench. Every benchmark runs in a fresh interpreter,
+with the generated modules to measure in the current directory::
+
+  python -m asn1ate.benchworker WORKER ARGS...
+
+Workers print their results on one line, separated by spaces. Only the
+standard library is imported up front, so imports of generated modules
+start cold.
+"""
+
+from __future__ import print_function  # Python 2 compatibility
+
+import sys
+import timeit
+import pickle
+
+
+def sample_value(spec, depth=0):
+    """ Build a value of the pyasn1 type ``spec`` for benchmarks, with all
+    mandatory and, where possible, optional components set, the first
+    alternative that works for CHOICEs and two items in collections.
+    Scalars get the first value their constraints allow. Raises ValueError
+    if no value is found, e.g. for recursive types past a maximum depth.
+    """
+    from pyasn1 import error
+    from pyasn1.type import univ, char, useful
+
+    if depth > _SAMPLE_MAX_DEPTH:
+        raise ValueError('Maximum depth exceeded')
+
+    if isinstance(spec, univ.Choice):
+        for index, named_type in enumerate(spec.componentType.namedTypes):
+            try:
+                component = sample_value(named_type.asn1Object, depth + 1)
+            except ValueError:
+                continue
+            value = spec.clone()
+            value.setComponentByPosition(index, component)
+            return value
+        raise ValueError('No alternative of %s has a value' % spec.__class__.__name__)
+
+    if isinstance(spec, (univ.Sequence, univ.Set)):
+        value = spec.clone()
+        for index, named_type in enumerate(spec.componentType.namedTypes):
+            if named_type.isDefaulted:
+                continue
+            try:
+                value.setComponentByPosition(index, sample_value(named_type.asn1Object, depth + 1))
+            except ValueError:
+                if not named_type.isOptional:
+                    raise
+        return value
+
+    if isinstance(spec, (univ.SequenceOf, univ.SetOf)):
+        item = sample_value(spec.componentType, depth + 1)
+        for size in _SAMPLE_SIZES:
+            value = spec.clone()
+            for _ in range(size):
+                value.append(item)
+            if not value.isInconsistent:
+                return value
+        raise ValueError('No size fits %s' % spec.__class__.__name__)
+
+    if isinstance(spec, univ.Boolean):
+        candidates = [True]
+    elif isinstance(spec, univ.Null):
+        candidates = ['']
+    elif isinstance(spec, univ.Integer):  # Also ENUMERATED
+        candidates = list(spec.namedValues.values()) + [0, 1, 2, 3, 7, 10, 100, 1000, 65535, -1]
+    elif isinstance(spec, univ.BitString):
+        candidates = ["'%s'B" % ('1' * size) for size in _SAMPLE_SIZES]
+    elif isinstance(spec, useful.GeneralizedTime):
+        candidates = ['20200101000000Z']
+    elif isinstance(spec, useful.UTCTime):
+        candidates = ['200101000000Z']
+    elif isinstance(spec, char.AbstractCharacterString):
+        candidates = [c * size for c in 'a1 ' for size in _SAMPLE_SIZES]
+    elif isinstance(spec, univ.Any):
+        candidates = [b'\x05\x00']  # NULL
+    elif isinstance(spec, univ.OctetString):
+        candidates = [b'a' * size for size in _SAMPLE_SIZES]
+    elif isinstance(spec, univ.ObjectIdentifier):
+        candidates = [(1, 2, 3)]
+    elif isinstance(spec, univ.Real):
+        candidates = [1.0, 0]
+    else:
+        candidates = []
+
+    for candidate in candidates:
+        try:
+            return spec.clone(candidate)
+        except error.PyAsn1Error:
+            pass
+
+    raise ValueError('No value fits %s' % spec.__class__.__name__)
+
+
+_SAMPLE_MAX_DEPTH = 8
+_SAMPLE_SIZES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 1024]
+
+
+def _max_rss():
+    """ Return the peak RSS of this process, in kilobytes on Linux. """
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _dump(path, value):
+    with open(path, 'wb') as f:
+        pickle.dump(value, f)
+
+
+def time_import(module_name, *names):
+    """ Import a module and access the types ``names`` in it, and report
+    the time each took and peak RSS.
+    """
+    start = timeit.default_timer()
+    module = __import__(module_name)
+    imported = timeit.default_timer()
+    for name in names:
+        getattr(module, name)
+    accessed = timeit.default_timer()
+    print('%f %f %d' % (imported - start, accessed - imported, _max_rss()))
+
+
+def time_cold_import(path, module_name):
+    """ Import a module from ``path``, a directory or zip file, and report
+    the time it took.
+    """
+    sys.path.insert(0, path)
+    start = timeit.default_timer()
+    __import__(module_name)
+    print('%f' % (timeit.default_timer() - start))
+
+
+def write_samples(codec, messages_path, module_name, *names):
+    """ Encode a sample message of the pyasn1 types ``names`` with the
+    pyasn1 ``codec`` and write them to a file, skipping types without one.
+    """
+    import importlib
+    from pyasn1.error import PyAsn1Error
+
+    encoder = importlib.import_module('pyasn1.codec.%s.encoder' % codec)
+    module = __import__(module_name)
+    messages = []
+    for name in names:
+        try:
+            messages.append((name, encoder.encode(sample_value(getattr(module, name)()))))
+        except (ValueError, PyAsn1Error):
+            pass
+    _dump(messages_path, messages)
+
+
+def time_pyasn1_decode(iterations, messages_path, module_name):
+    """ Decode the messages in a file with pyasn1 a number of times, and
+    report the number of messages and the time it took.
+    """
+    from pyasn1.codec.ber import decoder
+
+    module = __import__(module_name)
+    messages = [(getattr(module, name)(), substrate) for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for spec, substrate in messages:
+            decoder.decode(substrate, asn1Spec=spec)
+    print('%d %f' % (len(messages), timeit.default_timer() - start))
+
+
+def time_berdec(iterations, messages_path, module_name):
+    """ Like ``time_pyasn1_decode``, with decoders generated by
+    asn1ate.berdecgen.
+    """
+    module = __import__(module_name)
+    messages = [(getattr(module, 'decode_' + name), substrate) for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for decode, substrate in messages:
+            decode(substrate)
+    print('%d %f' % (len(messages), timeit.default_timer() - start))
+
+
+def time_pyasn1_encode(iterations, messages_path, module_name, encodings_path):
+    """ Decode the DER messages in a file with pyasn1, and encode the values
+    a number of times. Report the number of messages and the time it took,
+    and write the encodings to a file, to check them.
+    """
+    from pyasn1.codec.der import decoder, encoder
+
+    module = __import__(module_name)
+    values = [decoder.decode(substrate, asn1Spec=getattr(module, name)())[0]
+              for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for value in values:
+            encoder.encode(value)
+    print('%d %f' % (len(values), timeit.default_timer() - start))
+    _dump(encodings_path, [encoder.encode(value) for value in values])
+
+
+def time_derenc(iterations, messages_path, module_name, encodings_path):
+    """ Like ``time_pyasn1_encode``, with encoders and decoders generated by
+    asn1ate.derencgen.
+    """
+    module = __import__(module_name)
+    values = [(getattr(module, 'encode_' + name), getattr(module, 'decode_' + name)(substrate)[0])
+              for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for encode, value in values:
+            encode(value)
+    print('%d %f' % (len(values), timeit.default_timer() - start))
+    _dump(encodings_path, [encode(value) for encode, value in values])
+
+
+def check_round_trips(messages_path, encodings_path, module_name):
+    """ Compare the encodings in a file with the messages they were decoded
+    from, and report the number of encodings that pyasn1 doesn't decode to
+    the same value, e.g. REALs can be encoded in decimal or binary form.
+    """
+    from pyasn1.error import PyAsn1Error
+    from pyasn1.codec.der import decoder
+
+    module = __import__(module_name)
+    mismatches = 0
+    for (name, substrate), encoding in zip(_load(messages_path), _load(encodings_path)):
+        if encoding != substrate:
+            spec = getattr(module, name)()
+            try:
+                mismatches += decoder.decode(encoding, asn1Spec=spec) != decoder.decode(substrate, asn1Spec=spec)
+            except PyAsn1Error:
+                mismatches += 1
+    print(mismatches)
+
+
+def write_values(messages_path, values_path, module_name):
+    """ Decode the DER messages in a file with decoders generated by
+    asn1ate.berdecgen, and write the values to a file.
+    """
+    module = __import__(module_name)
+    _dump(values_path, [(name, getattr(module, 'decode_' + name)(substrate)[0])
+                        for name, substrate in _load(messages_path)])
+
+
+def time_uper(iterations, values_path, module_name):
+    """ Encode the values in a file with encoders generated by
+    asn1ate.upergen a number of times, and decode the encodings as many
+    times. Report the number of values, the time each took, the total size
+    of the encodings and the number of values that don't decode to the same
+    value.
+    """
+    module = __import__(module_name)
+    values = [(getattr(module, 'encode_' + name), getattr(module, 'decode_' + name), value)
+              for name, value in _load(values_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for encode, _, value in values:
+            encode(value)
+    encode_time = timeit.default_timer() - start
+    encodings = [(decode, encode(value), value) for encode, decode, value in values]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for decode, encoding, _ in encodings:
+            decode(encoding)
+    decode_time = timeit.default_timer() - start
+    mismatches = sum(decode(encoding) != value for decode, encoding, value in encodings)
+    size = sum(len(encoding) for _, encoding, _ in encodings)
+    print('%d %f %f %d %d' % (len(values), encode_time, decode_time, size, mismatches))
+
+
+def _same_view(view, value):
+    """ Return whether ``view`` has the same components as ``value``. """
+    from asn1ate.support.ber import View
+
+    if isinstance(view, View):
+        if not isinstance(value, dict):
+            return False
+        value = dict((name.replace('-', '_'), item) for name, item in value.items())
+        return all(_same_view(getattr(view, name), value[name]) if name in value else getattr(view, name) is None
+                   for name in view._names)
+    elif isinstance(view, (list, tuple)):
+        return len(view) == len(value) and all(_same_view(a, b) for a, b in zip(view, value))
+    return view == value
+
+
+def time_views(iterations, messages_path, module_name, fields):
+    """ Decode sample messages of SEQUENCE and SET types in full, then make
+    views of them and access their first ``fields`` components, then all of
+    them, with modules generated by asn1ate.viewgen. Report the number of
+    messages, the time each took and the number of views that don't have
+    the same components as the decoded values.
+    """
+    module = __import__(module_name)
+    messages = []
+    for name, substrate in _load(messages_path):
+        view = getattr(module, 'view_' + name)
+        names = getattr(view(substrate)[0], '_names', None)
+        if names is not None:
+            messages.append((getattr(module, 'decode_' + name), view, substrate, names[:int(fields)], names))
+
+    def access(index):
+        start = timeit.default_timer()
+        for _ in range(int(iterations)):
+            for message in messages:
+                value = message[1](message[2])[0]
+                for name in message[index]:
+                    getattr(value, name)
+        return timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for decode, _, substrate, _, _ in messages:
+            decode(substrate)
+    decode_time = timeit.default_timer() - start
+    sparse_time = access(3)
+    all_time = access(4)
+    mismatches = sum(not _same_view(view(substrate)[0], decode(substrate)[0])
+                     for decode, view, substrate, _, _ in messages)
+    print('%d %f %f %f %d' % (len(messages), decode_time, sparse_time, all_time, mismatches))
+
+
+def _check_constraints(value):
+    """ Check a pyasn1 value against the constraints of its type, with the
+    checks pyasn1 makes when values are set.
+    """
+    from pyasn1.type import univ
+
+    value.subtypeSpec(value)
+    if isinstance(value, univ.Choice):
+        _check_constraints(value.getComponent())
+    elif isinstance(value, univ.SequenceAndSetBase):
+        for component in value.values():
+            if component.isValue:
+                _check_constraints(component)
+    elif isinstance(value, univ.SequenceOfAndSetOfBase):
+        for component in value:
+            _check_constraints(component)
+
+
+def _rejects(check, value, error):
+    try:
+        check(value)
+    except error:
+        return True
+    return False
+
+
+def time_pyasn1_constraints(iterations, messages_path, module_name):
+    """ Decode sample messages with pyasn1, and check the values against the
+    constraints of their types a number of times. Report the number of
+    messages, the time it took and the number of values outside the
+    constraints.
+    """
+    from pyasn1.error import PyAsn1Error
+    from pyasn1.codec.ber import decoder
+
+    module = __import__(module_name)
+    values = [decoder.decode(substrate, asn1Spec=getattr(module, name)())[0]
+              for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for value in values:
+            _check_constraints(value)
+    rejected = sum(_rejects(_check_constraints, value, PyAsn1Error) for value in values)
+    print('%d %f %d' % (len(values), timeit.default_timer() - start, rejected))
+
+
+def time_validators(iterations, messages_path, module_name):
+    """ Like ``time_pyasn1_constraints``, with values decoded by
+    asn1ate.berdecgen and validators generated by asn1ate.validgen.
+    """
+    from asn1ate.support.ber import ConstraintError
+
+    module = __import__(module_name)
+    values = [(getattr(module, 'validate_' + name), getattr(module, 'decode_' + name)(substrate)[0])
+              for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        for validate, value in values:
+            validate(value)
+    rejected = sum(_rejects(validate, value, ConstraintError) for validate, value in values)
+    print('%d %f %d' % (len(values), timeit.default_timer() - start, rejected))
+
+
+def _pyasn1_records(module):
+    """ Return functions that build pyasn1 objects from messages of a type,
+    list the components of values, and get a component of a value.
+    """
+    from pyasn1.codec.ber import decoder
+    from pyasn1.type import univ
+
+    def builder(name):
+        spec = getattr(module, name)()
+        return lambda substrate: decoder.decode(substrate, asn1Spec=spec)[0]
+
+    def names(value):
+        if not isinstance(value, univ.SequenceAndSetBase) or isinstance(value, univ.Choice):
+            return []
+        return [n.name for n in value.componentType.namedTypes
+                if value.getComponentByName(n.name, None, instantiate=False) is not None]
+
+    return builder, names, lambda value, name: value.getComponentByName(name, None, instantiate=False)
+
+
+def _dict_records(module):
+    """ Like ``_pyasn1_records``, for values decoded by asn1ate.berdecgen. """
+    def builder(name):
+        decode = getattr(module, 'decode_' + name)
+        return lambda substrate: decode(substrate)[0]
+
+    return builder, lambda value: list(value) if isinstance(value, dict) else [], dict.get
+
+
+def _record_records(module):
+    """ Like ``_pyasn1_records``, for records of asn1ate.recordgen. """
+    from asn1ate.support.ber import Record
+
+    def builder(name):
+        decode, convert = getattr(module, 'decode_' + name), getattr(module, 'from_value_' + name)
+        return lambda substrate: convert(decode(substrate)[0])
+
+    def names(value):
+        if not isinstance(value, Record):
+            return []
+        return [name for name in value.__slots__ if getattr(value, name) is not None]
+
+    return builder, names, getattr
+
+
+_RECORD_KINDS = {
+    'pyasn1': _pyasn1_records,
+    'dicts': _dict_records,
+    'records': _record_records,
+}
+
+
+def time_records(iterations, messages_path, module_name, kind):
+    """ Decode sample messages a number of times, as pyasn1 objects, as
+    values decoded by asn1ate.berdecgen, or as records of asn1ate.recordgen
+    converted from those, depending on ``kind``, then read the components of
+    the SEQUENCE and SET values as many times. Report the number of
+    messages, the time each took and the memory taken by a message, measured
+    with tracemalloc.
+    """
+    import tracemalloc
+
+    iterations = int(iterations)
+    builder, names, get = _RECORD_KINDS[kind](__import__(module_name))
+    builds = [(builder(name), substrate) for name, substrate in _load(messages_path)]
+    start = timeit.default_timer()
+    for _ in range(iterations):
+        for build, substrate in builds:
+            build(substrate)
+    build_time = timeit.default_timer() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    values = [build(substrate) for _ in range(iterations) for build, substrate in builds]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    values = [(value, names(value)) for value in values[:len(builds)]]
+    start = timeit.default_timer()
+    for _ in range(iterations):
+        for value, value_names in values:
+            for name in value_names:
+                get(value, name)
+    access_time = timeit.default_timer() - start
+    print('%d %f %f %d' % (len(builds), build_time, access_time, size // iterations))
+
+
+def time_stream(records_path, module_name, type_name):
+    """ Scan the records in a file of concatenated BER values without
+    decoding them, then decode them with the streaming reader generated by
+    asn1ate.berdecgen. Report the number of records, the time each pass
+    took and peak RSS.
+    """
+    from asn1ate.support import ber
+
+    read = getattr(__import__(module_name), 'iter_' + type_name)
+    with ber.map_file(records_path) as data:
+        start = timeit.default_timer()
+        count = sum(1 for _ in ber.iter_records(data))
+        scan_time = timeit.default_timer() - start
+        start = timeit.default_timer()
+        for _ in read(data):
+            pass
+        decode_time = timeit.default_timer() - start
+    print('%d %f %f %d' % (count, scan_time, decode_time, _max_rss()))
+
+
+def _convert_columns(module, type_name, data, dtype):
+    """ Decode values with the streaming reader and convert them to the
+    columns of ``dtype``, like the batch decoder returns them.
+    """
+    import numpy
+
+    rows = dict((field, []) for field in dtype.names)
+    sizes = [(field, field[:-len('_length')]) for field in dtype.names
+             if field.endswith('_length') and field[:-len('_length')] in rows]
+    for value in getattr(module, 'iter_' + type_name)(data):
+        for field, column in rows.items():
+            column.append(value.get(field))
+        for field, name in sizes:
+            rows[field][-1] = len(value[name]) if name in value else None
+
+    columns = {}
+    for field, column in rows.items():
+        mask = numpy.fromiter((v is None for v in column), '?', len(column))
+        fill = numpy.zeros(1, dtype[field])[0]
+        array = numpy.fromiter((fill if v is None else v for v in column), dtype[field], len(column))
+        columns[field] = numpy.ma.MaskedArray(array, mask) if mask.any() else array
+
+    return columns
+
+
+def time_columns(records_path, module_name, type_name, method):
+    """ Decode a file of concatenated BER values into NumPy columns, with
+    the batch decoder generated by asn1ate.columngen if ``method`` is
+    'columns', or else by decoding values with the streaming reader and
+    converting them to the same columns. Report the number of records, the
+    time it took and peak RSS.
+    """
+    from asn1ate.support import ber
+
+    module = __import__(module_name)
+    dtype = getattr(module, type_name + '_DTYPE')
+    with ber.map_file(records_path) as data:
+        start = timeit.default_timer()
+        if method == 'columns':
+            columns = getattr(module, 'decode_%s_columns' % type_name)(data)
+        else:
+            columns = _convert_columns(module, type_name, data, dtype)
+        decode_time = timeit.default_timer() - start
+    print('%d %f %d' % (len(columns[dtype.names[0]]), decode_time, _max_rss()))
+
+
+def time_layouts(iterations, messages_path, module_name, results_path, batch_size, *names):
+    """ Decode batches of ``batch_size`` copies of the DER messages of the
+    types ``names`` in a file, and encode the values, a number of times.
+    Report the number of messages and the time each took, and write the
+    values and encodings to a file, to compare them across modes.
+    """
+    module = __import__(module_name)
+    messages = [(name, substrate) for name, substrate in _load(messages_path) if name in names] * int(batch_size)
+    decoders = [(getattr(module, 'decode_' + name), substrate) for name, substrate in messages]
+    encoders = [getattr(module, 'encode_' + name) for name, _ in messages]
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        values = [decode(substrate)[0] for decode, substrate in decoders]
+    decode_time = timeit.default_timer() - start
+    start = timeit.default_timer()
+    for _ in range(int(iterations)):
+        encodings = [encode(value) for encode, value in zip(encoders, values)]
+    encode_time = timeit.default_timer() - start
+    print('%d %f %f' % (len(messages), decode_time, encode_time))
+    _dump(results_path, (values, encodings))
+
+
+_WORKERS = dict((worker.__name__, worker) for worker in [
+    time_import, time_cold_import, write_samples, time_pyasn1_decode, time_berdec, time_pyasn1_encode,
+    time_derenc, check_round_trips, write_values, time_uper, time_views, time_pyasn1_constraints,
+    time_validators, time_records, time_stream, time_columns, time_layouts,
+])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in _WORKERS:
+        print('usage: python -m asn1ate.benchworker {%s} ARGS...' % ','.join(sorted(_WORKERS)), file=sys.stderr)
+        return 2
+
+    _WORKERS[argv[0]](*argv[1:])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
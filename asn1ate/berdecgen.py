@@ -0,0 +1,507 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import ber, pygen
+from asn1ate.sema import *
+from asn1ate.codecgen import CodecBackend, LayoutField, generate_codec, bytes_literal, _write_items
+from asn1ate.validgen import ValidatorBackend
+
+
+class BerDecoderBackend(CodecBackend):
+    """ Backend to generate specialized BER decoders from semantic tree.
+
+    Every type gets a *contents decoder*, a function that decodes the
+    contents octets of a value, given the tag key, constructed flag and
+    contents bounds returned by ``ber.read_tlv``, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo [0] INTEGER
+        # }
+        def _d_Seq(data, key, constructed, offset, end):
+            value = {}
+            key, constructed, start, stop, offset = read_tlv(data, offset, end)
+            if key == 2:  # [0]
+                value['foo'] = decode_integer(data, key, constructed, start, stop)
+                key, constructed, start, stop, offset = read_tlv(data, offset, end)
+            else:
+                raise DecodeError('Missing component foo of Seq')
+            ...
+
+    Decoders are straight-line code for their type. SEQUENCE decoders match
+    components in order against precomputed tag keys, SET and CHOICE
+    decoders dispatch through a dict from tag key to component name and
+    decoder, and built-in types are decoded by the functions in
+    ``asn1ate.support.ber``, which read directly from a memoryview.
+    Implicitly tagged types share the decoder of the type they tag, and
+    every anonymous inline type that needs a decoder of its own gets one,
+    named after the assignment and the component path. SEQUENCEs and SETs
+    with a fixed DER layout are first matched against it, and unpacked with
+    a single ``struct.Struct`` if their length and headers fit, unless
+    ``fixed_layouts`` is False.
+
+    Values are plain Python objects: dicts for SEQUENCE and SET, without
+    absent OPTIONAL components, (name, value) tuples for CHOICE, lists for
+    SEQUENCE OF and SET OF, and ints, bools, bytes and strings for simple
+    types. OBJECT IDENTIFIERs are tuples of arcs, BIT STRINGs are (octets,
+    unused bits) tuples, and ANY values and unknown extensions are kept
+    encoded. Numeric and boolean DEFAULT values are filled in. Constraints
+    are not checked.
+
+    For every type assignment, ``decode_<Type>(data, offset=0)`` decodes the
+    value at ``offset`` in ``data`` and returns it along with the offset
+    after it, and ``DECODERS`` maps type names to these functions. Types
+    named in ``records`` also get ``iter_<Type>(data, offset=0)``, which
+    decodes concatenated values of the type lazily, e.g. from a file mapped
+    by ``ber.map_file``. The generated code requires Python 3.
+    """
+
+    prefix = '_d_'
+    parameters = 'data, key, constructed, offset, end'
+    registry_name = 'DECODERS'
+
+    def __init__(self, sema_module, module, referenced_modules, records=(), fixed_layouts=True):
+        super(BerDecoderBackend, self).__init__(sema_module, module, referenced_modules)
+        self.records = records
+        self.fixed_layouts = fixed_layouts
+        self.runtime_name('decode')
+
+        self.generators = {
+            ChoiceType: self.decoder_choice_type,
+            SequenceType: self.decoder_sequence_type,
+            SetType: self.decoder_set_type,
+            SequenceOfType: self.decoder_collection_type,
+            SetOfType: self.decoder_collection_type,
+            TaggedType: self.decoder_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.decoder_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.decoder_simple_type,
+            BitStringType: self.decoder_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'decode_' + python_name
+        keys = self.tag_keys(assignment.type_decl)
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(data, offset=0):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return decode(_d_%s, %s, data, offset)' % (python_name, self.key_set(keys)))
+        fragment.pop_indent()
+
+        if assignment.type_name in self.records:
+            fragment.write_blanks(2)
+            fragment.write_line('def iter_%s(data, offset=0):' % python_name)
+            fragment.push_indent()
+            fragment.write_line('return %s(_d_%s, %s, data, offset)' % (self.runtime_name('iter_decode'), python_name,
+                                                                         self.key_set(keys)))
+            fragment.pop_indent()
+
+        return public_name, fragment
+
+    def decoder_simple_type(self, t, function_name):
+        return self.runtime_name(_BUILTIN_DECODERS.get(t.type_name, 'decode_any'))
+
+    def decoder_tagged_type(self, t, function_name):
+        if self.tag_implicitness(t) == TagImplicitness.IMPLICIT:
+            return self.generate(t.type_decl, function_name)
+
+        # The contents of an explicit tag are a complete encoding of the
+        # tagged type.
+        function_name = self.function_name(function_name)
+        decoder = self.generate(t.type_decl)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('key, constructed, start, stop, offset = read_tlv(data, offset, end)')
+        self.runtime_name('read_tlv')
+        self.write_tag_check(fragment, self.tag_keys(t.type_decl))
+        fragment.write_line('return %s(data, key, constructed, start, stop)' % decoder)
+        self.end_function(fragment)
+
+        return function_name
+
+    def decoder_sequence_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        components = self.resolve_components(t)
+
+        body = pygen.PythonFragment()
+        body.write_line('value = {}')
+        body.write_line(_READ_NEXT)
+        self.runtime_name('read_tlv')
+
+        extensible = False
+        for index, c in enumerate(components):
+            if isinstance(c, ExtensionMarker):
+                extensible = True
+                continue
+
+            keys = self.tag_keys(c.type_decl)
+            decoder = self.generate_component(c.identifier, c.type_decl)
+
+            if extensible:
+                # Skip unknown extensions ahead of the remaining components.
+                remaining_keys = self.union_keys(components[index:])
+                if remaining_keys is not None:
+                    body.write_line('while key is not None and key not in %s:' % self.key_set(remaining_keys))
+                    body.push_indent()
+                    body.write_line(_READ_NEXT)
+                    body.pop_indent()
+
+            comment = '  # %s' % ber.describe_tag(list(keys)[0]) if keys is not None and len(keys) == 1 else ''
+            body.write_line('if %s:%s' % (self.key_test(keys), comment))
+            body.push_indent()
+            body.write_line("value['%s'] = %s(data, key, constructed, start, stop)" % (c.identifier, decoder))
+            body.write_line(_READ_NEXT)
+            body.pop_indent()
+
+            default = self.default_literal(c)
+            if not c.optional and c.default_value is None:
+                body.write_line('else:')
+                body.push_indent()
+                body.write_line("raise DecodeError('Missing component %s of %s')" % (c.identifier,
+                                                                                    self.description()))
+                self.runtime_name('DecodeError')
+                body.pop_indent()
+            elif default is not None:
+                body.write_line('else:')
+                body.push_indent()
+                body.write_line("value['%s'] = %s" % (c.identifier, default))
+                body.pop_indent()
+
+        if not extensible:
+            body.write_line('if key is not None:')
+            body.push_indent()
+            body.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+            body.pop_indent()
+        body.write_line('return value')
+
+        fragment = self.start_function(function_name)
+        self.write_layout_decoder(fragment, t)
+        fragment.write_block(body)
+        self.end_function(fragment)
+
+        return function_name
+
+    def decoder_set_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        components = self.resolve_components(t)
+        table_name = self.unique_name('_%s_FIELDS' % function_name[len(self.prefix):])
+        fields, wildcard = self.generate_dispatch_table(table_name, components)
+
+        body = pygen.PythonFragment()
+        body.write_line('value = {}')
+        body.write_line('while offset < end:')
+        body.push_indent()
+        body.write_line(_READ_NEXT)
+        self.runtime_name('read_tlv')
+        body.write_line('try:')
+        body.push_indent()
+        body.write_line('name, decoder = %s[key]' % table_name)
+        body.pop_indent()
+        body.write_line('except KeyError:')
+        body.push_indent()
+        if wildcard:
+            body.write_line("name, decoder = '%s', %s" % wildcard)
+        elif any(isinstance(c, ExtensionMarker) for c in components):
+            body.write_line('continue  # Unknown extension')
+        else:
+            body.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+        body.pop_indent()
+        body.write_line('value[name] = decoder(data, key, constructed, start, stop)')
+        body.pop_indent()
+
+        for c in fields:
+            default = self.default_literal(c)
+            if not c.optional and c.default_value is None:
+                body.write_line("if '%s' not in value:" % c.identifier)
+                body.push_indent()
+                body.write_line("raise DecodeError('Missing component %s of %s')" % (c.identifier,
+                                                                                    self.description()))
+                self.runtime_name('DecodeError')
+                body.pop_indent()
+            elif default is not None:
+                body.write_line("if '%s' not in value:" % c.identifier)
+                body.push_indent()
+                body.write_line("value['%s'] = %s" % (c.identifier, default))
+                body.pop_indent()
+        body.write_line('return value')
+
+        fragment = self.start_function(function_name)
+        self.write_layout_decoder(fragment, t)
+        fragment.write_block(body)
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_layout_decoder(self, fragment, t):
+        """ Write a fast path for values of the SEQUENCE or SET ``t`` if it
+        has a fixed layout, which unpacks their contents with a single
+        ``struct.Struct``. Values with other identifier or length octets,
+        e.g. BER encodings DER doesn't allow, fall through to the decoder
+        that follows.
+        """
+        layout = self.fixed_layout(t) if self.fixed_layouts else None
+        if layout is None:
+            return
+
+        names = layout.names()
+        fragment.write_line('if end - offset == %d:' % layout.size)
+        fragment.push_indent()
+        _write_items(fragment, '(', names, ') = %s.unpack_from(data, offset)' % self.layout_struct(layout))
+        headers = [(name, bytes_literal(item)) for name, item in zip(names, layout.items) if isinstance(item, bytes)]
+        if len(headers) == 1:
+            fragment.write_line('if %s == %s:' % headers[0])
+        else:
+            expected = self.module.constant('_HEADERS', '(%s)' % ', '.join(literal for _, literal in headers))
+            _write_items(fragment, 'if (', [name for name, _ in headers], ') == %s:' % expected)
+        fragment.push_indent()
+        fields = [(field.path, self.layout_field_value(field, name))
+                  for name, field in zip(names, layout.items) if isinstance(field, LayoutField)]
+        fragment.write_line('return {')
+        self.write_layout_value(fragment, fields, 0)
+        fragment.write_line('}')
+        fragment.pop_indent()
+        fragment.pop_indent()
+
+    def layout_field_value(self, field, name):
+        """ Return an expression for the value of the LayoutField ``field``
+        unpacked into ``name``.
+        """
+        if field.kind == 'boolean':
+            return '%s != 0' % name
+        elif field.kind == 'integer' and field.struct_code().endswith('s'):
+            return "int.from_bytes(%s, 'big', signed=True)" % name
+
+        return name
+
+    def write_layout_value(self, fragment, fields, depth):
+        """ Write the items of a dict literal of the (path, expression)
+        ``fields`` of a fixed layout, with nested dicts for components at
+        ``depth`` in their path that are SEQUENCEs or SETs themselves.
+        """
+        fragment.push_indent()
+        index = 0
+        while index < len(fields):
+            name = fields[index][0][depth]
+            nested = []
+            while index < len(fields) and fields[index][0][depth] == name:
+                nested.append(fields[index])
+                index += 1
+
+            if len(nested[0][0]) == depth + 1:
+                fragment.write_line("'%s': %s," % (name, nested[0][1]))
+            else:
+                fragment.write_line("'%s': {" % name)
+                self.write_layout_value(fragment, nested, depth + 1)
+                fragment.write_line('},')
+        fragment.pop_indent()
+
+    def decoder_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        components = self.resolve_components(t)
+        table_name = self.unique_name('_%s_ALTERNATIVES' % function_name[len(self.prefix):])
+        _, wildcard = self.generate_dispatch_table(table_name, components)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('name, decoder = %s[key]' % table_name)
+        fragment.pop_indent()
+        fragment.write_line('except KeyError:')
+        fragment.push_indent()
+        if wildcard:
+            fragment.write_line("name, decoder = '%s', %s" % wildcard)
+        elif any(isinstance(c, ExtensionMarker) for c in components):
+            fragment.write_line('return None, %s(data, key, constructed, offset, end)' %
+                                self.runtime_name('decode_any'))
+        else:
+            fragment.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+        fragment.pop_indent()
+        fragment.write_line('return name, decoder(data, key, constructed, offset, end)')
+        self.end_function(fragment)
+
+        return function_name
+
+    def generate_dispatch_table(self, table_name, components):
+        """ Generate a dict from tag key to component name and decoder for
+        a SET or CHOICE. Returns the components and the (name, decoder)
+        of a component that takes any tag, or None.
+        """
+        fields = [c for c in components if not isinstance(c, ExtensionMarker)]
+        entries = []
+        wildcard = None
+        for c in fields:
+            decoder = self.generate_component(c.identifier, c.type_decl)
+            keys = self.tag_keys(c.type_decl)
+            if keys is None:
+                wildcard = (c.identifier, decoder)
+                continue
+
+            for key in sorted(keys):
+                entries.append("%d: ('%s', %s),  # %s" % (key, c.identifier, decoder, ber.describe_tag(key)))
+
+        fragment = pygen.PythonFragment()
+        if entries:
+            fragment.write_line('%s = {' % table_name)
+            fragment.push_indent()
+            for entry in entries:
+                fragment.write_line(entry)
+            fragment.pop_indent()
+            fragment.write_line('}')
+        else:
+            fragment.write_line('%s = {}' % table_name)
+        self.module.tables.append(fragment)
+
+        return fields, wildcard
+
+    def decoder_collection_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        decoder = self.generate_component('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('items = []')
+        fragment.write_line('while offset < end:')
+        fragment.push_indent()
+        fragment.write_line(_READ_NEXT)
+        self.runtime_name('read_tlv')
+        self.write_tag_check(fragment, self.tag_keys(t.type_decl), 'item')
+        fragment.write_line('items.append(%s(data, key, constructed, start, stop))' % decoder)
+        fragment.pop_indent()
+        fragment.write_line('return items')
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_tag_check(self, fragment, keys, name=None):
+        """ Write a check that the tag key of the value just read is one of
+        ``keys``.
+        """
+        if keys is None:
+            test = 'key is None'
+        elif len(keys) == 1:
+            test = 'key != %d' % list(keys)[0]
+        else:
+            test = 'key not in %s' % self.key_set(keys)
+
+        description = self.description()
+        if name:
+            description += '.' + name
+
+        fragment.write_line('if %s:' % test)
+        fragment.push_indent()
+        fragment.write_line("raise unexpected_tag(key, '%s')" % description)
+        self.runtime_name('unexpected_tag')
+        fragment.pop_indent()
+
+    def key_test(self, keys):
+        """ Return a condition for the tag key of the value just read to be
+        one of ``keys``, or any tag if ``keys`` is None.
+        """
+        if keys is None:
+            return 'key is not None'
+        elif len(keys) == 1:
+            return 'key == %d' % list(keys)[0]
+
+        return 'key in %s' % self.key_set(keys)
+
+    def key_set(self, keys):
+        """ Return the name of a module-level frozenset of ``keys``, or
+        None if ``keys`` is None. Equal sets share a name.
+        """
+        if keys is None:
+            return 'None'
+
+        return self.module.constant('_TAGS', 'frozenset([%s])' % ', '.join(str(k) for k in sorted(keys)))
+
+    def union_keys(self, components):
+        keys = set()
+        for c in components:
+            if not isinstance(c, ExtensionMarker):
+                component_keys = self.tag_keys(c.type_decl)
+                if component_keys is None:
+                    return None
+                keys |= component_keys
+
+        return frozenset(keys)
+
+
+def generate_berdec(sema_module, out_stream, referenced_modules, records=(), validators=False, fixed_layouts=True):
+    backend_classes = [BerDecoderBackend, ValidatorBackend] if validators else [BerDecoderBackend]
+    return generate_codec(sema_module, out_stream, referenced_modules, backend_classes, records=records,
+                          fixed_layouts=fixed_layouts)
+
+
+# Read the next value of a constructed value in generated decoders.
+_READ_NEXT = 'key, constructed, start, stop, offset = read_tlv(data, offset, end)'
+
+# Contents decoders for built-in types in asn1ate.support.ber
+_BUILTIN_DECODERS = {
+    'ANY': 'decode_any',
+    'INTEGER': 'decode_integer',
+    'BOOLEAN': 'decode_boolean',
+    'NULL': 'decode_null',
+    'ENUMERATED': 'decode_integer',
+    'REAL': 'decode_real',
+    'BIT STRING': 'decode_bit_string',
+    'OCTET STRING': 'decode_octet_string',
+    'OBJECT IDENTIFIER': 'decode_object_identifier',
+    'UTF8String': 'decode_utf8_string',
+    'GeneralString': 'decode_string',
+    'NumericString': 'decode_string',
+    'PrintableString': 'decode_string',
+    'IA5String': 'decode_string',
+    'GraphicString': 'decode_string',
+    'GeneralizedTime': 'decode_string',
+    'UTCTime': 'decode_string',
+    'ObjectDescriptor': 'decode_string',
+    'VisibleString': 'decode_string',
+    'TeletexString': 'decode_string',
+    'UniversalString': 'decode_universal_string',
+    'BMPString': 'decode_bmp_string',
+    'T61String': 'decode_string',
+    'VideotexString': 'decode_string',
+}
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.berdecgen',
+                         'Generate specialized BER decoders from an ASN.1 definition file.',
+                         generate_berdec,
+                         [codecgen.RECORDS_ARG,
+                          ('--validators', dict(action='store_true',
+                                                help='also generate validators of constraints, as '
+                                                     'asn1ate.validgen does'))],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,708 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import print_function  # Python 2 compatibility
+import sys
+import argparse
+import textwrap
+from asn1ate import parser, __version__
+from asn1ate.support import ber, pygen
+from asn1ate.support.pygen import StringIO
+from asn1ate.sema import *
+from asn1ate.pyasn1gen import _sanitize_identifier, _sanitize_module
+
+
+class CodecModule(object):
+    """ Sections of a generated codec module, shared by the backends that
+    generate into it, e.g. BER decoders and DER encoders for the same
+    types. Code is collected per section, and written out once all names
+    used from the runtime and other modules are known.
+    """
+
+    def __init__(self, runtime_module):
+        self.runtime_module = runtime_module
+        self.runtime_names = set()
+        self.imported_modules = set()
+        self.private_names = set()
+        self.constants = {}
+        self.classes = {}
+        self.functions = []
+        self.aliases = []
+        self.tables = []
+        self.public_functions = []
+        self.registries = []
+
+    def unique_name(self, name):
+        """ Return ``name`` as an identifier, with a number appended if
+        needed to make it unique among private module-level names, and
+        reserve it.
+        """
+        name = _sanitize_identifier(name)
+        unique_name, suffix = name, 1
+        while unique_name in self.private_names:
+            suffix += 1
+            unique_name = '%s%d' % (name, suffix)
+
+        self.private_names.add(unique_name)
+        return unique_name
+
+    def constant(self, prefix, expression):
+        """ Return the name of a module-level constant with the value of
+        ``expression``, ``prefix`` with a number appended. Equal expressions
+        share a constant, also across backends.
+        """
+        constants = self.constants.setdefault(prefix, {})
+        if expression not in constants:
+            name = self.unique_name('%s%d' % (prefix, len(constants) + 1))
+            constants[expression] = name
+            self.tables.append('%s = %s' % (name, expression))
+
+        return constants[expression]
+
+    def write(self, writer):
+        fragment = writer.get_fragment()
+        import_list = ', '.join(sorted(self.runtime_names))
+        if len(import_list) > 80:
+            fragment.write_line('from %s import (' % self.runtime_module)
+            fragment.push_indent()
+            fragment.write_block('\n'.join(textwrap.wrap(import_list, 100)))
+            fragment.pop_indent()
+            fragment.write_line(')')
+        elif import_list:
+            fragment.write_line('from %s import %s' % (self.runtime_module, import_list))
+        for module_name in sorted(self.imported_modules):
+            fragment.write_line('import ' + module_name)
+        if import_list or self.imported_modules:
+            fragment.write_blanks(2)
+
+        for function in self.functions:
+            fragment.write_block(function)
+            fragment.write_blanks(2)
+
+        if self.aliases:
+            for alias in self.aliases:
+                fragment.write_line(alias)
+            fragment.write_blanks(2)
+
+        for table in self.tables:
+            fragment.write_block(table)
+            fragment.write_blanks(1)
+        if self.tables:
+            fragment.write_blanks(1)
+
+        for function in self.public_functions:
+            fragment.write_block(function)
+            fragment.write_blanks(2)
+
+        for index, (registry_name, entries) in enumerate(self.registries):
+            if index:
+                fragment.write_blanks(2)
+            fragment.write_line('%s = {' % registry_name)
+            fragment.push_indent()
+            fragment.write_enumeration(entries)
+            fragment.pop_indent()
+            fragment.write_line('}')
+
+        writer.write_code(fragment)
+
+
+class CodecBackend(object):
+    """ Base class for backends that generate a function per type to
+    encode or decode its values, e.g. ``BerDecoderBackend``.
+
+    Subclasses set ``prefix`` and ``parameters`` of the private function
+    generated for each type, ``runtime_module``, the module generated code
+    imports its runtime support from, and ``generators``, which map
+    semantic node types to methods that return the name of the function for
+    a type, generating it if needed. Every type assignment gets a function
+    named ``prefix`` + type name, possibly an alias of another function, and
+    every anonymous inline type that needs a function of its own gets one
+    named after the assignment and the component path.
+    """
+
+    runtime_module = 'asn1ate.support.ber'
+    prefix = None
+    parameters = None
+
+    def __init__(self, sema_module, module, referenced_modules):
+        self.sema_module = sema_module
+        self.module = module
+        self.referenced_modules = referenced_modules
+        self.thunks = {}
+        self.generators = {}
+
+        self.assignment_name = None
+        self.type_name = None
+        self.component_path = []
+
+    def generate_code(self):
+        type_assignments = [a for component in dependency_sort(self.sema_module.assignments) for a in component
+                            if isinstance(a, TypeAssignment)]
+
+        # Reserve the names of assignment functions, so functions for
+        # inline types can't take them.
+        for assignment in type_assignments:
+            self.module.private_names.add(self.prefix + _sanitize_identifier(assignment.type_name))
+
+        entries = []
+        for assignment in type_assignments:
+            python_name = _sanitize_identifier(assignment.type_name)
+            self.assignment_name = python_name
+            self.type_name = assignment.type_name
+
+            function_name = self.prefix + python_name
+            generated_name = self.generate(assignment.type_decl, function_name)
+            if generated_name != function_name:
+                self.module.aliases.append('%s = %s' % (function_name, generated_name))
+
+            public_name, public_function = self.generate_public_function(assignment, python_name)
+            self.module.public_functions.append(public_function)
+            entries.append("'%s': %s" % (assignment.type_name, public_name))
+
+        self.module.registries.append((self.registry_name, entries))
+
+    def generate_public_function(self, assignment, python_name):
+        """ Return the name and code of the public function for the type
+        assignment ``assignment``.
+        """
+        raise NotImplementedError()
+
+    def generate(self, t, function_name=None):
+        """ Return the name of the function for the type ``t``. Types that
+        need a function of their own get one named ``function_name``, or
+        after the component path if None.
+        """
+        generator = self.generators[type(t)]
+        return generator(t, function_name)
+
+    def generate_component(self, name, t):
+        """ Like ``generate``, for the type ``t`` of the component ``name``. """
+        self.component_path.append(name)
+        try:
+            return self.generate(t)
+        finally:
+            self.component_path.pop()
+
+    def function_name(self, function_name):
+        if function_name is None:
+            function_name = self.unique_name(self.prefix + '_'.join([self.assignment_name] + self.component_path))
+
+        return function_name
+
+    def description(self):
+        """ Describe the type being generated in error messages. """
+        return '.'.join([self.type_name] + self.component_path)
+
+    def unique_name(self, name):
+        return self.module.unique_name(name)
+
+    def runtime_name(self, name):
+        """ Return ``name`` from the runtime module, imported by the
+        generated module.
+        """
+        self.module.runtime_names.add(name)
+        return name
+
+    def start_function(self, function_name):
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(%s):' % (function_name, self.parameters))
+        fragment.push_indent()
+        return fragment
+
+    def end_function(self, fragment):
+        fragment.pop_indent()
+        self.module.functions.append(fragment)
+
+    def generate_defined_type(self, t, function_name):
+        module_name = self.sema_module.resolve_reference(t.type_name, t.module_ref)
+        target = self.prefix + _sanitize_identifier(t.type_name)
+        if module_name is None or module_name == self.sema_module.name:
+            return target
+
+        # Call functions in other modules through a local function, so
+        # tables built at import time don't need the other module to be
+        # initialized, e.g. with circular imports.
+        key = (module_name, t.type_name)
+        if key not in self.thunks:
+            module = _sanitize_module(module_name)
+            self.module.imported_modules.add(module)
+            thunk = self.unique_name('%s%s_%s' % (self.prefix, module, _sanitize_identifier(t.type_name)))
+
+            fragment = self.start_function(thunk)
+            fragment.write_line('return %s.%s(%s)' % (module, target, self.parameters))
+            self.end_function(fragment)
+            self.thunks[key] = thunk
+
+        return self.thunks[key]
+
+    def generate_selection_type(self, t, function_name):
+        selected_type = self.sema_module.resolve_selection_type(t)
+        if selected_type is None:
+            raise Exception('Found no member %s in %s' % (t.identifier, t.type_decl))
+
+        return self.generate(selected_type, function_name)
+
+    def tag_keys(self, t, module=None, seen=frozenset()):
+        """ Return a frozenset of the keys of the tags values of the type
+        ``t`` can be encoded with, or None if they can have any tag.
+        References in ``t`` are resolved in ``module``.
+        """
+        module = module or self.sema_module
+        if isinstance(t, TaggedType):
+            return frozenset([self.tag_key(t)])
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.referenced_type(t, module, seen)
+            return self.tag_keys(type_decl, defining_module, seen | set([(defining_module.name, id(type_decl))]))
+        elif isinstance(t, ChoiceType):
+            # Untagged CHOICEs have the tags of their alternatives.
+            keys = set()
+            for c in module.resolve_components(t, self.referenced_modules):
+                if not isinstance(c, ExtensionMarker):
+                    component_keys = self.tag_keys(c.type_decl, module, seen)
+                    if component_keys is None:
+                        return None
+                    keys |= component_keys
+            return frozenset(keys)
+
+        number = UNIVERSAL_TAGS.get(t.type_name)
+        if number is None:
+            return None  # ANY, or an unknown type
+
+        return frozenset([ber.tag_key(ber.UNIVERSAL, number)])
+
+    def identifier(self, t, module=None, seen=frozenset()):
+        """ Return the (tag key, constructed) of the identifier values of
+        the type ``t`` are encoded with, or None for untagged CHOICE and
+        ANY types, where it depends on the value.
+        """
+        module = module or self.sema_module
+        if isinstance(t, TaggedType):
+            if self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+                return self.tag_key(t), True
+
+            tagged_identifier = self.identifier(t.type_decl, module, seen)
+            return self.tag_key(t), tagged_identifier is None or tagged_identifier[1]
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.referenced_type(t, module, seen)
+            return self.identifier(type_decl, defining_module, seen | set([(defining_module.name, id(type_decl))]))
+
+        keys = self.tag_keys(t, module, seen)
+        if keys is None or isinstance(t, ChoiceType):
+            return None
+
+        return list(keys)[0], isinstance(t, (ConstructedType, CollectionType))
+
+    def referenced_type(self, t, module, seen):
+        """ Return the module and type declaration the DefinedType or
+        SelectionType ``t`` refers to, in ``module``.
+        """
+        if isinstance(t, SelectionType):
+            return module, module.resolve_selection_type(t)
+
+        module_name = module.resolve_reference(t.type_name, t.module_ref)
+        defining_module = module.find_module(module_name or module.name, self.referenced_modules)
+        type_decl = defining_module.user_types()[t.type_name]
+        if (defining_module.name, id(type_decl)) in seen:
+            raise Exception('Circular type definition in %s' % t)
+
+        return defining_module, type_decl
+
+    def resolved_type(self, t, module=None):
+        """ Return the module and built-in type ``t`` resolves to, through
+        references and tags.
+        """
+        module, seen = module or self.sema_module, frozenset()
+        while True:
+            if isinstance(t, TaggedType):
+                t = t.type_decl
+            elif isinstance(t, ReferencedType):
+                module, t = self.referenced_type(t, module, seen)
+                seen |= set([(module.name, id(t))])
+            else:
+                return module, t
+
+    def tag_key(self, t):
+        return ber.tag_key(_TAG_CLASSES.get(t.class_name, ber.CONTEXT), int(t.class_number))
+
+    def tag_implicitness(self, t, module=None):
+        # Tags on CHOICE and ANY types are always explicit, also when they
+        # are referenced by name, see X.680, 31.2.7.
+        module = module or self.sema_module
+        tagged_type_decl = module.resolve_type_decl(t.type_decl, self.referenced_modules)
+        if isinstance(tagged_type_decl, SimpleType) and tagged_type_decl.type_name == 'ANY':
+            return TagImplicitness.EXPLICIT
+
+        return module.resolve_tag_implicitness(t.implicitness, tagged_type_decl)
+
+    def canonical_order(self, component):
+        """ Sort key for the canonical order of components, by tag class
+        and number, see X.680, 8.6. Untagged CHOICEs sort by their smallest
+        tag, and components that can have any tag sort last.
+        """
+        keys = self.tag_keys(component.type_decl)
+        if keys is None:
+            return (4, 0)
+
+        return min((key & 3, key >> 2) for key in keys)
+
+    def constraints(self, t):
+        return self.sema_module.effective_constraints(t, self.referenced_modules)
+
+    def resolve_components(self, t):
+        return self.sema_module.resolve_components(t, self.referenced_modules)
+
+    def default_literal(self, component):
+        """ Return a Python literal for the DEFAULT value of ``component``,
+        or None if it has none, or it isn't a number or boolean.
+        """
+        value = component.default_value
+        if value is None:
+            return None
+        elif value in ('TRUE', 'FALSE'):
+            return str(value == 'TRUE')
+
+        # Named numbers of the component type
+        module, type_decl = self.sema_module, component.type_decl
+        while True:
+            module, type_decl = module.resolve_type_decl_with_module(type_decl, self.referenced_modules)
+            if not isinstance(type_decl, TaggedType):
+                break
+            type_decl = type_decl.type_decl
+
+        if isinstance(type_decl, ValueListType):
+            for named_value in type_decl.named_values:
+                if isinstance(named_value, NamedValue) and named_value.identifier == getattr(value, 'name', value):
+                    return str(int(named_value.value))
+
+        try:
+            return str(int(self.sema_module.resolve_value(value, self.referenced_modules)))
+        except (TypeError, ValueError):
+            return None
+
+    def fixed_layout(self, t):
+        """ Return the FixedLayout of the contents of the DER encoding of
+        the SEQUENCE or SET ``t``, or None if their size or identifier and
+        length octets depend on the value.
+        """
+        if not isinstance(t, (SequenceType, SetType)):
+            return None
+
+        items = self.layout_contents(t, self.sema_module, (), frozenset(), [])
+        if not items:
+            return None
+
+        return FixedLayout(items)
+
+    def layout_struct(self, layout):
+        """ Return the name of a module-level ``struct.Struct`` to pack and
+        unpack the FixedLayout ``layout`` with.
+        """
+        self.module.imported_modules.add('struct')
+        return self.module.constant('_LAYOUT', "struct.Struct('%s')" % layout.struct_format())
+
+    def layout_encoding(self, t, module, path, seen, constraints=None):
+        """ Return the items of the complete DER encoding of values of the
+        type ``t``, at ``path`` in the value of the type of a fixed layout,
+        or None if it has no fixed layout. ``seen`` are the keys of the
+        referenced types being laid out, and ``constraints`` the effective
+        constraints of a reference to ``t``, if any.
+        """
+        if constraints is None:
+            constraints = module.effective_constraints(t, self.referenced_modules)
+
+        identifier = self.identifier(t, module)
+        if identifier is None:
+            return None
+        elif isinstance(t, TaggedType) and self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+            contents = self.layout_encoding(t.type_decl, module, path, seen, constraints)
+        else:
+            contents = self.layout_contents(t, module, path, seen, constraints)
+        if contents is None:
+            return None
+
+        size = sum(len(item) if isinstance(item, bytes) else item.size for item in contents)
+        return [ber.encode_header(identifier[0], identifier[1], size)] + contents
+
+    def layout_contents(self, t, module, path, seen, constraints):
+        """ Like ``layout_encoding``, for the contents octets only. """
+        if isinstance(t, TaggedType):
+            if self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+                return self.layout_encoding(t.type_decl, module, path, seen, constraints)
+            return self.layout_contents(t.type_decl, module, path, seen, constraints)
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.referenced_type(t, module, frozenset())
+            key = (defining_module.name, id(type_decl))
+            if key in seen:
+                return None
+            return self.layout_contents(type_decl, defining_module, path, seen | set([key]), constraints)
+        elif isinstance(t, (SequenceType, SetType)):
+            components = [c for c in module.resolve_components(t, self.referenced_modules)
+                          if not isinstance(c, ExtensionMarker)]
+            if not components or any(c.optional or c.default_value is not None for c in components):
+                return None
+            if isinstance(t, SetType):
+                components = sorted(components, key=self.canonical_order)
+
+            items = []
+            for c in components:
+                component_items = self.layout_encoding(c.type_decl, module, path + (c.identifier,), seen)
+                if component_items is None:
+                    return None
+                items.extend(component_items)
+            return items
+        elif not isinstance(t, (SimpleType, ValueListType)):
+            return None
+
+        if t.type_name == 'BOOLEAN':
+            return [LayoutField(path, 'boolean', 1)]
+        elif t.type_name == 'ENUMERATED' and isinstance(t, ValueListType):
+            values = [int(v.value) for v in t.named_values if isinstance(v, NamedValue)]
+            lower, upper = min(values), max(values)
+        elif t.type_name == 'INTEGER':
+            lower, upper = None, None
+            for c in constraints:
+                if not isinstance(c, SizeConstraint):
+                    lower, upper = _bounds(c)
+            if lower is None or upper is None:
+                return None
+        elif t.type_name == 'OCTET STRING':
+            for c in constraints:
+                if isinstance(c, SizeConstraint):
+                    lower, upper = _bounds(c.nested)
+                    if lower is not None and lower == upper:
+                        return [LayoutField(path, 'octets', lower)]
+            return None
+        else:
+            return None
+
+        # DER INTEGERs take as few octets as possible, so bounds that take
+        # the same number of octets only bound values of that size if zero
+        # is outside them, or they take a single octet.
+        size = _integer_size(lower)
+        if _integer_size(upper) != size or (size > 1 and lower < 0 <= upper):
+            return None
+
+        return [LayoutField(path, 'integer', size, lower, upper)]
+
+
+def generate_codec(sema_module, out_stream, referenced_modules, backend_classes, **options):
+    """ Generate a module with the code of all ``backend_classes``, which
+    are ``CodecBackend`` subclasses, for ``sema_module``. ``options`` are
+    passed on to the backends.
+    """
+    module = CodecModule(backend_classes[0].runtime_module)
+    for backend_class in backend_classes:
+        backend_class(sema_module, module, referenced_modules, **options).generate_code()
+
+    module.write(pygen.PythonWriter(out_stream))
+
+
+# The --records option of backends that generate streaming readers.
+RECORDS_ARG = ('--records', dict(metavar='NAMES', default='',
+                                 help='comma-separated names of types to generate streaming readers for, '
+                                      'for files of concatenated values'))
+
+
+def main(prog, description, generate, extra_args=(), argv=None):
+    """ A simplistic command-line driver for the backends. ``generate``
+    is called like ``generate_codec`` without backend classes, for every
+    module of the ASN.1 file, with the values of ``extra_args``, pairs of
+    an option name and the keyword arguments of ``add_argument``, as
+    options. ``--records`` is turned into a set of type names.
+    """
+    arg_parser = argparse.ArgumentParser(prog=prog, description=description + ' Output to stdout by default.')
+    arg_parser.add_argument('file', help='the ASN.1 file to process')
+    arg_parser.add_argument('--split', action='store_true',
+                            help='output multiple modules to separate files')
+    for name, keywords in extra_args:
+        arg_parser.add_argument(name, **keywords)
+    args = arg_parser.parse_args(argv)
+
+    with open(args.file, 'r') as data:
+        asn1def = data.read()
+
+    modules = build_semantic_model(parser.parse_asn1(asn1def))
+    options = dict((name, value) for name, value in vars(args).items() if name not in ('file', 'split'))
+    if 'records' in options:
+        records = set(name.strip() for name in options['records'].split(',') if name.strip())
+        type_names = set(a.type_name for module in modules for a in module.assignments
+                         if isinstance(a, TypeAssignment))
+        for name in sorted(records - type_names):
+            arg_parser.error('unknown type %s' % name)
+        options['records'] = records
+    if len(modules) > 1 and not args.split:
+        print('WARNING: More than one module generated to the same stream.', file=sys.stderr)
+
+    header = pygen.auto_generated_header(args.file, __version__)
+    for module in modules:
+        output_file = StringIO()
+        print(header, file=output_file)
+        generate(module, output_file, modules, **options)
+        if args.split:
+            pygen.write_file_atomically(_sanitize_module(module.name) + '.py', output_file.getvalue())
+        else:
+            sys.stdout.write(output_file.getvalue())
+
+    return 0
+
+
+class FixedLayout(object):
+    """ The layout of DER encodings that have the same size and identifier
+    and length octets for all values, e.g. of a SEQUENCE of BOOLEANs,
+    OCTET STRINGs of a fixed size and INTEGERs with bounds that take the
+    same number of octets. Such encodings can be packed and unpacked with
+    a single ``struct.Struct``.
+
+    ``items`` are the parts of the encoding in order: bytes for constant
+    identifier and length octets, merged where they are adjacent, and
+    LayoutFields for the contents of simple components.
+    """
+
+    def __init__(self, items):
+        self.items = []
+        for item in items:
+            if isinstance(item, bytes) and self.items and isinstance(self.items[-1], bytes):
+                self.items[-1] += item
+            else:
+                self.items.append(item)
+
+        self.fields = [item for item in self.items if isinstance(item, LayoutField)]
+        self.size = sum(len(item) if isinstance(item, bytes) else item.size for item in self.items)
+
+    def struct_format(self):
+        return '>' + ''.join('%ds' % len(item) if isinstance(item, bytes) else item.struct_code()
+                             for item in self.items)
+
+    def names(self):
+        """ Return a local variable name for every item, ``h`` and a number
+        for constant octets, and ``f_`` and the component path for fields,
+        which can't shadow names generated code uses.
+        """
+        names = []
+        for index, item in enumerate(self.items):
+            if isinstance(item, bytes):
+                name = 'h%d' % index
+            else:
+                name = 'f_' + '_'.join(item.path).replace('-', '_')
+            while name in names:
+                name += '_'
+            names.append(name)
+
+        return names
+
+
+class LayoutField(object):
+    """ The contents of the simple component at ``path`` in a FixedLayout,
+    ``size`` octets of a ``kind`` of value: 'boolean', 'integer' between
+    ``lower`` and ``upper``, or 'octets'.
+    """
+
+    def __init__(self, path, kind, size, lower=None, upper=None):
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.lower = lower
+        self.upper = upper
+
+    def struct_code(self):
+        if self.kind == 'boolean':
+            return 'B'
+        elif self.kind == 'integer' and self.size in _STRUCT_INTEGER_CODES:
+            return _STRUCT_INTEGER_CODES[self.size]
+
+        return '%ds' % self.size
+
+
+def bytes_literal(octets):
+    """ Return a bytes literal of ``octets``, with every octet escaped. """
+    return "b'%s'" % ''.join('\\x%02x' % octet for octet in bytearray(octets))
+
+
+def _write_items(fragment, start, items, end):
+    """ Write ``start``, the comma-separated ``items`` and ``end``, with
+    the items on lines of their own if they don't fit on one line.
+    """
+    line = start + ', '.join(items) + end
+    if len(line) <= _LINE_LENGTH:
+        fragment.write_line(line)
+        return
+
+    # Lines break between items only, which may have spaces themselves.
+    fragment.write_line(start)
+    fragment.push_indent()
+    line = ''
+    for item in items:
+        if line and len(line) + len(item) + 3 > _LINE_LENGTH:
+            fragment.write_line(line + ',')
+            line = item
+        else:
+            line = line + ', ' + item if line else item
+    fragment.write_line(line)
+    fragment.pop_indent()
+    fragment.write_line(end)
+
+
+def _integer_size(value):
+    """ Return the size of the two's complement contents of an INTEGER. """
+    return (value if value >= 0 else ~value).bit_length() // 8 + 1
+
+
+def _bounds(constraint):
+    """ Return the (lower, upper) bounds of a single value or value range
+    constraint, with None for MIN, MAX and bounds that aren't integers.
+    """
+    if isinstance(constraint, SingleValueConstraint):
+        values = constraint.value, constraint.value
+    elif isinstance(constraint, ValueRangeConstraint):
+        values = constraint.min_value, constraint.max_value
+    else:
+        return None, None
+
+    bounds = []
+    for value in values:
+        try:
+            bounds.append(int(value))
+        except (TypeError, ValueError):
+            bounds.append(None)
+
+    return tuple(bounds)
+
+
+_TAG_CLASSES = {
+    'UNIVERSAL': ber.UNIVERSAL,
+    'APPLICATION': ber.APPLICATION,
+    'PRIVATE': ber.PRIVATE
+}
+
+# Length of lines generated code wraps long lists of items at.
+_LINE_LENGTH = 100
+
+# Codes of big-endian struct formats for INTEGERs by size
+_STRUCT_INTEGER_CODES = {
+    1: 'b',
+    2: 'h',
+    4: 'i',
+    8: 'q',
+}
@@ -0,0 +1,525 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import ber, pygen
+from asn1ate.sema import *
+from asn1ate.pyasn1gen import _sanitize_identifier
+from asn1ate.berdecgen import BerDecoderBackend, _READ_NEXT
+from asn1ate.codecgen import generate_codec, _bounds
+
+
+class ColumnDecoderBackend(BerDecoderBackend):
+    """ Backend to generate batch decoders, which decode concatenated BER
+    values of a SEQUENCE or SET type into a NumPy array per component, e.g.
+
+        # Cdr ::= SEQUENCE {
+        #     duration [0] INTEGER (0..65535),
+        #     imsi [1] OCTET STRING (SIZE(8)) OPTIONAL
+        # }
+        def decode_Cdr_columns(data, offset=0, count=None):
+            ...
+            column1 = array.array('H', bytes(2 * count))
+            column2 = bytearray(8 * count)
+            present2 = bytearray(count)
+            ...
+            for index in range(count):
+                ...
+                if key == 2:  # [0]
+                    column1[index] = int.from_bytes(data[start:stop], 'big', signed=True)
+                    ...
+
+    Columns are preallocated ``array`` and ``bytearray`` buffers, which
+    are wrapped in NumPy arrays without copying once all values are
+    decoded, so decoding creates no Python objects per record. Bounded
+    INTEGERs and ENUMERATEDs get the smallest integer type that holds all
+    their values, other INTEGERs int64, BOOLEANs and NULLs bool, REALs
+    float64, 8-bit character strings with a maximum size ``S<size>``, and
+    OCTET STRINGs with a maximum size ``V<size>``, which keeps all octets,
+    zeros included. OCTET STRINGs of varying size also get a column of
+    their sizes, named after the component with ``_length`` appended, and
+    values of fixed-size ones that have another size raise DecodeError.
+    Other components, and components with explicit tags, get object
+    columns of values as the BER decoders return them. OPTIONAL components
+    are masked arrays, masked where absent, and absent numeric and boolean
+    DEFAULT components get their default value.
+
+    Batch decoders are generated along with the BER decoders, for every
+    SEQUENCE and SET type assignment. ``decode_<Type>_columns(data,
+    offset=0, count=None)`` decodes ``count`` values from ``offset`` in
+    ``data``, or all values to the end, and returns a dict of arrays by
+    component name. ``<Type>_DTYPE`` is a NumPy structured dtype with the
+    same fields, and ``COLUMN_DECODERS`` maps type names to batch decoders.
+    The generated code requires NumPy.
+    """
+
+    def __init__(self, sema_module, module, referenced_modules, records=()):
+        super(ColumnDecoderBackend, self).__init__(sema_module, module, referenced_modules, records)
+        self.component_decoders = {}
+
+    def generate_code(self):
+        super(ColumnDecoderBackend, self).generate_code()
+
+        entries = []
+        for component in dependency_sort(self.sema_module.assignments):
+            for assignment in component:
+                if not isinstance(assignment, TypeAssignment):
+                    continue
+
+                record = self.record_type(assignment.type_decl)
+                if record is None:
+                    continue
+
+                self.assignment_name = _sanitize_identifier(assignment.type_name)
+                self.type_name = assignment.type_name
+                public_name = self.generate_columns(assignment, *record)
+                entries.append("'%s': %s" % (assignment.type_name, public_name))
+
+        self.module.registries.append(('COLUMN_DECODERS', entries))
+
+    def generate_component(self, name, t):
+        # Object columns reuse the decoders of components generated for
+        # the BER decoders.
+        if id(t) not in self.component_decoders:
+            self.component_decoders[id(t)] = super(ColumnDecoderBackend, self).generate_component(name, t)
+
+        return self.component_decoders[id(t)]
+
+    def record_type(self, t):
+        """ Return the SEQUENCE or SET type declaration ``t`` resolves to,
+        and the tag keys of the values inside each explicit tag on the way,
+        or None if it's not a SEQUENCE or SET in this module.
+        """
+        module, seen = self.sema_module, frozenset()
+        unwrap_keys = []
+        while True:
+            if isinstance(t, TaggedType):
+                if self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+                    unwrap_keys.append(self.tag_keys(t.type_decl, module))
+                t = t.type_decl
+            elif isinstance(t, ReferencedType):
+                module, t = self.referenced_type(t, module, seen)
+                seen |= set([(module.name, id(t))])
+            elif isinstance(t, (SequenceType, SetType)) and module is self.sema_module:
+                return t, unwrap_keys
+            else:
+                return None
+
+    def builtin_type(self, t):
+        """ Return the built-in type whose contents octets encode values of
+        ``t``, or None if ``t`` is constructed or explicitly tagged.
+        """
+        module, seen = self.sema_module, frozenset()
+        while True:
+            if isinstance(t, TaggedType):
+                if self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+                    return None
+                t = t.type_decl
+            elif isinstance(t, ReferencedType):
+                module, t = self.referenced_type(t, module, seen)
+                seen |= set([(module.name, id(t))])
+            elif isinstance(t, (SimpleType, ValueListType, BitStringType)):
+                return t
+            else:
+                return None
+
+    def column_type(self, component):
+        """ Return the kind of column for values of ``component``, 'array',
+        'bool', 'bytes', 'octets' or 'object', and the array typecode, the
+        size of character strings or the size bounds of OCTET STRINGs.
+        """
+        t = self.builtin_type(component.type_decl)
+        type_name = t.type_name if t is not None else None
+        if type_name == 'ENUMERATED':
+            values = [int(v.value) for v in t.named_values if isinstance(v, NamedValue)]
+            if any(isinstance(v, ExtensionMarker) for v in t.named_values):
+                return 'array', 'q'  # Unknown extensions can have any value
+
+            return 'array', _integer_typecode(min(values), max(values))
+        elif type_name == 'INTEGER':
+            for c in self.constraints(component.type_decl):
+                if not isinstance(c, SizeConstraint):
+                    typecode = _integer_typecode(*_bounds(c))
+                    return ('array', typecode) if typecode else ('object', None)
+            return 'array', 'q'
+        elif type_name in ('BOOLEAN', 'NULL'):
+            return 'bool', None
+        elif type_name == 'REAL':
+            return 'array', 'd'
+        elif type_name in _BYTES_TYPES:
+            for c in self.constraints(component.type_decl):
+                if isinstance(c, SizeConstraint):
+                    lower, upper = _bounds(c.nested)
+                    if upper and type_name == 'OCTET STRING':
+                        return 'octets', (lower, upper)
+                    elif upper:
+                        return 'bytes', upper
+
+        return 'object', None
+
+    def generate_columns(self, assignment, t, unwrap_keys):
+        """ Generate the batch decoder and dtype of the type assignment
+        ``assignment`` of the SEQUENCE or SET ``t``, and return the name
+        of the decoder.
+        """
+        python_name = self.assignment_name
+        public_name = 'decode_%s_columns' % python_name
+        self.module.imported_modules.update(['array', 'numpy'])
+
+        columns = []
+        for c in self.resolve_components(t):
+            if not isinstance(c, ExtensionMarker):
+                kind, detail = self.column_type(c)
+                columns.append(_Column(len(columns) + 1, c, kind, detail, self.default_literal(c)))
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(data, offset=0, count=None):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('if not isinstance(data, memoryview):')
+        fragment.push_indent()
+        fragment.write_line('data = memoryview(data)')
+        fragment.pop_indent()
+        fragment.write_line('if count is None:')
+        fragment.push_indent()
+        fragment.write_line('count = %s(data, offset)' % self.runtime_name('count_records'))
+        fragment.pop_indent()
+        for column in columns:
+            fragment.write_line('%s = %s' % (column.name, column.allocation()))
+            if column.lengths:
+                fragment.write_line("%s = array.array('%s', bytes(%d * count))" %
+                                    (column.lengths, column.lengths_typecode, _ITEM_SIZES[column.lengths_typecode]))
+            if column.masked:
+                fragment.write_line('%s = bytearray(count)' % column.present)
+
+        fragment.write_line('data_end = len(data)')
+        fragment.write_line('next_offset = offset')
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('for index in range(count):')
+        fragment.push_indent()
+        fragment.write_line('key, constructed, offset, end, next_offset = %s(data, next_offset, data_end)' %
+                            self.runtime_name('read_tlv'))
+        self.write_tag_check(fragment, self.tag_keys(assignment.type_decl))
+        for keys in unwrap_keys:
+            fragment.write_line('key, constructed, offset, end, _ = read_tlv(data, offset, end)')
+            self.write_tag_check(fragment, keys)
+
+        if isinstance(t, SetType):
+            self.write_set_record(fragment, t, columns)
+        else:
+            self.write_sequence_record(fragment, t, columns)
+        fragment.pop_indent()
+        fragment.pop_indent()
+
+        fragment.write_line('except OverflowError:')
+        fragment.push_indent()
+        fragment.write_line("raise DecodeError('Value out of range of its column in %s %%d' %% index)" %
+                            self.description())
+        self.runtime_name('DecodeError')
+        fragment.pop_indent()
+
+        fragment.write_line('return {')
+        fragment.push_indent()
+        for column in columns:
+            for name, _, result in column.fields():
+                fragment.write_line("'%s': %s," % (name, result))
+        fragment.pop_indent()
+        fragment.write_line('}')
+        fragment.pop_indent()
+        self.module.public_functions.append(fragment)
+
+        dtype = pygen.PythonFragment()
+        dtype.write_line('%s_DTYPE = numpy.dtype([' % python_name)
+        dtype.push_indent()
+        for column in columns:
+            for name, field_dtype, _ in column.fields():
+                dtype.write_line("('%s', %r)," % (name, field_dtype))
+        dtype.pop_indent()
+        dtype.write_line('])')
+        self.module.tables.append(dtype)
+
+        return public_name
+
+    def write_sequence_record(self, fragment, t, columns):
+        """ Write code to store the components of a record of the SEQUENCE
+        ``t`` in ``columns``, like the BER decoder of ``t`` decodes them.
+        """
+        fragment.write_line(_READ_NEXT)
+        components = self.resolve_components(t)
+        extensible = False
+        for index, c in enumerate(components):
+            if isinstance(c, ExtensionMarker):
+                extensible = True
+                continue
+
+            column = next(column for column in columns if column.component is c)
+            keys = self.tag_keys(c.type_decl)
+            if extensible:
+                # Skip unknown extensions ahead of the remaining components.
+                remaining_keys = self.union_keys(components[index:])
+                if remaining_keys is not None:
+                    fragment.write_line('while key is not None and key not in %s:' % self.key_set(remaining_keys))
+                    fragment.push_indent()
+                    fragment.write_line(_READ_NEXT)
+                    fragment.pop_indent()
+
+            comment = '  # %s' % ber.describe_tag(list(keys)[0]) if keys is not None and len(keys) == 1 else ''
+            fragment.write_line('if %s:%s' % (self.key_test(keys), comment))
+            fragment.push_indent()
+            self.write_store(fragment, column)
+            fragment.write_line(_READ_NEXT)
+            fragment.pop_indent()
+            if not c.optional and c.default_value is None:
+                fragment.write_line('else:')
+                fragment.push_indent()
+                fragment.write_line("raise DecodeError('Missing component %s of %s')" % (c.identifier,
+                                                                                        self.description()))
+                fragment.pop_indent()
+
+        if not extensible:
+            fragment.write_line('if key is not None:')
+            fragment.push_indent()
+            fragment.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+            fragment.pop_indent()
+
+    def write_set_record(self, fragment, t, columns):
+        """ Write code to store the components of a record of the SET ``t``
+        in ``columns``, in any order. A bit per mandatory component records
+        which ones are present.
+        """
+        mandatory = [column for column in columns
+                     if not column.component.optional and column.component.default_value is None]
+        tagged = [column for column in columns if self.tag_keys(column.component.type_decl) is not None]
+        wildcards = [column for column in columns if column not in tagged]
+        extensible = any(isinstance(c, ExtensionMarker) for c in self.resolve_components(t))
+
+        if mandatory:
+            fragment.write_line('present = 0')
+        fragment.write_line(_READ_NEXT)
+        fragment.write_line('while key is not None:')
+        fragment.push_indent()
+        for index, column in enumerate(tagged + wildcards[:1]):
+            keys = self.tag_keys(column.component.type_decl)
+            if keys is not None:
+                comment = '  # %s' % ber.describe_tag(list(keys)[0]) if len(keys) == 1 else ''
+                fragment.write_line('%s %s:%s' % ('elif' if index else 'if', self.key_test(keys), comment))
+                fragment.push_indent()
+            elif index:
+                fragment.write_line('else:')
+                fragment.push_indent()
+
+            self.write_store(fragment, column)
+            if column in mandatory:
+                fragment.write_line('present |= %d' % (1 << mandatory.index(column)))
+            if keys is not None or index:
+                fragment.pop_indent()
+
+        if not wildcards and not extensible:
+            if tagged:
+                fragment.write_line('else:')
+                fragment.push_indent()
+            fragment.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+            if tagged:
+                fragment.pop_indent()
+        fragment.write_line(_READ_NEXT)
+        fragment.pop_indent()
+
+        for index, column in enumerate(mandatory):
+            fragment.write_line('if not present & %d:' % (1 << index))
+            fragment.push_indent()
+            fragment.write_line("raise DecodeError('Missing component %s of %s')" % (column.component.identifier,
+                                                                                    self.description()))
+            fragment.pop_indent()
+
+    def write_store(self, fragment, column):
+        """ Write code to store the value just read in ``column``. """
+        name = column.name
+        type_name = self.builtin_type(column.component.type_decl)
+        type_name = type_name.type_name if type_name is not None else None
+        if column.kind == 'array' and column.detail != 'd':
+            fragment.write_line("%s[index] = int.from_bytes(data[start:stop], 'big', signed=True)" % name)
+        elif column.kind == 'array':
+            fragment.write_line('%s[index] = %s(data, key, constructed, start, stop)' %
+                                (name, self.runtime_name('decode_real')))
+        elif column.kind == 'bool' and type_name == 'NULL':
+            fragment.write_line('%s[index] = 1' % name)
+        elif column.kind == 'bool':
+            fragment.write_line('%s[index] = start < stop and data[start] != 0' % name)
+        elif column.kind in ('bytes', 'octets'):
+            size = column.size
+            fragment.write_line('value = data[start:stop] if not constructed else %s(data, key, constructed, '
+                                'start, stop)' % self.runtime_name('decode_octet_string'))
+            if column.kind == 'octets' and not column.lengths:
+                # Without a column of sizes, shorter values would come back
+                # padded with zeros.
+                fragment.write_line('if len(value) != %d:' % size)
+                fragment.push_indent()
+                fragment.write_line("raise DecodeError('Size %%d of %s.%s is not %d' %% len(value))" %
+                                    (self.description(), column.component.identifier, size))
+            else:
+                fragment.write_line('if len(value) > %d:' % size)
+                fragment.push_indent()
+                fragment.write_line("raise DecodeError('Size %%d of %s.%s exceeds %d' %% len(value))" %
+                                    (self.description(), column.component.identifier, size))
+            fragment.pop_indent()
+            fragment.write_line('%s[index * %d:index * %d + len(value)] = value' % (name, size, size))
+            if column.lengths:
+                fragment.write_line('%s[index] = len(value)' % column.lengths)
+        else:
+            decoder = self.generate_component(column.component.identifier, column.component.type_decl)
+            fragment.write_line('%s[index] = %s(data, key, constructed, start, stop)' % (name, decoder))
+
+        if column.masked:
+            fragment.write_line('%s[index] = 1' % column.present)
+
+
+class _Column(object):
+    """ A column of a batch decoder, for values of ``component``. """
+
+    def __init__(self, number, component, kind, detail, default):
+        self.component = component
+        self.kind = kind
+        self.detail = detail
+        self.default = default if kind in ('array', 'bool') else None
+        self.masked = (component.optional or component.default_value is not None) and self.default is None
+        self.name = 'column%d' % number
+        self.present = 'present%d' % number
+
+        # OCTET STRINGs of varying size keep their sizes in a column of
+        # their own.
+        self.size = detail[1] if kind == 'octets' else detail
+        self.lengths = None
+        if kind == 'octets' and detail[0] != detail[1]:
+            self.lengths = 'lengths%d' % number
+            self.lengths_typecode = _integer_typecode(0, self.size)
+
+    def allocation(self):
+        """ Return an expression for the preallocated column. """
+        if self.kind == 'array':
+            if self.default not in (None, '0'):
+                return "array.array('%s', [%s]) * count" % (self.detail, self.default)
+            return "array.array('%s', bytes(%d * count))" % (self.detail, _ITEM_SIZES[self.detail])
+        elif self.kind == 'bool':
+            if self.default == 'True':
+                return 'bytearray(b\'\\x01\') * count'
+            return 'bytearray(count)'
+        elif self.kind in ('bytes', 'octets'):
+            return 'bytearray(%d * count)' % self.size
+
+        return 'numpy.empty(count, dtype=object)'
+
+    def dtype(self):
+        if self.kind == 'array':
+            return self.detail
+        elif self.kind == 'bool':
+            return '?'
+        elif self.kind == 'bytes':
+            return 'S%d' % self.size
+        elif self.kind == 'octets':
+            return 'V%d' % self.size
+
+        return 'O'
+
+    def fields(self):
+        """ Return the (name, dtype, expression) of the NumPy arrays of the
+        column, its sizes included.
+        """
+        identifier = self.component.identifier
+        fields = [(identifier, self.dtype(), self.result(self.name, self.dtype()))]
+        if self.lengths:
+            fields.append((identifier + '_length', self.lengths_typecode,
+                           self.result(self.lengths, self.lengths_typecode)))
+
+        return fields
+
+    def result(self, name, dtype):
+        """ Return an expression for the NumPy array of ``dtype`` of the
+        buffer ``name`` of the column.
+        """
+        if self.kind == 'object' and name == self.name:
+            array = name
+        else:
+            array = "numpy.frombuffer(%s, '%s')" % (name, dtype)
+
+        if self.masked:
+            return "numpy.ma.MaskedArray(%s, numpy.frombuffer(%s, '?') == 0)" % (array, self.present)
+
+        return array
+
+
+def _integer_typecode(lower, upper):
+    """ Return the typecode of the smallest array item that holds integers
+    from ``lower`` to ``upper``, with None for no bound, or None if none
+    holds them all.
+    """
+    if lower is None or upper is None:
+        return 'q'
+
+    for typecode, (minimum, maximum) in _INTEGER_RANGES:
+        if minimum <= lower and upper <= maximum:
+            return typecode
+
+    return None
+
+
+# Integer array typecodes, in order of size, with the C types NumPy also uses.
+_INTEGER_RANGES = [
+    ('B', (0, 0xff)),
+    ('b', (-0x80, 0x7f)),
+    ('H', (0, 0xffff)),
+    ('h', (-0x8000, 0x7fff)),
+    ('I', (0, 0xffffffff)),
+    ('i', (-0x80000000, 0x7fffffff)),
+    ('Q', (0, 0xffffffffffffffff)),
+    ('q', (-0x8000000000000000, 0x7fffffffffffffff)),
+]
+
+_ITEM_SIZES = {'B': 1, 'b': 1, 'H': 2, 'h': 2, 'I': 4, 'i': 4, 'Q': 8, 'q': 8, 'd': 8}
+
+# Types whose values are stored as raw contents octets, if their size is
+# bounded.
+_BYTES_TYPES = set(['OCTET STRING', 'NumericString', 'PrintableString', 'IA5String', 'VisibleString',
+                    'GeneralString', 'GraphicString', 'TeletexString', 'T61String', 'VideotexString'])
+
+
+def generate_columns(sema_module, out_stream, referenced_modules, records=()):
+    return generate_codec(sema_module, out_stream, referenced_modules, [ColumnDecoderBackend], records=records)
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.columngen',
+                         'Generate BER decoders that decode SEQUENCE and SET values into NumPy columns from an ASN.1 '
+                         'definition file.',
+                         generate_columns,
+                         [codecgen.RECORDS_ARG],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import print_function  # Python 2 compatibility
+
+import sys
+import argparse
+from asn1ate import parser
+from asn1ate.sema import build_semantic_model, DependencyIndex
+
+
+def _load_modules(path):
+    with open(path) as f:
+        asn1def = f.read()
+
+    return build_semantic_model(parser.parse_asn1(asn1def))
+
+
+def lookup_all(arg_parser, dependency_index, names):
+    """ Look up keys for names, as with ``DependencyIndex.lookup``, and
+    report unknown names through ``arg_parser``.
+    """
+    keys = []
+    for name in names:
+        matches = dependency_index.lookup(name)
+        if not matches:
+            arg_parser.error('unknown assignment: %s' % name)
+        keys.extend(matches)
+
+    return keys
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog='asn1ate deps',
+                                         description='Query the dependency graph of an ASN.1 definition. '
+                                                     'Names are reference names, optionally qualified as '
+                                                     'Module.name. Results are listed in dependency order.')
+    arg_parser.add_argument('file', help='the ASN.1 file to process')
+    group = arg_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--uses', metavar='NAME', action='append',
+                       help='list assignments that transitively use NAME (may be repeated)')
+    group.add_argument('--closure', metavar='NAME', action='append',
+                       help='list the assignments needed to define NAME, including itself (may be repeated)')
+    args = arg_parser.parse_args(argv)
+
+    dependency_index = DependencyIndex(_load_modules(args.file))
+    if args.uses:
+        keys = dependency_index.users(lookup_all(arg_parser, dependency_index, args.uses))
+    else:
+        keys = dependency_index.closure(lookup_all(arg_parser, dependency_index, args.closure))
+
+    for module_name, reference_name in keys:
+        print('%s.%s' % (module_name, reference_name))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,382 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import ber, pygen
+from asn1ate.sema import *
+from asn1ate.berdecgen import BerDecoderBackend
+from asn1ate.codecgen import CodecBackend, FixedLayout, LayoutField, generate_codec, bytes_literal, _write_items
+from asn1ate.validgen import ValidatorBackend
+
+
+class DerEncoderBackend(CodecBackend):
+    """ Backend to generate specialized DER encoders from semantic tree.
+
+    Every type gets an encoder, a function that appends the complete
+    encoding of a value to a bytearray, given the identifier octets to
+    encode it with, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo [0] INTEGER
+        # }
+        def _e_Seq(out, identifier, value):
+            out += identifier
+            out.append(0)
+            mark = len(out)
+            encode_integer(out, b'\x80', value['foo'])
+            patch_length(out, mark)
+
+    Identifier octets are computed at generation time, from the tag class,
+    number and implicitness of every component, and passed to encoders as
+    constants, so implicitly tagged types share the encoder of the type
+    they tag. Constructed values are written to the same bytearray as their
+    components, with a placeholder length that is patched when they are
+    complete. SET components are written in canonical tag order, as
+    sorted at generation time, and SET OF items are sorted by their
+    encodings, as DER requires. SEQUENCEs and SETs with a fixed DER
+    layout are packed with a single ``struct.Struct`` instead, if their
+    INTEGERs are in range and OCTET STRINGs have the right size, unless
+    ``fixed_layouts`` is False.
+
+    Values are the same plain Python objects decoders generated by
+    ``asn1ate.berdecgen`` return. Components equal to their numeric or
+    boolean DEFAULT value are left out. Missing components raise KeyError,
+    and constraints are not checked.
+
+    For every type assignment, ``encode_<Type>(value)`` returns the DER
+    encoding of ``value`` as bytes, and ``ENCODERS`` maps type names to
+    these functions. The generated code requires Python 3.
+    """
+
+    prefix = '_e_'
+    parameters = 'out, identifier, value'
+    registry_name = 'ENCODERS'
+
+    def __init__(self, sema_module, module, referenced_modules, fixed_layouts=True):
+        super(DerEncoderBackend, self).__init__(sema_module, module, referenced_modules)
+        self.fixed_layouts = fixed_layouts
+        self.runtime_name('encode')
+
+        self.generators = {
+            ChoiceType: self.encoder_choice_type,
+            SequenceType: self.encoder_sequence_type,
+            SetType: self.encoder_set_type,
+            SequenceOfType: self.encoder_sequence_of_type,
+            SetOfType: self.encoder_set_of_type,
+            TaggedType: self.encoder_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.encoder_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.encoder_simple_type,
+            BitStringType: self.encoder_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'encode_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(value):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return encode(_e_%s, %s, value)' % (python_name,
+                                                                 self.identifier_literal(assignment.type_decl)))
+        fragment.pop_indent()
+        return public_name, fragment
+
+    def encoder_simple_type(self, t, function_name):
+        return self.runtime_name(_BUILTIN_ENCODERS.get(t.type_name, 'encode_any'))
+
+    def encoder_tagged_type(self, t, function_name):
+        if self.tag_implicitness(t) == TagImplicitness.IMPLICIT:
+            return self.generate(t.type_decl, function_name)
+
+        # The contents of an explicit tag are a complete encoding of the
+        # tagged type.
+        function_name = self.function_name(function_name)
+        encoder = self.generate(t.type_decl)
+
+        fragment = self.start_function(function_name)
+        self.write_start_contents(fragment)
+        fragment.write_line('%s(out, %s, value)' % (encoder, self.identifier_literal(t.type_decl)))
+        self.write_end_contents(fragment)
+        self.end_function(fragment)
+
+        return function_name
+
+    def encoder_sequence_type(self, t, function_name):
+        return self.generate_fields_encoder(function_name, self.resolve_components(t), self.encoder_layout(t))
+
+    def encoder_set_type(self, t, function_name):
+        fields = [c for c in self.resolve_components(t) if not isinstance(c, ExtensionMarker)]
+        return self.generate_fields_encoder(function_name, sorted(fields, key=self.canonical_order),
+                                            self.encoder_layout(t))
+
+    def encoder_layout(self, t):
+        """ Return the FixedLayout of the length and contents octets of the
+        SEQUENCE or SET ``t``, or None if it has none.
+        """
+        layout = self.fixed_layout(t) if self.fixed_layouts else None
+        if layout is None:
+            return None
+
+        length = bytearray()
+        ber.put_length(length, layout.size)
+        return FixedLayout([bytes(length)] + layout.items)
+
+    def generate_fields_encoder(self, function_name, components, layout=None):
+        """ Generate an encoder that writes ``components`` in order, with a
+        fast path for values that fit the FixedLayout ``layout``, if any.
+        """
+        function_name = self.function_name(function_name)
+
+        body = pygen.PythonFragment()
+        for c in components:
+            if isinstance(c, ExtensionMarker):
+                continue
+
+            encoder = self.generate_component(c.identifier, c.type_decl)
+            encode = "%s(out, %s, value['%s'])" % (encoder, self.identifier_literal(c.type_decl), c.identifier)
+
+            default = self.default_literal(c)
+            if default is not None:
+                body.write_line("if '%s' in value and value['%s'] != %s:" % (c.identifier, c.identifier, default))
+            elif c.optional or c.default_value is not None:
+                body.write_line("if '%s' in value:" % c.identifier)
+            else:
+                body.write_line(encode)
+                continue
+
+            body.push_indent()
+            body.write_line(encode)
+            body.pop_indent()
+
+        fragment = self.start_function(function_name)
+        if layout is None or self.write_layout_encoder(fragment, layout):
+            self.write_start_contents(fragment)
+            fragment.write_block(body)
+            self.write_end_contents(fragment)
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_layout_encoder(self, fragment, layout):
+        """ Write a fast path that packs values into the FixedLayout
+        ``layout`` with a single ``struct.Struct``, if their INTEGERs are in
+        range and their OCTET STRINGs have the right size. Return whether
+        other values fall through to an encoder that follows.
+        """
+        names = layout.names()
+        arguments = []
+        conditions = []
+        for name, item in zip(names, layout.items):
+            if not isinstance(item, LayoutField):
+                arguments.append(bytes_literal(item))
+                continue
+
+            fragment.write_line('%s = value%s' % (name, ''.join("['%s']" % c for c in item.path)))
+            arguments.append(self.layout_field_argument(item, name))
+            if item.kind == 'integer':
+                conditions.append('%d <= %s <= %d' % (item.lower, name, item.upper))
+            elif item.kind == 'octets':
+                conditions.append('isinstance(%s, bytes) and len(%s) == %d' % (name, name, item.size))
+
+        if conditions:
+            _write_conditions(fragment, conditions)
+            fragment.push_indent()
+        fragment.write_line('out += identifier')
+        _write_items(fragment, 'out += %s.pack(' % self.layout_struct(layout), arguments, ')')
+        if conditions:
+            fragment.write_line('return')
+            fragment.pop_indent()
+
+        return bool(conditions)
+
+    def layout_field_argument(self, field, name):
+        """ Return an expression for ``name``, the value of the LayoutField
+        ``field``, to pack.
+        """
+        if field.kind == 'boolean':
+            return '255 if %s else 0' % name
+        elif field.kind == 'integer' and field.struct_code().endswith('s'):
+            return "%s.to_bytes(%d, 'big', signed=True)" % (name, field.size)
+
+        return name
+
+    def encoder_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        components = self.resolve_components(t)
+        table_name = self.unique_name('_%s_ENCODERS' % function_name[len(self.prefix):])
+
+        table = pygen.PythonFragment()
+        table.write_line('%s = {' % table_name)
+        table.push_indent()
+        for c in components:
+            if not isinstance(c, ExtensionMarker):
+                encoder = self.generate_component(c.identifier, c.type_decl)
+                table.write_line("'%s': (%s, %s)," % (c.identifier, encoder, self.identifier_literal(c.type_decl)))
+        table.pop_indent()
+        table.write_line('}')
+        self.module.tables.append(table)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, component = value')
+        if any(isinstance(c, ExtensionMarker) for c in components):
+            # Unknown extensions are kept encoded by decoders.
+            fragment.write_line('if name is None:')
+            fragment.push_indent()
+            fragment.write_line('out += component')
+            fragment.write_line('return')
+            fragment.pop_indent()
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('encoder, identifier = %s[name]' % table_name)
+        fragment.pop_indent()
+        fragment.write_line('except KeyError:')
+        fragment.push_indent()
+        fragment.write_line("raise EncodeError('Unknown alternative %%s of %s' %% name)" % self.description())
+        self.runtime_name('EncodeError')
+        fragment.pop_indent()
+        fragment.write_line('encoder(out, identifier, component)')
+        self.end_function(fragment)
+
+        return function_name
+
+    def encoder_sequence_of_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        encoder = self.generate_component('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        self.write_start_contents(fragment)
+        fragment.write_line('for item in value:')
+        fragment.push_indent()
+        fragment.write_line('%s(out, %s, item)' % (encoder, self.identifier_literal(t.type_decl)))
+        fragment.pop_indent()
+        self.write_end_contents(fragment)
+        self.end_function(fragment)
+
+        return function_name
+
+    def encoder_set_of_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        encoder = self.generate_component('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        self.write_start_contents(fragment)
+        fragment.write_line("out += b''.join(sorted(encode(%s, %s, item) for item in value))" %
+                            (encoder, self.identifier_literal(t.type_decl)))
+        self.write_end_contents(fragment)
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_start_contents(self, fragment):
+        """ Write the identifier and a placeholder length of a constructed
+        value.
+        """
+        fragment.write_line('out += identifier')
+        fragment.write_line('out.append(0)')
+        fragment.write_line('mark = len(out)')
+
+    def write_end_contents(self, fragment):
+        fragment.write_line('%s(out, mark)' % self.runtime_name('patch_length'))
+
+    def identifier_literal(self, t):
+        """ Return a bytes literal of the identifier octets values of the
+        type ``t`` are encoded with, or None if they depend on the value.
+        """
+        identifier = self.identifier(t)
+        if identifier is None:
+            return 'None'
+
+        return bytes_literal(ber.encode_identifier(*identifier))
+
+
+def generate_derenc(sema_module, out_stream, referenced_modules, decoders=False, validators=False, fixed_layouts=True):
+    backend_classes = [BerDecoderBackend, DerEncoderBackend] if decoders else [DerEncoderBackend]
+    if validators:
+        backend_classes.append(ValidatorBackend)
+    return generate_codec(sema_module, out_stream, referenced_modules, backend_classes, fixed_layouts=fixed_layouts)
+
+
+def _write_conditions(fragment, conditions):
+    """ Write an if statement that checks all ``conditions``, with every
+    condition on a line of its own if they don't fit on one line.
+    """
+    line = 'if %s:' % ' and '.join(conditions)
+    if len(line) <= 100:
+        fragment.write_line(line)
+        return
+
+    fragment.write_line('if (%s and' % conditions[0])
+    for condition in conditions[1:-1]:
+        fragment.write_line('        %s and' % condition)
+    fragment.write_line('        %s):' % conditions[-1])
+
+
+# Contents encoders for built-in types in asn1ate.support.ber
+_BUILTIN_ENCODERS = {
+    'ANY': 'encode_any',
+    'INTEGER': 'encode_integer',
+    'BOOLEAN': 'encode_boolean',
+    'NULL': 'encode_null',
+    'ENUMERATED': 'encode_integer',
+    'REAL': 'encode_real',
+    'BIT STRING': 'encode_bit_string',
+    'OCTET STRING': 'encode_octet_string',
+    'OBJECT IDENTIFIER': 'encode_object_identifier',
+    'UTF8String': 'encode_utf8_string',
+    'GeneralString': 'encode_string',
+    'NumericString': 'encode_string',
+    'PrintableString': 'encode_string',
+    'IA5String': 'encode_string',
+    'GraphicString': 'encode_string',
+    'GeneralizedTime': 'encode_string',
+    'UTCTime': 'encode_string',
+    'ObjectDescriptor': 'encode_string',
+    'VisibleString': 'encode_string',
+    'TeletexString': 'encode_string',
+    'UniversalString': 'encode_universal_string',
+    'BMPString': 'encode_bmp_string',
+    'T61String': 'encode_string',
+    'VideotexString': 'encode_string',
+}
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.derencgen',
+                         'Generate specialized DER encoders from an ASN.1 definition file.',
+                         generate_derenc,
+                         [('--decoders', dict(action='store_true',
+                                              help='also generate BER decoders, as asn1ate.berdecgen does')),
+                          ('--validators', dict(action='store_true',
+                                                help='also generate validators of constraints, as '
+                                                     'asn1ate.validgen does'))],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import print_function  # Python 2 compatibility
+
+import sys
+import hashlib
+import argparse
+from asn1ate import parser
+from asn1ate.sema import build_semantic_model, DependencyIndex
+
+
+def structural_hashes(modules):
+    """ Return a dict of (module name, reference name) -> hex digest for all
+    assignments in ``modules``.
+
+    The digest covers the canonical ASN.1 form of the assignment, the tag
+    default of its module (which changes the meaning of untagged
+    implicitness) and the modules its references resolve to.
+    """
+    return _structural_hashes(DependencyIndex(modules))
+
+
+class ModelDiff(object):
+    """ Result of ``diff_semantic_models``.
+
+    All members are sorted lists of (module name, reference name) tuples:
+
+    * ``added`` -- assignments only in the new model
+    * ``removed`` -- assignments only in the old model
+    * ``changed`` -- assignments whose structural hash differs
+    * ``impacted`` -- unchanged assignments in the new model that
+      transitively depend on an added, removed or changed assignment
+    """
+
+    def __init__(self, added, removed, changed, impacted):
+        self.added = sorted(added)
+        self.removed = sorted(removed)
+        self.changed = sorted(changed)
+        self.impacted = sorted(impacted)
+
+    def affected_modules(self):
+        """ Return the sorted names of all modules with added, removed,
+        changed or impacted assignments, i.e. the modules whose generated
+        code needs rebuilding.
+        """
+        affected = self.added + self.removed + self.changed + self.impacted
+        return sorted(set(module_name for module_name, _ in affected))
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.impacted)
+
+    __nonzero__ = __bool__  # Python 2 compatibility
+
+
+def diff_semantic_models(old_modules, new_modules):
+    """ Compare two results of ``build_semantic_model`` assignment by
+    assignment and return a ``ModelDiff``.
+    """
+    old_index = DependencyIndex(old_modules)
+    new_index = DependencyIndex(new_modules)
+    old_hashes = _structural_hashes(old_index)
+    new_hashes = _structural_hashes(new_index)
+
+    added = set(new_hashes) - set(old_hashes)
+    removed = set(old_hashes) - set(new_hashes)
+    changed = set(k for k in set(old_hashes) & set(new_hashes)
+                  if old_hashes[k] != new_hashes[k])
+
+    # Anything that depends on a changed assignment is impacted. Dependencies
+    # on removed assignments only exist in the old model, and dependencies on
+    # added ones only in the new model, so consult both.
+    impacted = set(new_index.users(added | changed))
+    impacted |= set(old_index.users(removed | changed))
+    impacted &= set(new_hashes)
+    impacted -= added | changed
+
+    return ModelDiff(added, removed, changed, impacted)
+
+
+def _structural_hashes(dependency_index):
+    hashes = {}
+    for key, (module, assignment) in dependency_index.assignments.items():
+        references = sorted(dependency_index.forward[key])
+        content = '%s\n%s\n%s' % (module.tag_default, assignment, references)
+        hashes[key] = hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    return hashes
+
+
+def _load_modules(path):
+    with open(path) as f:
+        asn1def = f.read()
+
+    return build_semantic_model(parser.parse_asn1(asn1def))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog='asn1ate diff',
+                                         description='Report assignments that differ between two versions of '
+                                                     'an ASN.1 definition, and those impacted by the change.')
+    arg_parser.add_argument('old', help='the old ASN.1 file')
+    arg_parser.add_argument('new', help='the new ASN.1 file')
+    arg_parser.add_argument('--modules', action='store_true',
+                            help='only list the names of affected modules')
+    args = arg_parser.parse_args(argv)
+
+    result = diff_semantic_models(_load_modules(args.old), _load_modules(args.new))
+
+    if args.modules:
+        for module_name in result.affected_modules():
+            print(module_name)
+    else:
+        for marker, keys in (('A', result.added), ('D', result.removed),
+                             ('M', result.changed), ('I', result.impacted)):
+            for module_name, reference_name in keys:
+                print('%s %s.%s' % (marker, module_name, reference_name))
+
+    return 1 if result else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import json
+import hashlib
+from asn1ate import diff, __version__
+from asn1ate.sema import DependencyIndex
+from asn1ate.support import pygen
+
+
+def module_records(modules, options):
+    """ Return a dict of module name -> manifest record for all modules in
+    ``modules``, as returned by ``build_semantic_model``. ``options`` is a
+    JSON-serializable dict of options that affect generated code.
+
+    A record holds a hash of the module's semantic model, the hashes of the
+    modules it references (transitively, since e.g. constraints and object
+    identifiers are resolved across modules), the generator version and the
+    options. A module only needs to be generated again if its record
+    changes.
+    """
+    dependency_index = DependencyIndex(modules)
+    assignment_hashes = diff.structural_hashes(modules)
+
+    module_hashes = {}
+    module_keys = {}
+    for key in sorted(assignment_hashes):
+        module_keys.setdefault(key[0], []).append(key)
+    for module in modules:
+        keys = module_keys.get(module.name, [])
+        content = '%s\n%s' % (module.tag_default, [(key[1], assignment_hashes[key]) for key in keys])
+        module_hashes[module.name] = hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    # Generated code imports every other module in the set, so their names
+    # are an input too.
+    options = dict(options, modules=sorted(module_hashes))
+
+    records = {}
+    for module in modules:
+        referenced_modules = set(key[0] for key in dependency_index.closure(module_keys.get(module.name, [])))
+        referenced_modules.discard(module.name)
+        records[module.name] = {
+            'hash': module_hashes[module.name],
+            'references': dict((name, module_hashes[name]) for name in referenced_modules),
+            'version': __version__,
+            'options': options,
+        }
+
+    return records
+
+
+def load_manifest(path):
+    """ Return the records in the manifest at ``path``, or an empty dict if
+    there is no manifest or it can't be read.
+    """
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    return manifest.get('modules', {}) if isinstance(manifest, dict) else {}
+
+
+def save_manifest(path, records):
+    """ Write ``records`` to the manifest at ``path``. """
+    pygen.write_file_atomically(path, json.dumps({'modules': records}, indent=2, sort_keys=True) + '\n')
+
+
+def outdated_modules(previous_records, records, outputs):
+    """ Return the names of modules whose record differs from the previous
+    one, or whose output path in ``outputs`` (module name -> path) is
+    missing, sorted by name.
+    """
+    return sorted(name for name, record in records.items()
+                  if previous_records.get(name) != record or not os.path.exists(outputs[name]))
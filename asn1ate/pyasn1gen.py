@@ -25,11 +25,15 @@
 
 from __future__ import print_function  # Python 2 compatibility
 
+import os
+import re
 import sys
+import json
 import argparse
 import keyword
-from asn1ate import parser, __version__
+from asn1ate import parser, deps, diff, manifest, __version__
 from asn1ate.support import pygen
+from asn1ate.support.pygen import StringIO
 from asn1ate.sema import *
 
 
@@ -80,12 +84,62 @@ class Pyasn1Backend(object):
     we generate a definition once all dependent declarations are created. If the
     type assignment involves a constructed type, it is filled with inline
     definitions.
+
+    With ``lazy``, the declarations and definitions of every strongly
+    connected component of assignments go into an initializer function
+    instead, which runs on first access to any of its names through a module
+    ``__getattr__`` (PEP 562, Python 3.7 or later), after the initializers of
+    the components it depends on. Initializers run under a lock of the
+    module, so other threads wait for them, and run again on the next access
+    if they raise.
+
+    ``included`` restricts code generation to a set of (module name,
+    reference name) keys, e.g. the reachable assignments from
+    ``DependencyIndex.closure``. Only modules referenced by the included
+    assignments are imported.
+
+    With ``hoist``, inline type, constraint and tag expressions that only
+    involve pyasn1 built-ins and occur more than once are built once, as
+    private module-level constants, and shared by all their uses. pyasn1
+    type, constraint and tag objects are immutable, so sharing them is safe.
+
+    Object identifier values are resolved at compile time where possible.
+    With ``oid_names``, a module-level ``OID_NAMES`` dict maps the arcs of
+    every resolved object identifier value to its ASN.1 name.
+
+    With ``named_classes``, anonymous inline types that need more than a
+    plain constructor call, i.e. tagged, constrained, constructed and
+    collection types and types with named values, are generated as private
+    classes with class-level ``tagSet``, ``subtypeSpec``, ``componentType``
+    etc. instead of instances refined with ``subtype``, so pyasn1 has no
+    per-instance settings to carry over when it clones them while decoding.
+    Classes are named after the assignment and the component path.
     """
 
-    def __init__(self, sema_module, out_stream, referenced_modules):
+    def __init__(self, sema_module, out_stream, referenced_modules, lazy=False, included=None, hoist=False,
+                 oid_names=False, named_classes=False):
         self.sema_module = sema_module
         self.referenced_modules = referenced_modules
         self.writer = pygen.PythonWriter(out_stream)
+        self.lazy = lazy
+        self.included = included
+        self.oid_names = oid_names
+
+        # Shareable expressions are replaced by placeholders during code
+        # generation, and resolved to a constant or the expression itself
+        # once all uses are known.
+        self.hoist = hoist
+        self.shared_exprs = []
+        self.shared_index = {}
+
+        # Open type dispatch tables and classes for inline types are named
+        # after the assignment and component they belong to, and emitted
+        # ahead of the definition that uses them.
+        self.named_classes = named_classes
+        self.assignment_name = None
+        self.component_path = []
+        self.private_names = set()
+        self.pending_definitions = []
 
         self.decl_generators = {
             TypeAssignment: self.decl_type_assignment,
@@ -123,29 +177,255 @@ class Pyasn1Backend(object):
         }
 
     def generate_code(self):
-        self.writer.write_line('from pyasn1.type import univ, char, namedtype, namedval, tag, constraint, useful')
-        for module in self.referenced_modules:
-            if module is not self.sema_module:
-                self.writer.write_line('import ' + _sanitize_module(module.name))
-        self.writer.write_blanks(2)
-
-        # Generate _OID if sema_module contains any object identifier values.
-        oids = [n for n in self.sema_module.descendants() if isinstance(n, ObjectIdentifierValue)]
-        if oids:
-            self.writer.write_block(self.generate_OID())
-            self.writer.write_blanks(2)
-
-        assignment_components = dependency_sort(self.sema_module.assignments)
-        for component in assignment_components:
+        # Collect the module as code and render it in one go at the end.
+        assignments = self.generated_assignments()
+        fragment = self.generate_prologue(assignments, self.sema_module.descendants(),
+                                          needed_imports_only=self.included is not None)
+
+        body = self.writer.get_fragment()
+        assignment_components = dependency_sort(assignments)
+        if self.lazy:
+            body.write_block(self.generate_lazy_components(assignment_components))
+        else:
+            for component in assignment_components:
+                body.write_code(self.generate_component(component)[0])
+
+        self.write_body(fragment, body)
+
+        if self.oid_names:
+            if self.lazy:
+                fragment.write_blanks(2)
+            fragment.write_block(self.generate_oid_names(assignments))
+
+        self.writer.write_code(fragment)
+
+    def generate_package(self, package_dir, header='', chunk_size=1, keep_unchanged=False):
+        """ Generate the module as a package in ``package_dir``, with one
+        submodule per group of strongly connected components of assignments,
+        and an ``__init__`` that imports submodules on first access to any of
+        their names (PEP 562, Python 3.7 or later).
+
+        Components are grouped in dependency order, as long as a group has
+        at most ``chunk_size`` assignments; larger components get a
+        submodule of their own. ``header`` is written at the top of every
+        file. With ``keep_unchanged``, files that already have the same code
+        are not rewritten.
+        """
+        if not os.path.isdir(package_dir):
+            os.makedirs(package_dir)
+
+        assignments = self.generated_assignments()
+        chunks = _group_components(dependency_sort(assignments), chunk_size)
+
+        # Map local names to the submodule and Python name they are
+        # assigned to, to import them where they are used.
+        chunk_index = {}
+        for index, chunk in enumerate(chunks):
+            for assignment in chunk:
+                chunk_index[assignment.reference_name()] = (index, _assigned_name(assignment))
+
+        package_names = []
+        for index, chunk in enumerate(chunks):
+            fragment = self.generate_prologue(chunk, [n for a in chunk for n in a.descendants()],
+                                              needed_imports_only=True, blanks=0)
+
+            imports = {}
+            for assignment in chunk:
+                for module_name, reference_name in self.generated_references(assignment):
+                    if module_name == self.sema_module.name and reference_name in chunk_index:
+                        dependency, name = chunk_index[reference_name]
+                        if dependency != index:
+                            imports.setdefault(dependency, set()).add(name)
+
+            for dependency in sorted(imports):
+                fragment.write_line('from .%s import %s' % (_chunk_module(dependency),
+                                                            ', '.join(sorted(imports[dependency]))))
+            fragment.write_blanks(2)
+
+            body = self.writer.get_fragment()
+            for component in dependency_sort(chunk):
+                component_body, names = self.generate_component(component)
+                body.write_code(component_body)
+                package_names.extend((name, index) for name in names)
+
+            self.write_body(fragment, body)
+            self.write_package_file(package_dir, _chunk_module(index), header, fragment, keep_unchanged)
+
+        fragment = self.writer.get_fragment()
+        fragment.write_line('import importlib')
+        fragment.write_blanks(2)
+        fragment.write_line('_SUBMODULES = {')
+        fragment.push_indent()
+        fragment.write_enumeration("'%s': '%s'" % (name, _chunk_module(index)) for name, index in package_names)
+        fragment.pop_indent()
+        fragment.write_line('}')
+        fragment.write_blanks(1)
+        fragment.write_line('__all__ = [%s]' % ', '.join("'%s'" % name for name, _ in sorted(package_names)))
+        fragment.write_blanks(2)
+        if self.oid_names:
+            fragment.write_block(self.generate_oid_names(assignments))
+            fragment.write_blanks(2)
+        fragment.write_block(_PACKAGE_LOADER)
+
+        self.write_package_file(package_dir, '__init__', header, fragment, keep_unchanged)
+
+        # Remove submodules left over from an earlier run with more of them.
+        for filename in os.listdir(package_dir):
+            match = _CHUNK_MODULE_RE.match(filename)
+            if match and int(match.group(1)) >= len(chunks):
+                os.remove(os.path.join(package_dir, filename))
+
+    def write_package_file(self, package_dir, module_name, header, code, keep_unchanged=False):
+        out_stream = StringIO()
+        print(header, file=out_stream)
+        pygen.PythonWriter(out_stream).write_code(code)
+
+        path = os.path.join(package_dir, module_name + '.py')
+        if keep_unchanged:
+            pygen.write_file_if_changed(path, out_stream.getvalue())
+        else:
+            pygen.write_file_atomically(path, out_stream.getvalue())
+
+    def generated_references(self, assignment):
+        """ Like ``Module.qualified_references``, but also include the
+        references of components included with COMPONENTS OF, which are
+        generated in place.
+        """
+        references = self.sema_module.qualified_references(assignment)
+        for node in assignment.descendants():
+            if isinstance(node, ConstructedType):
+                for component in self.resolve_components(node):
+                    references |= self.sema_module.qualified_references(component)
+
+        return references
+
+    def generated_assignments(self):
+        """ Return the assignments to generate code for. """
+        assignments = self.sema_module.assignments
+        if self.included is not None:
+            assignments = [a for a in assignments if (self.sema_module.name, a.reference_name()) in self.included]
+
+        return assignments
+
+    def generate_prologue(self, assignments, nodes, needed_imports_only=False, blanks=2):
+        """ Generate the imports and helpers needed by code for
+        ``assignments``, whose descendants are ``nodes``. Returns a fragment
+        to add the code to.
+        """
+        fragment = self.writer.get_fragment()
+
+        imported_modules = [m for m in self.referenced_modules if m is not self.sema_module]
+        if needed_imports_only:
+            needed_modules = set(module_name for a in assignments
+                                 for module_name, _ in self.sema_module.qualified_references(a))
+            imported_modules = [m for m in imported_modules if m.name in needed_modules]
+            nodes = [n for a in assignments for n in a.descendants()]
+
+        pyasn1_modules = 'univ, char, namedtype, namedval, tag, constraint, useful'
+        if any(isinstance(n, SimpleType) and n.open_types for n in nodes):
+            pyasn1_modules += ', opentype'
+        if self.lazy:
+            fragment.write_line('import threading')
+        fragment.write_line('from pyasn1.type import ' + pyasn1_modules)
+        for module in imported_modules:
+            fragment.write_line('import ' + _sanitize_module(module.name))
+        fragment.write_blanks(blanks)
+
+        # Generate _OID if any object identifier values can't be resolved at
+        # compile time.
+        oids = [n for n in nodes if isinstance(n, ObjectIdentifierValue)]
+        if any(self.sema_module.resolve_object_identifier(n, self.referenced_modules) is None for n in oids):
+            if not blanks:
+                fragment.write_blanks(2)
+            fragment.write_block(self.generate_OID())
+            fragment.write_blanks(blanks)
+
+        return fragment
+
+    def write_body(self, fragment, body):
+        """ Add ``body`` to ``fragment``, preceded by the constants it shares
+        with ``hoist``.
+        """
+        if self.hoist:
+            constants, body = self.resolve_shared_exprs(str(body))
+            if constants:
+                for constant in constants:
+                    fragment.write_line(constant)
+                fragment.write_blanks(2)
+
+        fragment.write_code(body)
+
+    def generate_component(self, component, blanks=2):
+        """ Generate declarations and definitions for a strongly connected
+        component of assignments. Returns the code and the names it defines.
+        """
+        fragment = self.writer.get_fragment()
+        names = []
+
+        for assignment in component:
+            fragment.write_block(self.generate_decl(assignment))
+            fragment.write_blanks(blanks)
+            names.append(_assigned_name(assignment))
+
+        for assignment in component:
+            details = self.generate_definition(assignment)
+            for definition_name, definition in self.pending_definitions:
+                fragment.write_block(definition)
+                fragment.write_blanks(blanks)
+                names.append(definition_name)
+            self.pending_definitions = []
+
+            if details:
+                fragment.write_block(details)
+                fragment.write_blanks(blanks)
+
+        return fragment, names
+
+    def generate_lazy_components(self, assignment_components):
+        fragment = self.writer.get_fragment()
+
+        # Map local names to the component they are assigned in, to find the
+        # initializers each component depends on.
+        component_index = {}
+        for index, component in enumerate(assignment_components):
             for assignment in component:
-                self.writer.write_block(self.generate_decl(assignment))
-                self.writer.write_blanks(2)
+                component_index[assignment.reference_name()] = index
 
+        lazy_names = []
+        for index, component in enumerate(assignment_components):
+            dependencies = set()
             for assignment in component:
-                details = self.generate_definition(assignment)
-                if details:
-                    self.writer.write_block(details)
-                    self.writer.write_blanks(2)
+                for module_name, reference_name in self.sema_module.qualified_references(assignment):
+                    if module_name == self.sema_module.name and reference_name in component_index:
+                        dependencies.add(component_index[reference_name])
+            dependencies.discard(index)
+
+            body, names = self.generate_component(component, blanks=1)
+            lazy_names.extend((name, index) for name in names)
+
+            fragment.write_line('def _scc_%d():' % index)
+            fragment.push_indent()
+            fragment.write_line('global %s' % ', '.join(names))
+            for dependency in sorted(dependencies):
+                fragment.write_line('_require(%d)' % dependency)
+            fragment.write_blanks(1)
+            fragment.write_block(body)
+            fragment.pop_indent()
+            fragment.write_blanks(2)
+
+        fragment.write_line('_INITIALIZERS = [%s]' % ', '.join('_scc_%d' % i for i in range(len(assignment_components))))
+        fragment.write_blanks(1)
+        fragment.write_line('_LAZY_NAMES = {')
+        fragment.push_indent()
+        fragment.write_enumeration("'%s': %d" % (name, index) for name, index in lazy_names)
+        fragment.pop_indent()
+        fragment.write_line('}')
+        fragment.write_blanks(1)
+        fragment.write_line('__all__ = [%s]' % ', '.join("'%s'" % name for name, _ in sorted(lazy_names)))
+        fragment.write_blanks(2)
+        fragment.write_block(_LAZY_LOADER)
+
+        return fragment
 
     def generate_definition(self, assignment):
         if not isinstance(assignment, (ValueAssignment, TypeAssignment)):
@@ -156,6 +436,7 @@ class Pyasn1Backend(object):
 
         assigned_type, type_decl = assignment.type_name, assignment.type_decl
         assigned_type = _translate_type(assigned_type)
+        self.assignment_name = assigned_type
         return self.generate_defn(assigned_type, type_decl)
 
     def generate_decl(self, t):
@@ -163,8 +444,140 @@ class Pyasn1Backend(object):
         return generator(t)
 
     def generate_expr(self, t):
+        if self.named_classes:
+            class_expr = self.generate_inline_class(t)
+            if class_expr:
+                return class_expr
+
         generator = self.inline_generators[type(t)]
-        return generator(t)
+        return self.share(generator(t))
+
+    def generate_component_expr(self, name, t):
+        """ Generate an inline expression for the type ``t`` of the
+        component ``name``, which names the class for it with
+        ``named_classes``.
+        """
+        self.component_path.append(name)
+        try:
+            return self.generate_expr(t)
+        finally:
+            self.component_path.pop()
+
+    def generate_inline_class(self, t):
+        """ Generate a class for the inline type ``t``, emitted ahead of
+        the current definition, and return an expression to instantiate it.
+        Returns None for types that need no class.
+        """
+        if isinstance(t, (ComponentType, NamedType, SelectionType)):
+            return None
+
+        # Reserve the name up front, so classes for nested types can't take
+        # it, and give it back if no class is needed after all.
+        class_name = self.unique_name('_' + '_'.join([self.assignment_name] + self.component_path))
+        details = self.generate_defn(class_name, t)
+        if not details:
+            self.private_names.discard(class_name)
+            return None
+
+        fragment = self.writer.get_fragment()
+        fragment.write_line('class %s(%s):' % (class_name, self.type_reference(t)))
+        fragment.push_indent()
+        fragment.write_line('pass')
+        fragment.pop_indent()
+        fragment.write_blanks(2)
+        fragment.write_block(details)
+        self.pending_definitions.append((class_name, fragment))
+
+        return class_name + '()'
+
+    def type_reference(self, t):
+        """ Return the Python name of the type ``t`` is based on, qualified
+        with its module if it's defined in another module.
+        """
+        name = _translate_type(t.type_name)
+        while isinstance(t, TaggedType):
+            t = t.type_decl
+
+        module_ref = getattr(t, 'module_ref', None)
+        if module_ref and module_ref.name != self.sema_module.name:
+            name = _sanitize_module(module_ref.name) + '.' + name
+
+        return name
+
+    def unique_name(self, name):
+        """ Return ``name`` as an identifier, with a number appended if
+        needed to make it unique among private module-level names, and
+        reserve it.
+        """
+        name = _sanitize_identifier(name)
+        unique_name, suffix = name, 1
+        while unique_name in self.private_names:
+            suffix += 1
+            unique_name = '%s%d' % (name, suffix)
+
+        self.private_names.add(unique_name)
+        return unique_name
+
+    def share(self, expr):
+        """ With ``hoist``, return a placeholder for single-line expressions
+        built from pyasn1 built-ins only, so identical expressions can be
+        shared. Other expressions are returned as-is.
+        """
+        if not self.hoist:
+            return expr
+
+        text = _flat_text(expr)
+        if text is None or '\n' in text or not _is_builtin_expr(text):
+            return expr
+
+        index = self.shared_index.get(text)
+        if index is None:
+            index = len(self.shared_exprs)
+            self.shared_index[text] = index
+            self.shared_exprs.append(text)
+
+        return _SHARED_PLACEHOLDER % index
+
+    def resolve_shared_exprs(self, body):
+        """ Replace placeholders in ``body`` with constants for expressions
+        used more than once, and with the expression itself otherwise.
+        Returns the constant definitions and the new body.
+        """
+        counts = [0] * len(self.shared_exprs)
+        for match in _SHARED_PLACEHOLDER_RE.finditer(body):
+            counts[int(match.group(1))] += 1
+
+        # Expressions are registered inner first, so count uses from the
+        # outside in: a nested expression is used once by a constant, or
+        # once per inlined copy of the enclosing expression.
+        hoisted = [False] * len(self.shared_exprs)
+        for index in reversed(range(len(self.shared_exprs))):
+            hoisted[index] = counts[index] > 1
+            weight = 1 if hoisted[index] else counts[index]
+            for match in _SHARED_PLACEHOLDER_RE.finditer(self.shared_exprs[index]):
+                counts[int(match.group(1))] += weight
+
+        names = {}
+        for index in range(len(self.shared_exprs)):
+            if hoisted[index]:
+                names[index] = '_T%d' % len(names)
+
+        expansions = {}
+
+        def substitute(match):
+            index = int(match.group(1))
+            if index in names:
+                return names[index]
+            if index not in expansions:
+                expansions[index] = expand(self.shared_exprs[index])
+            return expansions[index]
+
+        def expand(text):
+            return _SHARED_PLACEHOLDER_RE.sub(substitute, text)
+
+        constants = ['%s = %s' % (names[index], expand(self.shared_exprs[index]))
+                     for index in sorted(names)]
+        return constants, expand(body)
 
     def generate_defn(self, class_name, t):
         generator = self.defn_generators[type(t)]
@@ -185,7 +598,7 @@ class Pyasn1Backend(object):
         fragment.write_line('pass')
         fragment.pop_indent()
 
-        return str(fragment)
+        return fragment
 
     def decl_value_assignment(self, assignment):
         assigned_value, type_decl, value = assignment.value_name, assignment.type_decl, assignment.value
@@ -194,12 +607,18 @@ class Pyasn1Backend(object):
         return '%s = %s' % (assigned_value, construct_expr)
 
     def defn_simple_type(self, class_name, t):
-        if t.constraint:
-            return '%s.subtypeSpec = %s' % (class_name, self.build_constraint_expr(t.constraint))
+        constraints = self.effective_constraints(t)
+        if constraints:
+            return '%s.subtypeSpec = %s' % (class_name, self.build_constraints_expr(constraints))
 
         return None
 
     def defn_defined_type(self, class_name, t):
+        # Constraints of the base type are inherited, so only replace them if
+        # this type adds its own.
+        if t.constraint:
+            return '%s.subtypeSpec = %s' % (class_name, self.build_constraints_expr(self.effective_constraints(t)))
+
         return None
 
     def defn_constructed_type(self, class_name, t):
@@ -207,11 +626,11 @@ class Pyasn1Backend(object):
 
         fragment.write_line('%s.componentType = namedtype.NamedTypes(' % class_name)
         fragment.push_indent()
-        fragment.write_block(self.inline_component_types(t.components))
+        fragment.write_block(self.inline_component_types(self.resolve_components(t)))
         fragment.pop_indent()
         fragment.write_line(')')
 
-        return str(fragment)
+        return fragment
 
     def defn_tagged_type(self, class_name, t):
         fragment = self.writer.get_fragment()
@@ -224,7 +643,7 @@ class Pyasn1Backend(object):
         else:
             raise Exception('Unexpected implicitness: %s' % implicitness)
 
-        base_type = _translate_type(t.type_decl.type_name)
+        base_type = self.type_reference(t.type_decl)
 
         fragment.write_line(
             '%s.tagSet = %s.tagSet.%s(%s)' % (class_name, base_type, tag_implicitness, self.build_tag_expr(t)))
@@ -232,7 +651,7 @@ class Pyasn1Backend(object):
         if nested_dfn:
             fragment.write_line(nested_dfn)
 
-        return str(fragment)
+        return fragment
 
     def defn_selection_type(self, class_name, t):
         return None
@@ -251,10 +670,11 @@ class Pyasn1Backend(object):
             fragment.pop_indent()
             fragment.write_line(')')
 
-        if t.constraint:
-            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraint_expr(t.constraint)))
+        constraints = self.effective_constraints(t)
+        if constraints:
+            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraints_expr(constraints)))
 
-        return str(fragment)
+        return fragment
 
     def inline_bitstring_type(self, t):
         return self.inline_simple_type(t)
@@ -270,29 +690,39 @@ class Pyasn1Backend(object):
             fragment.pop_indent()
             fragment.write_line(')')
 
-        if t.constraint:
-            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraint_expr(t.constraint)))
+        constraints = self.effective_constraints(t)
+        if constraints:
+            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraints_expr(constraints)))
 
-        return str(fragment)
+        return fragment
 
     def defn_collection_type(self, class_name, t):
         fragment = self.writer.get_fragment()
-        fragment.write_line('%s.componentType = %s' % (class_name, self.generate_expr(t.type_decl)))
+        fragment.write_line(pygen.PythonCode('%s.componentType = ' % class_name,
+                                             self.generate_component_expr('item', t.type_decl)))
 
-        if t.size_constraint:
-            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraint_expr(t.size_constraint)))
+        constraints = self.effective_constraints(t)
+        if constraints:
+            fragment.write_line('%s.subtypeSpec=%s' % (class_name, self.build_constraints_expr(constraints)))
 
-        return str(fragment)
+        return fragment
 
     def inline_simple_type(self, t):
         type_expr = _translate_type(t.type_name) + '()'
-        if t.constraint:
-            type_expr += '.subtype(subtypeSpec=%s)' % self.build_constraint_expr(t.constraint)
+        constraints = self.effective_constraints(t)
+        if constraints:
+            type_expr += '.subtype(subtypeSpec=%s)' % self.build_constraints_expr(constraints)
 
         return type_expr
 
     def inline_defined_type(self, t):
-        translated_type = _translate_type(t.type_name) + '()'
+        # Pass the effective constraint to the constructor, so it replaces
+        # the constraint of the base type instead of adding to it.
+        constraint_arg = ''
+        if t.constraint:
+            constraint_arg = 'subtypeSpec=%s' % self.build_constraints_expr(self.effective_constraints(t))
+
+        translated_type = '%s(%s)' % (_translate_type(t.type_name), constraint_arg)
         if t.module_ref and t.module_ref.name != self.sema_module.name:
             translated_type = _sanitize_module(t.module_ref.name) + '.' + translated_type
         return translated_type
@@ -305,12 +735,15 @@ class Pyasn1Backend(object):
         fragment.write_line('%s(componentType=namedtype.NamedTypes(' % class_name)
 
         fragment.push_indent()
-        fragment.write_block(self.inline_component_types(t.components))
+        fragment.write_block(self.inline_component_types(self.resolve_components(t)))
         fragment.pop_indent()
 
         fragment.write_line('))')
 
-        return str(fragment)
+        return fragment
+
+    def resolve_components(self, t):
+        return self.sema_module.resolve_components(t, self.referenced_modules)
 
     def inline_component_types(self, components):
         fragment = self.writer.get_fragment()
@@ -322,7 +755,7 @@ class Pyasn1Backend(object):
 
         fragment.write_enumeration(component_exprs)
 
-        return str(fragment)
+        return fragment
 
     def inline_tagged_type(self, t):
         implicitness = self.sema_module.resolve_tag_implicitness(t.implicitness, t.type_decl)
@@ -354,7 +787,20 @@ class Pyasn1Backend(object):
         else:
             tag_format = 'tag.tagFormatSimple'
 
-        return 'tag.Tag(%s, %s, %s)' % (context, tag_format, tag_def.class_number)
+        return self.share('tag.Tag(%s, %s, %s)' % (context, tag_format, tag_def.class_number))
+
+    def effective_constraints(self, t):
+        return self.sema_module.effective_constraints(t, self.referenced_modules)
+
+    def build_constraints_expr(self, constraints):
+        """ Build a single constraint object from a list of effective
+        constraints.
+        """
+        if len(constraints) == 1:
+            return self.share(self.build_constraint_expr(constraints[0]))
+
+        return self.share('constraint.ConstraintsIntersection(%s)' % ', '.join(self.build_constraint_expr(c)
+                                                                                for c in constraints))
 
     def build_constraint_expr(self, constraint):
         def unpack_size_constraint(nested):
@@ -406,28 +852,59 @@ class Pyasn1Backend(object):
             return '%s(%s)' % (value_type, build_value_expr(root_type.type_name, value))
 
     def inline_component_type(self, t):
-        if t.components_of_type:
-            # COMPONENTS OF works like a literal include, so just
-            # expand all components of the referenced type.
-            included_type_decl = self.sema_module.resolve_type_decl(t.components_of_type, self.referenced_modules)
-            included_content = self.inline_component_types(included_type_decl.components)
+        # COMPONENTS OF has been expanded by resolve_components.
+        type_expr = self.generate_component_expr(t.identifier, t.type_decl)
+        if t.default_value is not None:
+            type_expr += '.subtype(value=%s)' % self.translate_value(t.default_value)
 
-            # Strip trailing newline from inline_component_types
-            # to make the list line up
-            return included_content.strip()
+        open_type_expr = self.build_open_type_expr(t)
+        if open_type_expr:
+            type_expr += ', openType=%s' % open_type_expr
 
         if t.optional:
-            return "namedtype.OptionalNamedType('%s', %s)" % (t.identifier, self.generate_expr(t.type_decl))
+            named_type = 'namedtype.OptionalNamedType'
         elif t.default_value is not None:
-            type_expr = self.generate_expr(t.type_decl)
-            type_expr += '.subtype(value=%s)' % self.translate_value(t.default_value)
-
-            return "namedtype.DefaultedNamedType('%s', %s)" % (t.identifier, type_expr)
+            named_type = 'namedtype.DefaultedNamedType'
         else:
-            return "namedtype.NamedType('%s', %s)" % (t.identifier, self.generate_expr(t.type_decl))
+            named_type = 'namedtype.NamedType'
+
+        return pygen.PythonCode("%s('%s', " % (named_type, t.identifier), type_expr, ')')
+
+    def build_open_type_expr(self, t):
+        """ Build an opentype.OpenType for ANY DEFINED BY components with
+        mapped open types, so pyasn1 can decode them in one pass. The type
+        map itself goes into a module-level dict emitted ahead of the
+        definition.
+        """
+        any_type = t.type_decl
+        while isinstance(any_type, TaggedType):
+            any_type = any_type.type_decl
+
+        if not isinstance(any_type, SimpleType) or not any_type.open_types:
+            return None
+
+        unique_name = self.unique_name('%s_%s_openTypes' % (self.assignment_name, t.identifier))
+
+        fragment = self.writer.get_fragment()
+        fragment.write_line('%s = {' % unique_name)
+        fragment.push_indent()
+        entries = []
+        for mapping in any_type.open_types:
+            if isinstance(mapping.value, ObjectIdentifierValue):
+                value_expr = self.build_object_identifier_value(mapping.value)
+            else:
+                value_expr = self.translate_value(mapping.value)
+            entries.append(pygen.PythonCode('%s: ' % value_expr, self.generate_expr(mapping.type_decl)))
+        fragment.write_enumeration(entries)
+        fragment.pop_indent()
+        fragment.write_line('}')
+        self.pending_definitions.append((unique_name, fragment))
+
+        return "opentype.OpenType('%s', %s)" % (any_type.defined_by, unique_name)
 
     def inline_named_type(self, t):
-        return "namedtype.NamedType('%s', %s)" % (t.identifier, self.generate_expr(t.type_decl))
+        return pygen.PythonCode("namedtype.NamedType('%s', " % t.identifier,
+                                self.generate_component_expr(t.identifier, t.type_decl), ')')
 
     def inline_value_list_type(self, t):
         class_name = _translate_type(t.type_name)
@@ -439,20 +916,29 @@ class Pyasn1Backend(object):
             return class_name + '()'
 
     def inline_sequenceof_type(self, t):
-        expr = 'univ.SequenceOf(componentType=%s)' % self.generate_expr(t.type_decl)
-        if t.size_constraint:
+        expr = pygen.PythonCode('univ.SequenceOf(componentType=',
+                                self.generate_component_expr('item', t.type_decl), ')')
+        constraints = self.effective_constraints(t)
+        if constraints:
             expr += '.subtype(subtypeSpec=%s)' % \
-                    self.build_constraint_expr(t.size_constraint)
+                    self.build_constraints_expr(constraints)
         return expr
 
     def inline_setof_type(self, t):
-        expr = 'univ.SetOf(componentType=%s)' % self.generate_expr(t.type_decl)
-        if t.size_constraint:
+        expr = pygen.PythonCode('univ.SetOf(componentType=', self.generate_component_expr('item', t.type_decl), ')')
+        constraints = self.effective_constraints(t)
+        if constraints:
             expr += '.subtype(subtypeSpec=%s)' % \
-                    self.build_constraint_expr(t.size_constraint)
+                    self.build_constraints_expr(constraints)
         return expr
 
     def build_object_identifier_value(self, t):
+        # Use the arcs resolved at compile time if possible, and build the
+        # value at runtime with _OID otherwise.
+        arcs = self.sema_module.resolve_object_identifier(t, self.referenced_modules)
+        if arcs is not None:
+            return 'univ.ObjectIdentifier(%s)' % (arcs,)
+
         objid_components = []
 
         for c in t.components:
@@ -470,6 +956,38 @@ class Pyasn1Backend(object):
 
         return '_OID(%s)' % ', '.join(objid_components)
 
+    def generate_oid_names(self, assignments):
+        """ Generate a reverse lookup dict from object identifier arcs to
+        the names of the value assignments that define them. If several
+        values have the same arcs, the first one wins.
+        """
+        fragment = self.writer.get_fragment()
+
+        items = []
+        seen = set()
+        for assignment in assignments:
+            if not isinstance(assignment, ValueAssignment) or not isinstance(assignment.value, ObjectIdentifierValue):
+                continue
+
+            arcs = self.sema_module.resolve_object_identifier(assignment.value, self.referenced_modules)
+            if arcs is None or arcs in seen:
+                continue
+
+            seen.add(arcs)
+            items.append('%s: %r' % (arcs, str(assignment.value_name)))
+
+        if not items:
+            fragment.write_line('OID_NAMES = {}')
+            return fragment
+
+        fragment.write_line('OID_NAMES = {')
+        fragment.push_indent()
+        fragment.write_enumeration(items)
+        fragment.pop_indent()
+        fragment.write_line('}')
+
+        return fragment
+
     def generate_OID(self):
         fragment = self.writer.get_fragment()
 
@@ -493,7 +1011,7 @@ class Pyasn1Backend(object):
 
         fragment.pop_indent()
 
-        return str(fragment)
+        return fragment
 
     def translate_value(self, value):
         """ Translate ASN.1 built-in values to Python equivalents.
@@ -519,8 +1037,128 @@ class Pyasn1Backend(object):
         return _ASN1_BUILTIN_VALUES.get(v, v)
 
 
-def generate_pyasn1(sema_module, out_stream, referenced_modules):
-    return Pyasn1Backend(sema_module, out_stream, referenced_modules).generate_code()
+def generate_pyasn1(sema_module, out_stream, referenced_modules, lazy=False, included=None, hoist=False,
+                    oid_names=False, named_classes=False):
+    return Pyasn1Backend(sema_module, out_stream, referenced_modules, lazy, included, hoist,
+                         oid_names, named_classes).generate_code()
+
+
+def generate_pyasn1_package(sema_module, package_dir, referenced_modules, header='', chunk_size=1,
+                            included=None, hoist=False, oid_names=False, keep_unchanged=False,
+                            named_classes=False):
+    backend = Pyasn1Backend(sema_module, None, referenced_modules, False, included, hoist, oid_names,
+                            named_classes)
+    return backend.generate_package(package_dir, header, chunk_size, keep_unchanged)
+
+
+def _group_components(assignment_components, chunk_size):
+    """ Group consecutive strongly connected components into lists of at
+    most ``chunk_size`` assignments, in order. Components that are larger
+    than ``chunk_size`` are not split.
+    """
+    chunks = []
+    chunk = []
+    for component in assignment_components:
+        if chunk and len(chunk) + len(component) > chunk_size:
+            chunks.append(chunk)
+            chunk = []
+        chunk.extend(component)
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def _chunk_module(index):
+    return '_part%d' % index
+
+
+_CHUNK_MODULE_RE = re.compile(r'^_part(\d+)\.py$')
+
+
+# Placeholders for shareable expressions, see Pyasn1Backend.share. Generated
+# code never contains NUL characters.
+_SHARED_PLACEHOLDER = '\x00%d\x00'
+_SHARED_PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+
+# Names an expression may refer to and still be hoisted above all
+# assignments.
+_BUILTIN_EXPR_NAMES = frozenset(['univ', 'char', 'useful', 'namedtype', 'namedval', 'tag', 'constraint'])
+_STRING_LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+# Identifiers, except attribute and keyword argument names
+_FREE_NAME_RE = re.compile(r'(?<![\w.])([A-Za-z_]\w*)\b(?!\s*=(?!=))')
+
+
+def _is_builtin_expr(text):
+    text = _STRING_LITERAL_RE.sub('', text)
+    return all(name in _BUILTIN_EXPR_NAMES for name in _FREE_NAME_RE.findall(text))
+
+
+def _flat_text(expr):
+    """ Return the text of a single-line expression, which may be built
+    up as PythonCode, or None if it spans multiple lines.
+    """
+    if isinstance(expr, str):
+        return expr
+
+    if type(expr) is not pygen.PythonCode:
+        return None
+
+    texts = []
+    for part in expr.parts:
+        text = _flat_text(part)
+        if text is None:
+            return None
+        texts.append(text)
+
+    return ''.join(texts)
+
+
+# Runtime support for lazy modules. _require runs the initializer of a
+# component once, under a lock so other threads wait for it, and again on
+# the next access if it raised; __getattr__ and __dir__ make lazy names
+# look like ordinary module attributes.
+_LAZY_LOADER = """\
+_LOCK = threading.RLock()
+
+
+def _require(index):
+    if _INITIALIZERS[index] is None:
+        return
+    with _LOCK:
+        initializer = _INITIALIZERS[index]
+        if initializer is not None:
+            initializer()
+            _INITIALIZERS[index] = None
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    _require(_LAZY_NAMES[name])
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+"""
+
+
+# Loader for the __init__ of generated packages, see
+# Pyasn1Backend.generate_package.
+_PACKAGE_LOADER = """\
+def __getattr__(name):
+    if name not in _SUBMODULES:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + _SUBMODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
+"""
 
 
 # Translation tables from ASN.1 primitives to pyasn1 primitives
@@ -579,6 +1217,13 @@ def _translate_type(type_name):
     return _ASN1_BUILTIN_TYPES.get(type_name, type_name)
 
 
+def _assigned_name(assignment):
+    if isinstance(assignment, TypeAssignment):
+        return _translate_type(assignment.type_name)
+    else:
+        return _sanitize_identifier(assignment.value_name)
+
+
 def _translate_tag_class(tag_class):
     """ Translate ASN.1 tag class names to pyasn1 equivalents.
     Defaults to tag.tagClassContext if tag_class is not
@@ -612,14 +1257,68 @@ def _sanitize_module(name):
     return _sanitize_identifier(name).lower()
 
 
+# Subcommands of the asn1ate entry point, dispatched on the first argument.
+_COMMANDS = {
+    'deps': deps.main,
+    'diff': diff.main,
+}
+
+
 # Simplistic command-line driver
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in _COMMANDS:
+        return _COMMANDS[sys.argv[1]](sys.argv[2:])
+
     arg_parser = argparse.ArgumentParser(description='Generate Python classes from an ASN.1 definition file.'
-                                                     'Output to stdout by default.')
+                                                     'Output to stdout by default.',
+                                         epilog='Other commands: %s (see "asn1ate <command> --help").' %
+                                                ', '.join(sorted(_COMMANDS)))
     arg_parser.add_argument('file', help='the ASN.1 file to process')
     arg_parser.add_argument('--split', action='store_true',
                             help='output multiple modules to separate files')
+    arg_parser.add_argument('--open-types', metavar='FILE',
+                            help='JSON file mapping ANY DEFINED BY components to the types selected by values '
+                                 'of their governing component, e.g. '
+                                 '{"AlgorithmIdentifier.parameters": {"rsaEncryption": "NULL"}}')
+    arg_parser.add_argument('--lazy', action='store_true',
+                            help='defer building types until they are first used, to speed up import '
+                                 '(requires Python 3.7 or later)')
+    arg_parser.add_argument('--hoist', action='store_true',
+                            help='build identical inline type, constraint and tag expressions once, '
+                                 'as shared module-level constants')
+    arg_parser.add_argument('--roots', metavar='NAMES',
+                            help='comma-separated list of types or values to generate, along with everything '
+                                 'they depend on (names may be qualified as Module.name)')
+    arg_parser.add_argument('--oid-names', action='store_true',
+                            help='add an OID_NAMES dict mapping object identifier values to their names')
+    arg_parser.add_argument('--named-classes', action='store_true',
+                            help='generate classes instead of refined instances for anonymous inline types, '
+                                 'which pyasn1 can clone faster while decoding')
+    arg_parser.add_argument('--package', metavar='DIR',
+                            help='output each module as a package in DIR, with a submodule per group of '
+                                 'mutually dependent assignments, imported on first use '
+                                 '(requires Python 3.7 or later)')
+    arg_parser.add_argument('--jobs', metavar='N', type=int, default=1,
+                            help='generate up to N modules in parallel (default: %(default)s)')
+    arg_parser.add_argument('--manifest', metavar='FILE',
+                            help='with --split or --package, only generate modules whose inputs changed since '
+                                 'the last run with the same manifest FILE, and leave unchanged files alone')
+    arg_parser.add_argument('--compile', action='store_true',
+                            help='with --split or --package, byte-compile generated modules to __pycache__')
+    arg_parser.add_argument('--zip', metavar='FILE',
+                            help='with --split or --package, also bundle generated modules and their bytecode '
+                                 'into a zip FILE, which can be added to sys.path')
+    arg_parser.add_argument('--chunk-size', metavar='N', type=int, default=1,
+                            help='with --package, group dependent assignments into submodules of up to N '
+                                 'assignments (default: %(default)s)')
     args = arg_parser.parse_args()
+    if args.package and (args.lazy or args.split):
+        arg_parser.error('--package cannot be combined with --lazy or --split')
+    if args.chunk_size < 1:
+        arg_parser.error('--chunk-size must be at least 1')
+    for option, value in (('--manifest', args.manifest), ('--compile', args.compile), ('--zip', args.zip)):
+        if value and not (args.split or args.package):
+            arg_parser.error('%s requires --split or --package' % option)
 
     with open(args.file, 'r') as data:
         asn1def = data.read()
@@ -627,23 +1326,111 @@ def main():
     parse_tree = parser.parse_asn1(asn1def)
 
     modules = build_semantic_model(parse_tree)
-    if len(modules) > 1 and not args.split:
-        print('WARNING: More than one module generated to the same stream.', file=sys.stderr)
+    open_types = None
+    if args.open_types:
+        with open(args.open_types) as f:
+            open_types = json.load(f)
+        apply_open_type_map(modules, open_types)
+
+    included = None
+    if args.roots:
+        dependency_index = DependencyIndex(modules)
+        root_keys = deps.lookup_all(arg_parser, dependency_index, [n.strip() for n in args.roots.split(',')])
+        included = set(dependency_index.closure(root_keys))
+
+        # Leave out modules with nothing to generate.
+        modules_to_generate = [m for m in modules if any(key[0] == m.name for key in included)]
+    else:
+        modules_to_generate = modules
+
+    header = pygen.auto_generated_header(args.file, __version__)
+
+    output_modules = modules_to_generate
+    if args.manifest:
+        # Skip modules whose inputs are the same as in the last run.
+        options = {
+            'lazy': args.lazy,
+            'hoist': args.hoist,
+            'oid_names': args.oid_names,
+            'named_classes': args.named_classes,
+            'package': args.package is not None,
+            'chunk_size': args.chunk_size,
+            'roots': args.roots,
+            'open_types': open_types,
+        }
+        records = manifest.module_records(modules, options)
+        records = dict((m.name, records[m.name]) for m in modules_to_generate)
+        outputs = dict((m.name, _output_path(args, m)) for m in modules_to_generate)
+        outdated = manifest.outdated_modules(manifest.load_manifest(args.manifest), records, outputs)
+        modules_to_generate = [m for m in modules_to_generate if m.name in outdated]
+
+    if args.package:
+        def generate_package(module):
+            package_dir = os.path.dirname(_output_path(args, module))
+            generate_pyasn1_package(module, package_dir, modules, header, args.chunk_size,
+                                    included, args.hoist, args.oid_names, args.manifest is not None,
+                                    args.named_classes)
+
+        pygen.parallel_map(generate_package, modules_to_generate, args.jobs)
+    else:
+        if len(modules_to_generate) > 1 and not args.split:
+            print('WARNING: More than one module generated to the same stream.', file=sys.stderr)
+
+        # Generate modules to strings, possibly in parallel, and write them
+        # out in order.
+        def generate(module):
+            output_file = StringIO()
+            print(header, file=output_file)
+            generate_pyasn1(module, output_file, modules, args.lazy, included, args.hoist, args.oid_names,
+                            args.named_classes)
+            return output_file.getvalue()
+
+        module_codes = pygen.parallel_map(generate, modules_to_generate, args.jobs)
+        for module, code in zip(modules_to_generate, module_codes):
+            if args.manifest:
+                pygen.write_file_if_changed(_output_path(args, module), code)
+            elif args.split:
+                pygen.write_file_atomically(_output_path(args, module), code)
+            else:
+                sys.stdout.write(code)
 
-    output_file = sys.stdout
-    for module in modules:
-        try:
-            if args.split:
-                output_file = open(_sanitize_module(module.name) + '.py', 'w')
-            print(pygen.auto_generated_header(args.file, __version__),
-                  file=output_file)
-            generate_pyasn1(module, output_file, modules)
-        finally:
-            if output_file != sys.stdout:
-                output_file.close()
+    if args.compile:
+        pygen.parallel_map(pygen.compile_file, _output_files(args, modules_to_generate), args.jobs)
+    if args.zip:
+        # The bundle has all modules, also the ones that were up to date.
+        pygen.write_zip_bundle(args.zip, args.package or os.curdir, _output_files(args, output_modules))
+    if args.manifest:
+        manifest.save_manifest(args.manifest, records)
 
     return 0
 
 
+def _output_path(args, module):
+    """ Return the path of the file generated for ``module`` with --split
+    or --package.
+    """
+    module_name = _sanitize_module(module.name)
+    if args.package:
+        return os.path.join(args.package, module_name, '__init__.py')
+
+    return module_name + '.py'
+
+
+def _output_files(args, modules):
+    """ Return the paths of all files generated for ``modules`` with
+    --split or --package.
+    """
+    paths = []
+    for module in modules:
+        path = _output_path(args, module)
+        if args.package:
+            package_dir = os.path.dirname(path)
+            paths.extend(os.path.join(package_dir, f) for f in sorted(os.listdir(package_dir)) if f.endswith('.py'))
+        else:
+            paths.append(path)
+
+    return paths
+
+
 if __name__ == '__main__':
     sys.exit(main())
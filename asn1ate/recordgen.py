@@ -0,0 +1,802 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import pygen
+from asn1ate.sema import *
+from asn1ate.pyasn1gen import _sanitize_identifier
+from asn1ate.berdecgen import BerDecoderBackend
+from asn1ate.derencgen import DerEncoderBackend
+from asn1ate.codecgen import CodecBackend, generate_codec, _write_items
+
+
+class RecordBackend(CodecBackend):
+    """ Base class for backends that convert values to and from records,
+    lightweight Python objects generated for a spec. SEQUENCE and SET
+    values are instances of ``ber.Record`` subclasses, with a slot per
+    component, CHOICE values are instances of ``ber.Choice`` subclasses,
+    ENUMERATED values are members of ``enum.IntEnum`` subclasses, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo INTEGER,
+        #     bar ENUMERATED { red(0), blue(1) } OPTIONAL
+        # }
+        class Seq(Record):
+            __slots__ = ('foo', 'bar')
+
+            def __init__(self, foo=None, bar=None):
+                self.foo = foo
+                self.bar = bar
+
+        class Seq_bar(enum.IntEnum):
+            red = 0
+            blue = 1
+
+    and values of other types are the same as the values of the codecs,
+    e.g. lists for SEQUENCE OF and SET OF. Classes of type assignments
+    are named after the type, and classes of inline types after the
+    assignment and the component path. Absent OPTIONAL and DEFAULT
+    components are None, and NULL values are ``ber.NULL``, so present
+    OPTIONAL NULL components aren't None.
+
+    Records have no ``__dict__``, so they take a fraction of the memory
+    of dicts or pyasn1 objects. Subclasses generate converters, and
+    ``converted_types`` are the types of values they convert.
+    """
+
+    converted_types = (SequenceType, SetType, ChoiceType)
+
+    def generate_code(self):
+        # Classes of type assignments are named after the type, so inline
+        # types can't take those names.
+        for assignment in self.sema_module.assignments:
+            if isinstance(assignment, TypeAssignment):
+                self.module.private_names.add(_sanitize_identifier(assignment.type_name))
+
+        super(RecordBackend, self).generate_code()
+
+    def is_converted(self, t, module=None, seen=frozenset()):
+        """ Return True if values of the type ``t`` have values of
+        ``converted_types``, ENUMERATED values or NULLs in them. References
+        in ``t`` are resolved in ``module``.
+        """
+        module = module or self.sema_module
+        if isinstance(t, self.converted_types):
+            return True
+        elif isinstance(t, TaggedType):
+            return self.is_converted(t.type_decl, module, seen)
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.referenced_type(t, module, frozenset())
+            if id(type_decl) in seen:
+                return False
+            return self.is_converted(type_decl, defining_module, seen | set([id(type_decl)]))
+        elif isinstance(t, ConstructedType):
+            return any(self.is_converted(c.type_decl, module, seen)
+                       for c in module.resolve_components(t, self.referenced_modules)
+                       if not isinstance(c, ExtensionMarker))
+        elif isinstance(t, CollectionType):
+            return self.is_converted(t.type_decl, module, seen)
+        elif isinstance(t, SimpleType):
+            # NULL values are None in the codecs, which is absent in records.
+            return t.type_name == 'NULL'
+
+        return False
+
+    def is_enumerated(self, t):
+        return isinstance(t, ValueListType) and t.type_name == 'ENUMERATED'
+
+    def is_null(self, t):
+        _, builtin = self.resolved_type(t)
+        return isinstance(builtin, SimpleType) and builtin.type_name == 'NULL'
+
+    def is_simple(self, t):
+        """ Return True if the type ``t`` resolves to a simple type other
+        than ENUMERATED, whose values are the same in all modules.
+        """
+        _, builtin = self.resolved_type(t)
+        return isinstance(builtin, (SimpleType, ValueListType, BitStringType)) and not self.is_enumerated(builtin)
+
+    def record_class(self, t):
+        """ Return the name of the class of values of the SEQUENCE, SET,
+        CHOICE or ENUMERATED type ``t`` being generated, generating it if
+        needed. Backends share the classes.
+        """
+        key = (self.assignment_name, tuple(self.component_path))
+        if key not in self.module.classes:
+            if self.component_path:
+                class_name = self.unique_name('_'.join([self.assignment_name] + self.component_path))
+            elif self.assignment_name in _RUNTIME_CLASSES:
+                class_name = self.unique_name(self.assignment_name)
+            else:
+                class_name = self.assignment_name
+
+            if isinstance(t, ChoiceType):
+                fragment = self.generate_choice_class(class_name)
+            elif isinstance(t, ValueListType):
+                fragment = self.generate_enumerated_class(class_name, t)
+            else:
+                fragment = self.generate_record_class(class_name, t)
+            self.module.functions.append(fragment)
+            self.module.classes[key] = class_name
+
+        return self.module.classes[key]
+
+    def generate_record_class(self, class_name, t):
+        names = [_sanitize_identifier(c.identifier) for c in self.fields(t)]
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('class %s(%s):' % (class_name, self.runtime_name('Record')))
+        fragment.push_indent()
+        _write_items(fragment, '__slots__ = (', ["'%s'" % name for name in names], ',)' if len(names) == 1 else ')')
+        if names:
+            fragment.write_blanks(1)
+            _write_items(fragment, 'def __init__(self, ', ['%s=None' % name for name in names], '):')
+            fragment.push_indent()
+            for name in names:
+                fragment.write_line('self.%s = %s' % (name, name))
+            fragment.pop_indent()
+        fragment.pop_indent()
+
+        return fragment
+
+    def generate_choice_class(self, class_name):
+        fragment = pygen.PythonFragment()
+        fragment.write_line('class %s(%s):' % (class_name, self.runtime_name('Choice')))
+        fragment.push_indent()
+        fragment.write_line('__slots__ = ()')
+        fragment.pop_indent()
+
+        return fragment
+
+    def generate_enumerated_class(self, class_name, t):
+        self.module.imported_modules.add('enum')
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('class %s(enum.IntEnum):' % class_name)
+        fragment.push_indent()
+        for named_value in t.named_values:
+            if isinstance(named_value, NamedValue):
+                fragment.write_line('%s = %d' % (_sanitize_identifier(named_value.identifier), int(named_value.value)))
+        fragment.pop_indent()
+
+        return fragment
+
+    def fields(self, t):
+        return [c for c in self.resolve_components(t) if not isinstance(c, ExtensionMarker)]
+
+    def generate_tagged_type(self, t, function_name):
+        return self.generate(t.type_decl, function_name)
+
+
+class FromValueBackend(RecordBackend):
+    """ Backend to generate converters of the values of the codecs, e.g.
+    those BER decoders generated by ``asn1ate.berdecgen`` return, to
+    records, e.g.
+
+        def _fv_Seq(value):
+            record = Seq(value['foo'], value.get('bar'))
+            if record.bar is not None:
+                record.bar = Seq_bar(record.bar)
+            return record
+
+    Types without values that are records are converted by
+    ``ber.unchanged``. ``from_value_<Type>(value)`` returns the record of
+    ``value``, and ``FROM_VALUE`` maps type names to these functions.
+    """
+
+    prefix = '_fv_'
+    parameters = 'value'
+    registry_name = 'FROM_VALUE'
+    converted_types = RecordBackend.converted_types + (ValueListType,)
+
+    def __init__(self, sema_module, module, referenced_modules, **options):
+        super(FromValueBackend, self).__init__(sema_module, module, referenced_modules)
+
+        self.generators = {
+            ChoiceType: self.from_value_choice_type,
+            SequenceType: self.from_value_record_type,
+            SetType: self.from_value_record_type,
+            SequenceOfType: self.from_value_collection_type,
+            SetOfType: self.from_value_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.from_value_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.from_value_value_list_type,
+            BitStringType: self.from_value_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'from_value_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(value):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return _fv_%s(value)' % python_name)
+        fragment.pop_indent()
+
+        return public_name, fragment
+
+    def is_converted(self, t, module=None, seen=frozenset()):
+        if isinstance(t, ValueListType):
+            return self.is_enumerated(t)
+
+        return super(FromValueBackend, self).is_converted(t, module, seen)
+
+    def from_value_simple_type(self, t, function_name):
+        return self.runtime_name('null_from_value' if t.type_name == 'NULL' else 'unchanged')
+
+    def from_value_value_list_type(self, t, function_name):
+        if not self.is_enumerated(t):
+            return self.runtime_name('unchanged')
+
+        class_name = self.record_class(t)
+        if not any(isinstance(v, ExtensionMarker) for v in t.named_values):
+            return class_name
+
+        # Unknown extensions are kept as ints.
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('return %s(value)' % class_name)
+        fragment.pop_indent()
+        fragment.write_line('except ValueError:')
+        fragment.push_indent()
+        fragment.write_line('return value')
+        fragment.pop_indent()
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_value_record_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        class_name = self.record_class(t)
+
+        arguments = []
+        fixups = []
+        for c in self.fields(t):
+            optional = c.optional or c.default_value is not None
+            converter = self.generate_component(c.identifier, c.type_decl) if self.is_converted(c.type_decl) else None
+            if optional and self.is_null(c.type_decl):
+                arguments.append("%s if '%s' in value else None" % (self.runtime_name('NULL'), c.identifier))
+            elif optional:
+                arguments.append("value.get('%s')" % c.identifier)
+                if converter is not None:
+                    fixups.append((_sanitize_identifier(c.identifier), converter))
+            elif converter is not None:
+                arguments.append("%s(value['%s'])" % (converter, c.identifier))
+            else:
+                arguments.append("value['%s']" % c.identifier)
+
+        fragment = self.start_function(function_name)
+        if fixups:
+            _write_items(fragment, 'record = %s(' % class_name, arguments, ')')
+            for name, converter in fixups:
+                fragment.write_line('if record.%s is not None:' % name)
+                fragment.push_indent()
+                fragment.write_line('record.%s = %s(record.%s)' % (name, converter, name))
+                fragment.pop_indent()
+            fragment.write_line('return record')
+        else:
+            _write_items(fragment, 'return %s(' % class_name, arguments, ')')
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_value_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        class_name = self.record_class(t)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, item = value')
+        index = 0
+        for c in self.fields(t):
+            if self.is_converted(c.type_decl):
+                converter = self.generate_component(c.identifier, c.type_decl)
+                fragment.write_line("%s name == '%s':" % ('elif' if index else 'if', c.identifier))
+                fragment.push_indent()
+                fragment.write_line('item = %s(item)' % converter)
+                fragment.pop_indent()
+                index += 1
+        fragment.write_line('return %s(name, item)' % class_name)
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_value_collection_type(self, t, function_name):
+        if not self.is_converted(t.type_decl):
+            return self.runtime_name('unchanged')
+
+        function_name = self.function_name(function_name)
+        converter = self.generate_component('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('return list(map(%s, value))' % converter)
+        self.end_function(fragment)
+
+        return function_name
+
+
+class ToValueBackend(RecordBackend):
+    """ Backend to generate converters of records to the values of the
+    codecs, e.g. those DER encoders generated by ``asn1ate.derencgen``
+    take, e.g.
+
+        def _tv_Seq(value):
+            result = {'foo': value.foo}
+            if value.bar is not None:
+                result['bar'] = value.bar
+            return result
+
+    ``to_value_<Type>(record)`` returns the value of ``record``, and
+    ``TO_VALUE`` maps type names to these functions. ENUMERATED values
+    are ints already.
+    """
+
+    prefix = '_tv_'
+    parameters = 'value'
+    registry_name = 'TO_VALUE'
+
+    def __init__(self, sema_module, module, referenced_modules, **options):
+        super(ToValueBackend, self).__init__(sema_module, module, referenced_modules)
+
+        self.generators = {
+            ChoiceType: self.to_value_choice_type,
+            SequenceType: self.to_value_record_type,
+            SetType: self.to_value_record_type,
+            SequenceOfType: self.to_value_collection_type,
+            SetOfType: self.to_value_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.to_value_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.to_value_simple_type,
+            BitStringType: self.to_value_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'to_value_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(record):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return _tv_%s(record)' % python_name)
+        fragment.pop_indent()
+
+        return public_name, fragment
+
+    def to_value_simple_type(self, t, function_name):
+        return self.runtime_name('null_to_value' if t.type_name == 'NULL' else 'unchanged')
+
+    def to_value_record_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+
+        items = []
+        optionals = []
+        for c in self.fields(t):
+            expression = 'value.%s' % _sanitize_identifier(c.identifier)
+            if self.is_converted(c.type_decl):
+                expression = '%s(%s)' % (self.generate_component(c.identifier, c.type_decl), expression)
+            if c.optional or c.default_value is not None:
+                optionals.append((c, expression))
+            else:
+                items.append("'%s': %s" % (c.identifier, expression))
+
+        fragment = self.start_function(function_name)
+        if not optionals:
+            _write_items(fragment, 'return {', items, '}')
+        else:
+            _write_items(fragment, 'result = {', items, '}')
+            for c, expression in optionals:
+                fragment.write_line('if value.%s is not None:' % _sanitize_identifier(c.identifier))
+                fragment.push_indent()
+                fragment.write_line("result['%s'] = %s" % (c.identifier, expression))
+                fragment.pop_indent()
+            fragment.write_line('return result')
+        self.end_function(fragment)
+
+        return function_name
+
+    def to_value_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name = value.name')
+        index = 0
+        for c in self.fields(t):
+            if self.is_converted(c.type_decl):
+                converter = self.generate_component(c.identifier, c.type_decl)
+                fragment.write_line("%s name == '%s':" % ('elif' if index else 'if', c.identifier))
+                fragment.push_indent()
+                fragment.write_line('return name, %s(value.value)' % converter)
+                fragment.pop_indent()
+                index += 1
+        fragment.write_line('return name, value.value')
+        self.end_function(fragment)
+
+        return function_name
+
+    def to_value_collection_type(self, t, function_name):
+        if not self.is_converted(t.type_decl):
+            return self.runtime_name('unchanged')
+
+        function_name = self.function_name(function_name)
+        converter = self.generate_component('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('return list(map(%s, value))' % converter)
+        self.end_function(fragment)
+
+        return function_name
+
+
+class FromPyasn1Backend(RecordBackend):
+    """ Backend to generate converters of pyasn1 objects, e.g. those
+    classes generated by ``asn1ate.pyasn1gen`` decode, to records, e.g.
+
+        def _fp_Seq(value):
+            get = value.getComponentByName
+            record = Seq(int(get('foo')))
+            item = get('bar', None, instantiate=False)
+            if item is not None:
+                record.bar = _fp_Seq_bar(item)
+            return record
+
+    Values of simple types are converted by built-ins like ``int`` and
+    ``bytes``. ``from_pyasn1_<Type>(value)`` returns the record of the
+    pyasn1 object ``value``, and ``FROM_PYASN1`` maps type names to these
+    functions. The generated code doesn't import ``pyasn1``.
+    """
+
+    prefix = '_fp_'
+    parameters = 'value'
+    registry_name = 'FROM_PYASN1'
+
+    def __init__(self, sema_module, module, referenced_modules, **options):
+        super(FromPyasn1Backend, self).__init__(sema_module, module, referenced_modules)
+
+        self.generators = {
+            ChoiceType: self.from_pyasn1_choice_type,
+            SequenceType: self.from_pyasn1_record_type,
+            SetType: self.from_pyasn1_record_type,
+            SequenceOfType: self.from_pyasn1_collection_type,
+            SetOfType: self.from_pyasn1_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.from_pyasn1_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.from_pyasn1_value_list_type,
+            BitStringType: self.from_pyasn1_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'from_pyasn1_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(value):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return _fp_%s(value)' % python_name)
+        fragment.pop_indent()
+
+        return public_name, fragment
+
+    def converter(self, name, t):
+        """ Return the name of the converter of values of the type ``t`` of
+        the component ``name``, a built-in for simple types.
+        """
+        if self.is_simple(t):
+            _, builtin = self.resolved_type(t)
+            return self.from_pyasn1_simple_type(builtin, None)
+
+        return self.generate_component(name, t)
+
+    def from_pyasn1_simple_type(self, t, function_name):
+        converter = _FROM_PYASN1.get(t.type_name, 'str')
+        if converter in _RUNTIME_CONVERTERS:
+            return self.runtime_name(converter)
+
+        return converter
+
+    def from_pyasn1_value_list_type(self, t, function_name):
+        if not self.is_enumerated(t):
+            return 'int'
+
+        class_name = self.record_class(t)
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        if not any(isinstance(v, ExtensionMarker) for v in t.named_values):
+            fragment.write_line('return %s(int(value))' % class_name)
+        else:
+            # Unknown extensions are kept as ints.
+            fragment.write_line('value = int(value)')
+            fragment.write_line('try:')
+            fragment.push_indent()
+            fragment.write_line('return %s(value)' % class_name)
+            fragment.pop_indent()
+            fragment.write_line('except ValueError:')
+            fragment.push_indent()
+            fragment.write_line('return value')
+            fragment.pop_indent()
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_pyasn1_record_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        class_name = self.record_class(t)
+
+        arguments = []
+        optionals = []
+        for c in self.fields(t):
+            converter = self.converter(c.identifier, c.type_decl)
+            if c.optional or c.default_value is not None:
+                # Absent DEFAULT components have their default value, like
+                # with the BER decoders.
+                default = self.default_literal(c)
+                if default is not None and not self.is_simple(c.type_decl):
+                    default = '%s(%s)' % (converter, default)
+                optionals.append((c, converter))
+                arguments.append(default or 'None')
+            else:
+                arguments.append("%s(get('%s'))" % (converter, c.identifier))
+
+        # Trailing absent components are defaults of the constructor.
+        while arguments and arguments[-1] == 'None':
+            arguments.pop()
+
+        fragment = self.start_function(function_name)
+        if arguments or optionals:
+            fragment.write_line('get = value.getComponentByName')
+        if not optionals:
+            _write_items(fragment, 'return %s(' % class_name, arguments, ')')
+        else:
+            _write_items(fragment, 'record = %s(' % class_name, arguments, ')')
+            for c, converter in optionals:
+                fragment.write_line("item = get('%s', None, instantiate=False)" % c.identifier)
+                fragment.write_line('if item is not None:')
+                fragment.push_indent()
+                fragment.write_line('record.%s = %s(item)' % (_sanitize_identifier(c.identifier), converter))
+                fragment.pop_indent()
+            fragment.write_line('return record')
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_pyasn1_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        class_name = self.record_class(t)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, item = value.getName(), value.getComponent()')
+        for index, c in enumerate(self.fields(t)):
+            converter = self.converter(c.identifier, c.type_decl)
+            fragment.write_line("%s name == '%s':" % ('elif' if index else 'if', c.identifier))
+            fragment.push_indent()
+            fragment.write_line('return %s(name, %s(item))' % (class_name, converter))
+            fragment.pop_indent()
+        fragment.write_line("raise ValueError('Unknown alternative %%s of %s' %% name)" % self.description())
+        self.end_function(fragment)
+
+        return function_name
+
+    def from_pyasn1_collection_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+        converter = self.converter('item', t.type_decl)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('return list(map(%s, value))' % converter)
+        self.end_function(fragment)
+
+        return function_name
+
+
+class ToPyasn1Backend(RecordBackend):
+    """ Backend to generate converters of records to pyasn1 objects, e.g.
+
+        def _tp_Seq(value, obj):
+            obj['foo'] = value.foo
+            if value.bar is not None:
+                obj['bar'] = value.bar
+            return obj
+
+    Converters of constructed types fill ``obj``, an empty pyasn1 object of
+    the type, in place, so components get the tags of their type in the
+    pyasn1 classes, and converters of simple types return a new pyasn1
+    object like ``obj``. ``to_pyasn1_<Type>(record, asn1Spec)`` returns a
+    pyasn1 object like ``asn1Spec`` with the value of ``record``, and
+    ``TO_PYASN1`` maps type names to these functions.
+    """
+
+    prefix = '_tp_'
+    parameters = 'value, obj'
+    registry_name = 'TO_PYASN1'
+
+    def __init__(self, sema_module, module, referenced_modules, **options):
+        super(ToPyasn1Backend, self).__init__(sema_module, module, referenced_modules)
+
+        self.generators = {
+            ChoiceType: self.to_pyasn1_choice_type,
+            SequenceType: self.to_pyasn1_record_type,
+            SetType: self.to_pyasn1_record_type,
+            SequenceOfType: self.to_pyasn1_collection_type,
+            SetOfType: self.to_pyasn1_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.to_pyasn1_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.to_pyasn1_simple_type,
+            BitStringType: self.to_pyasn1_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'to_pyasn1_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(record, asn1Spec):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return _tp_%s(record, asn1Spec.clone())' % python_name)
+        fragment.pop_indent()
+
+        return public_name, fragment
+
+    def is_simple(self, t):
+        _, builtin = self.resolved_type(t)
+        return isinstance(builtin, (SimpleType, ValueListType, BitStringType))
+
+    def write_set(self, fragment, name, t, index, expression):
+        """ Write code to set the component or item ``index`` of ``obj``,
+        of the type ``t`` of the component ``name``, to ``expression``.
+        """
+        if not self.is_simple(t):
+            converter = self.generate_component(name, t)
+            fragment.write_line('%s(%s, obj[%s])' % (converter, expression, index))
+            return
+
+        _, builtin = self.resolved_type(t)
+        converter = self.to_pyasn1_simple_type(builtin, None)
+        if converter == 'to_pyasn1':
+            # pyasn1 makes objects of the component type itself.
+            fragment.write_line('obj[%s] = %s' % (index, expression))
+        else:
+            fragment.write_line('obj[%s] = %s(%s, obj[%s])' % (index, converter, expression, index))
+
+    def to_pyasn1_simple_type(self, t, function_name):
+        return self.runtime_name(_TO_PYASN1.get(t.type_name, 'to_pyasn1'))
+
+    def to_pyasn1_record_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+
+        fragment = self.start_function(function_name)
+        for c in self.fields(t):
+            name = _sanitize_identifier(c.identifier)
+            if c.optional or c.default_value is not None:
+                fragment.write_line('if value.%s is not None:' % name)
+                fragment.push_indent()
+                self.write_set(fragment, c.identifier, c.type_decl, "'%s'" % c.identifier, 'value.' + name)
+                fragment.pop_indent()
+            else:
+                self.write_set(fragment, c.identifier, c.type_decl, "'%s'" % c.identifier, 'value.' + name)
+        fragment.write_line('return obj')
+        self.end_function(fragment)
+
+        return function_name
+
+    def to_pyasn1_choice_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, item = value.name, value.value')
+        index = 0
+        for c in self.fields(t):
+            if self.is_simple(c.type_decl) and self.to_pyasn1_simple_type(self.resolved_type(c.type_decl)[1],
+                                                                          None) == 'to_pyasn1':
+                continue  # Set by name below
+
+            fragment.write_line("%s name == '%s':" % ('elif' if index else 'if', c.identifier))
+            fragment.push_indent()
+            self.write_set(fragment, c.identifier, c.type_decl, 'name', 'item')
+            fragment.write_line('return obj')
+            fragment.pop_indent()
+            index += 1
+        fragment.write_line('obj[name] = item')
+        fragment.write_line('return obj')
+        self.end_function(fragment)
+
+        return function_name
+
+    def to_pyasn1_collection_type(self, t, function_name):
+        function_name = self.function_name(function_name)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('obj.clear()')
+        if self.is_simple(t.type_decl) and self.to_pyasn1_simple_type(self.resolved_type(t.type_decl)[1],
+                                                                      None) == 'to_pyasn1':
+            fragment.write_line('obj.extend(value)')
+        else:
+            fragment.write_line('for index, item in enumerate(value):')
+            fragment.push_indent()
+            self.write_set(fragment, 'item', t.type_decl, 'index', 'item')
+            fragment.pop_indent()
+        fragment.write_line('return obj')
+        self.end_function(fragment)
+
+        return function_name
+
+
+def generate_records(sema_module, out_stream, referenced_modules, decoders=False, encoders=False):
+    backend_classes = [FromValueBackend, ToValueBackend, FromPyasn1Backend, ToPyasn1Backend]
+    if encoders:
+        backend_classes.insert(0, DerEncoderBackend)
+    if decoders:
+        backend_classes.insert(0, BerDecoderBackend)
+    return generate_codec(sema_module, out_stream, referenced_modules, backend_classes)
+
+
+# Runtime base classes records derive from, which type assignments can't
+# take the names of.
+_RUNTIME_CLASSES = set(['Record', 'Choice', 'enum'])
+
+# Converters of pyasn1 objects of built-in types, Python built-ins by
+# default, and strings for types not listed.
+_FROM_PYASN1 = {
+    'ANY': 'bytes',
+    'INTEGER': 'int',
+    'BOOLEAN': 'bool',
+    'NULL': 'null_from_pyasn1',
+    'REAL': 'float',
+    'BIT STRING': 'bit_string_from_pyasn1',
+    'OCTET STRING': 'bytes',
+    'OBJECT IDENTIFIER': 'tuple',
+}
+
+# Converters in asn1ate.support.ber
+_RUNTIME_CONVERTERS = set(['null_from_pyasn1', 'bit_string_from_pyasn1'])
+
+# Converters to pyasn1 objects of built-in types, in asn1ate.support.ber,
+# ber.to_pyasn1 for types not listed.
+_TO_PYASN1 = {
+    'NULL': 'null_to_pyasn1',
+    'REAL': 'real_to_pyasn1',
+    'BIT STRING': 'bit_string_to_pyasn1',
+}
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.recordgen',
+                         'Generate record classes and converters from an ASN.1 definition file.',
+                         generate_records,
+                         [('--decoders', dict(action='store_true',
+                                              help='also generate BER decoders, as asn1ate.berdecgen does')),
+                          ('--encoders', dict(action='store_true',
+                                              help='also generate DER encoders, as asn1ate.derencgen does'))],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
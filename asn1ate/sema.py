@@ -44,9 +44,94 @@ def build_semantic_model(parse_result):
                 if isinstance(descendant, ConstructedType):
                     descendant.auto_tag()
 
+    # Expand COMPONENTS OF, compute effective constraints and resolve object
+    # identifiers once up front, so backends can share the results through
+    # Module.resolve_components, Module.effective_constraints and
+    # Module.resolve_object_identifier.
+    for module in root:
+        for descendant in module.descendants():
+            if isinstance(descendant, ConstructedType):
+                module.resolve_components(descendant, root)
+
+    for module in root:
+        for assignment in module.assignments:
+            if isinstance(assignment, TypeAssignment):
+                module.effective_constraints(assignment.type_decl, root)
+            elif isinstance(assignment.value, ObjectIdentifierValue):
+                module.resolve_object_identifier(assignment.value, root)
+
     return root
 
 
+def apply_open_type_map(modules, open_type_map):
+    """ Map values of the governing component of ANY DEFINED BY components
+    to the types they select, so code generators can emit open type dispatch
+    tables. ``modules`` is the result of ``build_semantic_model``.
+
+    ``open_type_map`` is a dict of component path -> dict of value -> type,
+    e.g.
+
+        {'AlgorithmIdentifier.parameters': {
+            'rsaEncryption': 'NULL',
+            '{1 2 840 10040 4 1}': 'Dss-Parms'}}
+
+    Component paths are ``Type.component``, or ``Module.Type.component`` if
+    the type name alone is ambiguous. Values and types are written in ASN.1
+    notation, and references in them are resolved in the scope of the module
+    defining the type.
+    """
+    # Parse all values and types in one go, by wrapping them up in a
+    # synthetic module.
+    any_types = []
+    lines = ['OpenTypeMap DEFINITIONS ::= BEGIN']
+    for path, mappings in open_type_map.items():
+        any_type = _find_open_type_component(modules, path)
+        for value, type_decl in mappings.items():
+            lines.append('v%d ANY ::= %s' % (len(any_types), value))
+            lines.append('T%d ::= %s' % (len(any_types), type_decl))
+            any_types.append(any_type)
+    lines.append('END')
+
+    assignments = build_semantic_model(parser.parse_asn1('\n'.join(lines)))[0].assignments
+    for i, any_type in enumerate(any_types):
+        value = assignments[2 * i].value
+        type_decl = assignments[2 * i + 1].type_decl
+        any_type.open_types.append(OpenTypeMapping((value, type_decl)))
+
+
+def _find_open_type_component(modules, path):
+    parts = path.split('.')
+    if len(parts) == 3:
+        module_name, type_name, component_name = parts
+        candidates = [m for m in modules if m.name == module_name]
+    elif len(parts) == 2:
+        type_name, component_name = parts
+        candidates = modules
+    else:
+        raise Exception('Malformed open type component path: %s' % path)
+
+    matches = [m for m in candidates if type_name in m.user_types()]
+    if len(matches) != 1:
+        raise Exception('%s type in open type component path: %s' % ('Ambiguous' if matches else 'Unknown', path))
+
+    type_decl = matches[0].user_types()[type_name]
+    while isinstance(type_decl, TaggedType):
+        type_decl = type_decl.type_decl
+
+    components = getattr(type_decl, 'components', [])
+    for component in components:
+        if getattr(component, 'identifier', None) == component_name:
+            any_type = component.type_decl
+            while isinstance(any_type, TaggedType):
+                any_type = any_type.type_decl
+
+            if not isinstance(any_type, SimpleType) or not any_type.defined_by:
+                raise Exception('Not an ANY DEFINED BY component: %s' % path)
+            return any_type
+
+    raise Exception('Unknown component in open type component path: %s' % path)
+
+
 def topological_sort(assignments):
     """ Algorithm adapted from:
     http://en.wikipedia.org/wiki/Topological_sorting.
@@ -117,60 +202,197 @@ def dependency_sort(assignments):
     # Build reverse-lookup table from name -> node.
     assignments_by_name = {a.reference_name(): a for a in assignments}
 
-    # Build the dependency graph.
+    # Build the dependency graph. Visit references in name order so the
+    # result does not depend on set iteration order.
     graph = {}
     for assignment in assignments:
-        references = assignment.references()
+        references = sorted(assignment.references())
         graph[assignment] = [assignments_by_name[r] for r in references
                              if r in assignments_by_name]
 
-    # Now let Tarjan do its work! Adapted from here:
-    # http://www.logarithmic.net/pfh-files/blog/01208083168/tarjan.py
-    index_counter = [0]
-    stack = []
-    lowlinks = {}
+    nodes = sorted(graph.keys(), key=lambda a: a.reference_name())
+    return _strongly_connected_components(nodes, graph)
+
+
+def _strongly_connected_components(nodes, graph):
+    """ Tarjan's algorithm over ``graph``, a dict of node -> list of
+    successor nodes, visiting root candidates in the order of ``nodes``.
+
+    Returns a list of tuples of nodes, one per strongly-connected component,
+    in dependency order (successors before predecessors).
+
+    Adapted from here:
+    http://www.logarithmic.net/pfh-files/blog/01208083168/tarjan.py
+    but with an explicit work stack instead of recursion, so long reference
+    chains in large specs don't hit the recursion limit.
+    """
     index = {}
+    lowlinks = {}
+    stack = []
+    on_stack = set()
     result = []
 
-    def strongconnect(node):
+    def visit(node):
         # Set the depth index for this node to the smallest unused index
-        index[node] = index_counter[0]
-        lowlinks[node] = index_counter[0]
-        index_counter[0] += 1
+        index[node] = len(index)
+        lowlinks[node] = index[node]
         stack.append(node)
-
-        # Consider successors of `node`
-        successors = graph.get(node, [])
-        for successor in successors:
-            if successor not in lowlinks:
-                # Successor has not yet been visited; recurse on it
-                strongconnect(successor)
-                lowlinks[node] = min(lowlinks[node], lowlinks[successor])
-            elif successor in stack:
-                # the successor is in the stack and hence in the current
-                # strongly connected component (SCC)
-                lowlinks[node] = min(lowlinks[node], index[successor])
-
-        # If `node` is a root node, pop the stack and generate an SCC
-        if lowlinks[node] == index[node]:
-            connected_component = []
-
-            while True:
-                successor = stack.pop()
-                connected_component.append(successor)
-                if successor == node:
+        on_stack.add(node)
+        return node, iter(graph.get(node, []))
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        work = [visit(root)]
+        while work:
+            node, successors = work[-1]
+
+            # Consider successors of `node`
+            for successor in successors:
+                if successor not in index:
+                    # Successor has not yet been visited; descend into it
+                    # and resume with the remaining successors afterwards.
+                    work.append(visit(successor))
                     break
+                elif successor in on_stack:
+                    # the successor is in the stack and hence in the current
+                    # strongly connected component (SCC)
+                    lowlinks[node] = min(lowlinks[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+
+                # If `node` is a root node, pop the stack and generate an SCC
+                if lowlinks[node] == index[node]:
+                    connected_component = []
 
-            component = tuple(connected_component)
-            result.append(component)
+                    while True:
+                        successor = stack.pop()
+                        on_stack.discard(successor)
+                        connected_component.append(successor)
+                        if successor == node:
+                            break
 
-    for node in sorted(graph.keys(), key=lambda a: a.reference_name()):
-        if node not in lowlinks:
-            strongconnect(node)
+                    result.append(tuple(connected_component))
 
     return result
 
 
+class DependencyIndex(object):
+    """ Forward and reverse dependency index over all assignments in a set
+    of modules, as returned by ``build_semantic_model``.
+
+    Assignments are identified by (module name, reference name) tuples,
+    which we call keys. References are resolved across modules through
+    imports and external references.
+
+    The reference graph is condensed into its strongly-connected components
+    once, up front, and the transitive closure of every component is
+    precomputed as a bit set over components, so transitive queries are
+    answered without walking the graph.
+    """
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.assignments = {}
+        self.forward = {}
+        self.reverse = {}
+
+        for module in modules:
+            for assignment in module.assignments:
+                key = (module.name, assignment.reference_name())
+                self.assignments[key] = (module, assignment)
+                self.forward[key] = module.qualified_references(assignment)
+
+        # References to assignments outside the module set can't be
+        # followed, so keep them out of the graph proper.
+        graph = {}
+        for key, references in self.forward.items():
+            graph[key] = sorted(r for r in references if r in self.assignments)
+            for reference in graph[key]:
+                self.reverse.setdefault(reference, set()).add(key)
+
+        self.components = _strongly_connected_components(sorted(graph), graph)
+        self._component_index = {}
+        for i, component in enumerate(self.components):
+            for key in component:
+                self._component_index[key] = i
+
+        # Components come out in dependency order, so everything a component
+        # depends on has a lower index and its closure is already known when
+        # we get to it. Users are the mirror image, with higher indices.
+        self._closure_bits = []
+        for i, component in enumerate(self.components):
+            bits = 1 << i
+            for key in component:
+                for reference in graph[key]:
+                    j = self._component_index[reference]
+                    if j != i:
+                        bits |= self._closure_bits[j]
+            self._closure_bits.append(bits)
+
+        self._user_bits = [0] * len(self.components)
+        for i in reversed(range(len(self.components))):
+            bits = 1 << i
+            for key in self.components[i]:
+                for dependent in self.reverse.get(key, ()):
+                    bits |= self._user_bits[self._component_index[dependent]]
+            self._user_bits[i] = bits
+
+    def lookup(self, name):
+        """ Return the sorted keys of all assignments matching ``name``, which
+        is either a reference name or a qualified ``Module.reference`` name.
+        """
+        if '.' in name:
+            module_name, reference_name = name.rsplit('.', 1)
+            key = (module_name, reference_name)
+            return [key] if key in self.assignments else []
+
+        return sorted(key for key in self.assignments if key[1] == name)
+
+    def dependencies(self, key):
+        """ Return the keys directly referenced by ``key``. """
+        return set(r for r in self.forward.get(key, ()) if r in self.assignments)
+
+    def dependents(self, key):
+        """ Return the keys directly referencing ``key``. """
+        return set(self.reverse.get(key, ()))
+
+    def closure(self, keys):
+        """ Return the keys of all assignments needed to define ``keys``,
+        including ``keys`` themselves, in dependency order.
+        """
+        bits = 0
+        for key in keys:
+            bits |= self._closure_bits[self._component_index[key]]
+
+        return self._expand(bits)
+
+    def users(self, keys):
+        """ Return the keys of all assignments that transitively reference
+        any of ``keys``, in dependency order. ``keys`` themselves are only
+        included if they're part of a reference cycle.
+        """
+        bits = 0
+        for key in keys:
+            for dependent in self.reverse.get(key, ()):
+                bits |= self._user_bits[self._component_index[dependent]]
+
+        return self._expand(bits)
+
+    def _expand(self, bits):
+        keys = []
+        while bits:
+            lowest = bits & -bits
+            keys.extend(sorted(self.components[lowest.bit_length() - 1]))
+            bits ^= lowest
+
+        return keys
+
+
 # Registered object identifier names
 REGISTERED_OID_NAMES = {
     'ccitt': 0,
@@ -192,6 +414,40 @@ REGISTERED_OID_NAMES = {
 }
 
 
+# Universal tag numbers of built-in types, see X.680, 8.4
+UNIVERSAL_TAGS = {
+    'BOOLEAN': 1,
+    'INTEGER': 2,
+    'BIT STRING': 3,
+    'OCTET STRING': 4,
+    'NULL': 5,
+    'OBJECT IDENTIFIER': 6,
+    'ObjectDescriptor': 7,
+    'EXTERNAL': 8,
+    'REAL': 9,
+    'ENUMERATED': 10,
+    'UTF8String': 12,
+    'RELATIVE-OID': 13,
+    'SEQUENCE': 16,
+    'SEQUENCE OF': 16,
+    'SET': 17,
+    'SET OF': 17,
+    'NumericString': 18,
+    'PrintableString': 19,
+    'TeletexString': 20,
+    'T61String': 20,
+    'VideotexString': 21,
+    'IA5String': 22,
+    'UTCTime': 23,
+    'GeneralizedTime': 24,
+    'GraphicString': 25,
+    'VisibleString': 26,
+    'GeneralString': 27,
+    'UniversalString': 28,
+    'BMPString': 30
+}
+
+
 class TagImplicitness(object):
     """ Tag implicit/explicit enumeration """
     IMPLICIT = 0
@@ -228,24 +484,37 @@ class SemaNode(object):
         sema nodes.
         """
         # Collect all SemaNode members.
-        members = list(vars(self).values())
-        children = [m for m in members if isinstance(m, SemaNode)]
+        children = []
+        list_members = []
+        for m in vars(self).values():
+            if isinstance(m, SemaNode):
+                children.append(m)
+            elif isinstance(m, list):
+                list_members.append(m)
 
         # Expand SemaNodes out of list members, but do not recurse
         # through lists of lists.
-        list_members = [m for m in members if isinstance(m, list)]
         for m in list_members:
             children.extend(n for n in m if isinstance(n, SemaNode))
 
         return children
 
     def descendants(self):
-        """ Return a list of all recursively contained sema nodes.
+        """ Return a list of all recursively contained sema nodes,
+        in depth-first pre-order.
         """
+        # Walk with an explicit stack rather than recursing, so deep
+        # trees are neither copied once per level nor limited by the
+        # recursion limit.
         descendants = []
-        for child in self.children():
-            descendants.append(child)
-            descendants.extend(child.descendants())
+        stack = self.children()
+        stack.reverse()
+        while stack:
+            node = stack.pop()
+            descendants.append(node)
+            children = node.children()
+            children.reverse()
+            stack.extend(children)
 
         return descendants
 
@@ -253,6 +522,11 @@ class SemaNode(object):
 class Module(SemaNode):
     def __init__(self, elements):
         self._user_types = {}
+        self._assignments_by_name = {}
+        self._imported_names = {}
+        self._resolved_components = {}
+        self._effective_constraints = {}
+        self._resolved_oids = {}
 
         module_reference, definitive_identifier, tag_default, extension_default, module_body = elements
 
@@ -284,27 +558,268 @@ class Module(SemaNode):
 
         return self._user_types
 
+    def assignments_by_name(self):
+        if not self._assignments_by_name:
+            for assignment in self.assignments:
+                self._assignments_by_name[assignment.reference_name()] = assignment
+
+        return self._assignments_by_name
+
+    def resolve_reference(self, reference_name, module_ref=None):
+        """ Return the name of the module defining ``reference_name`` as seen
+        from this module, or None if it is not defined locally, imported or
+        qualified with an explicit module reference (e.g. registered OID
+        names).
+        """
+        if module_ref:
+            return module_ref.name
+
+        if reference_name in self.assignments_by_name():
+            return self.name
+
+        if not self._imported_names and self.imports:
+            for global_module_ref, symbols in self.imports.imports.items():
+                for symbol in symbols:
+                    self._imported_names[symbol] = global_module_ref.module_ref.name
+
+        return self._imported_names.get(reference_name)
+
+    def qualified_references(self, assignment):
+        """ Like ``Assignment.references``, but return a set of
+        (module name, reference name) tuples, with imports and external
+        references resolved. Unresolvable names are left out.
+        """
+        references = set()
+        for d in assignment.descendants():
+            if not hasattr(d, 'reference_name'):
+                continue
+
+            reference_name = d.reference_name()
+            module_name = self.resolve_reference(reference_name, getattr(d, 'module_ref', None))
+            if module_name:
+                references.add((module_name, reference_name))
+
+        return references
+
     def resolve_type_decl(self, type_decl, referenced_modules):
         """ Recursively resolve user-defined types to their built-in
         declaration.
         """
+        return self.resolve_type_decl_with_module(type_decl, referenced_modules)[1]
+
+    def resolve_type_decl_with_module(self, type_decl, referenced_modules):
+        """ Like ``resolve_type_decl``, but return a (module, type_decl)
+        tuple, where module is the module the built-in declaration is
+        written in. Imported type references are followed to their module.
+        """
         if isinstance(type_decl, ReferencedType):
-            module = None
-            if not type_decl.module_ref or type_decl.module_ref.name == self.name:
-                module = self
+            module_name = self.resolve_reference(type_decl.type_name, getattr(type_decl, 'module_ref', None))
+            module = self.find_module(module_name or self.name, referenced_modules)
+            return module.resolve_type_decl_with_module(module.user_types()[type_decl.type_name], referenced_modules)
+        else:
+            return self, type_decl
+
+    def find_module(self, module_name, referenced_modules):
+        if module_name == self.name:
+            return self
+
+        for ref_mod in referenced_modules:
+            if ref_mod.name == module_name:
+                return ref_mod
+
+        raise Exception('Unrecognized referenced module %s in %s.' % (module_name,
+                                                                      [module.name for module in
+                                                                       referenced_modules]))
+
+    def resolve_components(self, type_decl, referenced_modules):
+        """ Return the components of the constructed type ``type_decl``, with
+        every COMPONENTS OF replaced by the components of the included type.
+
+        The expansion is done once per constructed type and cached, so types
+        included into many others are only expanded once. Circular inclusion
+        raises an exception.
+        """
+        key = id(type_decl)
+        if key in self._resolved_components:
+            components = self._resolved_components[key]
+            if components is None:
+                raise Exception('Circular COMPONENTS OF in %s' % type_decl)
+            return components
+
+        if not any(getattr(c, 'components_of_type', None) for c in type_decl.components):
+            self._resolved_components[key] = type_decl.components
+            return type_decl.components
+
+        # Mark the expansion as in progress to catch cycles.
+        self._resolved_components[key] = None
+
+        components = []
+        for component in type_decl.components:
+            if isinstance(component, ComponentType) and component.components_of_type:
+                # COMPONENTS OF works like a literal include, so expand all
+                # components of the referenced type, in its own module.
+                module, included_type_decl = self.resolve_type_decl_with_module(component.components_of_type,
+                                                                                referenced_modules)
+                if not isinstance(included_type_decl, ConstructedType):
+                    raise Exception('COMPONENTS OF non-constructed type %s' % component.components_of_type)
+
+                included_components = module.resolve_components(included_type_decl, referenced_modules)
+                components.extend(c for c in included_components if not isinstance(c, ExtensionMarker))
+            else:
+                components.append(component)
+
+        self._resolved_components[key] = components
+        return components
+
+    def effective_constraints(self, type_decl, referenced_modules):
+        """ Return the list of constraints that apply to values of
+        ``type_decl``, including those inherited along chains of defined
+        types.
+
+        Constraints of the same kind are intersected into one, and
+        references to numeric values are folded to literals, so the result
+        usually has at most one value constraint and one size constraint.
+        Results are cached per type.
+        """
+        key = id(type_decl)
+        if key in self._effective_constraints:
+            constraints = self._effective_constraints[key]
+            if constraints is None:
+                raise Exception('Circular type definition in %s' % type_decl)
+            return constraints
+
+        # Mark the computation as in progress to catch cycles.
+        self._effective_constraints[key] = None
+
+        constraints = []
+        if isinstance(type_decl, TaggedType):
+            constraints = self.effective_constraints(type_decl.type_decl, referenced_modules)
+        elif isinstance(type_decl, DefinedType):
+            module, base_decl = self._find_type_decl(type_decl, referenced_modules)
+            if base_decl is not None:
+                constraints = module.effective_constraints(base_decl, referenced_modules)
+
+        if isinstance(type_decl, CollectionType):
+            own_constraint = type_decl.size_constraint
+        else:
+            own_constraint = getattr(type_decl, 'constraint', None)
+
+        if own_constraint:
+            own_constraint = self._fold_constraint(own_constraint, referenced_modules)
+            constraints = _intersect_constraints(constraints, own_constraint)
+
+        self._effective_constraints[key] = constraints
+        return constraints
+
+    def resolve_value(self, value, referenced_modules):
+        """ Follow value references to the literal they are assigned. Values
+        that do not resolve to a numeric literal are returned unchanged.
+        """
+        seen = set()
+        module, resolved = self, value
+        while isinstance(resolved, ReferencedValue):
+            module_name = module.resolve_reference(resolved.name, resolved.module_ref)
+            defining_module = _lookup_module(module_name, [module] + list(referenced_modules))
+            if defining_module is None or (module_name, resolved.name) in seen:
+                return value
+
+            seen.add((module_name, resolved.name))
+            assignment = defining_module.assignments_by_name().get(resolved.name)
+            if not isinstance(assignment, ValueAssignment):
+                return value
+
+            module, resolved = defining_module, assignment.value
+
+        if _constraint_bound(resolved) is None:
+            return value
+
+        return resolved
+
+    def resolve_object_identifier(self, value, referenced_modules):
+        """ Return the arcs of an object identifier value as a tuple of ints,
+        or None if some component can't be resolved at compile time.
+
+        ``value`` is an ObjectIdentifierValue or a reference to one. Names in
+        the value are looked up as registered OID names first, and then as
+        value references, which are followed through other object identifier
+        or integer values, across modules. Results are cached.
+        """
+        if isinstance(value, ReferencedValue):
+            return self._resolve_oid_reference(value.name, value.module_ref, referenced_modules, set())
+
+        key = id(value)
+        if key in self._resolved_oids:
+            return self._resolved_oids[key]
+
+        # Unresolvable until proven otherwise, which also stops cycles.
+        self._resolved_oids[key] = None
+
+        arcs = []
+        for component in value.components:
+            if isinstance(component, NameForm) and component.name in REGISTERED_OID_NAMES:
+                arcs.append(REGISTERED_OID_NAMES[component.name])
+            elif isinstance(component, NameForm):
+                component_arcs = self._resolve_oid_reference(component.name, None, referenced_modules, set())
+                if component_arcs is None:
+                    return None
+                arcs.extend(component_arcs)
+            elif isinstance(component, ReferencedValue):
+                component_arcs = self._resolve_oid_reference(component.name, component.module_ref,
+                                                             referenced_modules, set())
+                if component_arcs is None:
+                    return None
+                arcs.extend(component_arcs)
+            elif isinstance(component, NumberForm):
+                arcs.append(int(component.value))
+            elif isinstance(component, NameAndNumberForm):
+                arcs.append(int(component.number.value))
             else:
-                # Find the referenced module
-                for ref_mod in referenced_modules:
-                    if ref_mod.name == type_decl.module_ref.name:
-                        module = ref_mod
-                        break
-            if not module:
-                raise Exception('Unrecognized referenced module %s in %s.' % (type_decl.module_ref.name,
-                                                                              [module.name for module in
-                                                                               referenced_modules]))
-            return module.resolve_type_decl(module.user_types()[type_decl.type_name], referenced_modules)
+                return None
+
+        self._resolved_oids[key] = tuple(arcs)
+        return self._resolved_oids[key]
+
+    def _resolve_oid_reference(self, name, module_ref, referenced_modules, seen):
+        module_name = self.resolve_reference(name, module_ref)
+        module = _lookup_module(module_name, [self] + list(referenced_modules))
+        if module is None or (module_name, name) in seen:
+            return None
+        seen.add((module_name, name))
+
+        assignment = module.assignments_by_name().get(name)
+        if not isinstance(assignment, ValueAssignment):
+            return None
+
+        value = assignment.value
+        if isinstance(value, ObjectIdentifierValue):
+            return module.resolve_object_identifier(value, referenced_modules)
+        elif isinstance(value, ReferencedValue):
+            return module._resolve_oid_reference(value.name, value.module_ref, referenced_modules, seen)
+
+        number = _constraint_bound(value)
+        if isinstance(number, int):
+            return (number,)
+
+        return None
+
+    def _find_type_decl(self, defined_type, referenced_modules):
+        module_name = self.resolve_reference(defined_type.type_name, defined_type.module_ref)
+        module = _lookup_module(module_name, [self] + list(referenced_modules))
+        if module is None:
+            return None, None
+
+        return module, module.user_types().get(defined_type.type_name)
+
+    def _fold_constraint(self, constraint, referenced_modules):
+        if isinstance(constraint, SingleValueConstraint):
+            return SingleValueConstraint([self.resolve_value(constraint.value, referenced_modules)])
+        elif isinstance(constraint, ValueRangeConstraint):
+            return ValueRangeConstraint([self.resolve_value(constraint.min_value, referenced_modules),
+                                         self.resolve_value(constraint.max_value, referenced_modules)])
+        elif isinstance(constraint, SizeConstraint):
+            return SizeConstraint([self._fold_constraint(constraint.nested, referenced_modules)])
         else:
-            return type_decl
+            return constraint
 
     def get_type_decl(self, type_name):
         user_types = self.user_types()
@@ -591,15 +1106,41 @@ class SimpleType(SemaNode):
     def __init__(self, elements):
         self.constraint = None
         self.type_name = elements[0]
-        if len(elements) > 1:
-            _assert_annotated_token(elements[1])
-            self.constraint = _create_sema_node(elements[1])
+
+        # ANY DEFINED BY keeps the identifier of the governing component,
+        # and open types mapped to it with ``apply_open_type_map``.
+        self.defined_by = None
+        self.open_types = []
+
+        for element in elements[1:]:
+            _assert_annotated_token(element)
+            if element.ty == 'Identifier':
+                self.defined_by = element.elements[0]
+            else:
+                self.constraint = _create_sema_node(element)
 
     def __str__(self):
+        type_name = self.type_name
+        if self.defined_by:
+            type_name += ' DEFINED BY %s' % self.defined_by
+
         if self.constraint is None:
-            return self.type_name
+            return type_name
+
+        return '%s %s' % (type_name, self.constraint)
 
-        return '%s %s' % (self.type_name, self.constraint)
+    __repr__ = __str__
+
+
+class OpenTypeMapping(SemaNode):
+    """ Maps a value of the governing component of an ANY DEFINED BY to the
+    type carried in the ANY when the governing component has that value.
+    """
+    def __init__(self, elements):
+        self.value, self.type_decl = elements
+
+    def __str__(self):
+        return '%s: %s' % (self.value, self.type_decl)
 
     __repr__ = __str__
 
@@ -695,7 +1236,7 @@ class SizeConstraint(SemaNode):
     """ Size constraints nest single-value or range constraints to denote valid sizes. """
 
     def __init__(self, elements):
-        self.nested = _create_sema_node(elements[0])
+        self.nested = _maybe_create_sema_node(elements[0])
         if not isinstance(self.nested, (ValueRangeConstraint, SingleValueConstraint)):
             raise Exception('Unexpected size constraint type %s' % self.nested.__class__.__name__)
 
@@ -901,6 +1442,88 @@ class HexStringValue(SemaNode):
     __repr__ = __str__
 
 
+def _lookup_module(module_name, modules):
+    for module in modules:
+        if module.name == module_name:
+            return module
+
+    return None
+
+
+def _constraint_bound(value):
+    """ Return the numeric value of a constraint bound, or None if it is not a
+    numeric literal. MIN and MAX are represented as infinities.
+    """
+    if value == 'MIN':
+        return float('-inf')
+    elif value == 'MAX':
+        return float('inf')
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intersect_constraint_pair(a, b):
+    """ Intersect two constraints of the same kind. Return None if they
+    cannot be combined into one.
+    """
+    if isinstance(a, SizeConstraint) and isinstance(b, SizeConstraint):
+        nested = _intersect_constraint_pair(a.nested, b.nested)
+        return SizeConstraint([nested]) if nested else None
+
+    def bounds(c):
+        if isinstance(c, SingleValueConstraint):
+            return c.value, c.value
+        elif isinstance(c, ValueRangeConstraint):
+            return c.min_value, c.max_value
+        return None
+
+    a_bounds, b_bounds = bounds(a), bounds(b)
+    if a_bounds is None or b_bounds is None:
+        return None
+
+    numeric = [_constraint_bound(v) for v in a_bounds + b_bounds]
+    if None in numeric:
+        return None
+
+    a_min, a_max, b_min, b_max = numeric
+    min_value = a_bounds[0] if a_min >= b_min else b_bounds[0]
+    max_value = a_bounds[1] if a_max <= b_max else b_bounds[1]
+    if max(a_min, b_min) > min(a_max, b_max):
+        raise Exception('Constraints %s and %s have no values in common' % (a, b))
+
+    if isinstance(a, SingleValueConstraint):
+        return a
+    elif isinstance(b, SingleValueConstraint):
+        return b
+    return ValueRangeConstraint([min_value, max_value])
+
+
+def _intersect_constraints(constraints, constraint):
+    """ Add ``constraint`` to the list ``constraints``, merging it with a
+    constraint of the same kind if possible. Returns a new list.
+    """
+    result = list(constraints)
+    for i, existing in enumerate(result):
+        if isinstance(existing, SizeConstraint) != isinstance(constraint, SizeConstraint):
+            continue
+
+        merged = _intersect_constraint_pair(existing, constraint)
+        if merged is not None:
+            result[i] = merged
+            return result
+
+    result.append(constraint)
+    return result
+
+
 def _maybe_create_sema_node(token):
     if isinstance(token, parser.AnnotatedToken):
         return _create_sema_node(token)
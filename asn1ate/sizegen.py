@@ -0,0 +1,385 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import ber
+from asn1ate.sema import *
+from asn1ate.codecgen import generate_codec, _bounds, _integer_size
+from asn1ate.upergen import UperBackend
+
+
+class SizeBackend(UperBackend):
+    """ Backend to generate tables of the maximum size of the encodings of
+    values of every type, in octets, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo INTEGER (0..8191),
+        #     bar OCTET STRING (SIZE(1..16)) OPTIONAL
+        # }
+        MAX_DER_SIZES = {
+            'Seq': 24,
+        }
+        MAX_UPER_SIZES = {
+            'Seq': 19,
+        }
+
+    so buffers can be allocated, and values rejected, before encoding them.
+    Sizes are computed at generation time from the value range and size
+    constraints of every type and component, the sizes of fixed-size types
+    like BOOLEAN and REAL, and the identifier and length octets of DER.
+    OPTIONAL components and known extension additions are counted as
+    present, and CHOICEs take their largest alternative.
+
+    Types with no upper bound on the size of their values have None as
+    their size: INTEGERs without both bounds, strings and collections
+    without an upper bound on their size, OBJECT IDENTIFIER and ANY, and
+    recursive types, which are part of a cycle of references in the
+    dependency graph, and every type that uses them. For UPER, strings
+    with constraints that aren't PER-visible, like UTF8String, are
+    unbounded too.
+
+    Sizes are for the values the encoders generated by
+    ``asn1ate.derencgen`` and ``asn1ate.upergen`` accept. The DER encoders
+    write unknown alternatives of extensible CHOICEs as they were decoded,
+    and any int for extensible ENUMERATEDs, so those, and every type that
+    contains them, have no upper bound for DER. The UPER encoders reject
+    unknown extension additions, so they don't count there.
+    ``encodings`` lists the tables to generate.
+    """
+
+    encodings = ('der', 'uper')
+
+    def __init__(self, sema_module, module, referenced_modules):
+        super(SizeBackend, self).__init__(sema_module, module, referenced_modules)
+
+        dependency_index = DependencyIndex(referenced_modules)
+        recursive = set(key for component in dependency_index.components for key in component
+                        if len(component) > 1 or key in dependency_index.dependencies(key))
+        self.unbounded_types = recursive | set(dependency_index.users(recursive))
+
+    def generate_code(self):
+        type_assignments = [a for component in dependency_sort(self.sema_module.assignments) for a in component
+                            if isinstance(a, TypeAssignment)]
+
+        for encoding in self.encodings:
+            size_function = getattr(self, 'max_%s_size' % encoding)
+            entries = ["'%s': %s" % (a.type_name, size_function(a.type_decl)) for a in type_assignments]
+            self.module.registries.append(('MAX_%s_SIZES' % encoding.upper(), entries))
+
+    def max_der_size(self, t):
+        """ Return the maximum size of the DER encoding of values of the type
+        ``t``, in octets, or None if it has no upper bound.
+        """
+        return self.der_size(t, self.sema_module)
+
+    def max_uper_size(self, t):
+        """ Return the maximum size of the UPER encoding of values of the
+        type ``t``, in octets, or None if it has no upper bound.
+        """
+        bits = self.uper_bits(t, self.sema_module)
+        if bits is None:
+            return None
+
+        return max((bits + 7) // 8, 1)  # X.691, 11.1.3
+
+    def der_size(self, t, module, constraints=None):
+        """ Return the maximum size of the complete encoding of the type
+        ``t``, identifier and length octets included, or None. References
+        in ``t`` are resolved in ``module``, and ``constraints`` are the
+        effective constraints of a reference to ``t``, if any.
+        """
+        if constraints is None:
+            constraints = module.effective_constraints(t, self.referenced_modules)
+
+        if isinstance(t, TaggedType) and self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+            return _der_encoding_size(self.identifier(t, module), self.der_size(t.type_decl, module, constraints))
+
+        identifier = self.identifier(t, module)
+        if identifier is None:
+            # Untagged CHOICE and ANY have the identifier of their value.
+            return self.der_contents_size(t, module, constraints)
+
+        return _der_encoding_size(identifier, self.der_contents_size(t, module, constraints))
+
+    def der_contents_size(self, t, module, constraints):
+        """ Return the maximum size of the contents octets of the type ``t``,
+        or of the complete encoding of untagged CHOICE types, or None.
+        """
+        if isinstance(t, TaggedType):
+            if self.tag_implicitness(t, module) == TagImplicitness.EXPLICIT:
+                return self.der_size(t.type_decl, module, constraints)
+            return self.der_contents_size(t.type_decl, module, constraints)
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.bounded_type(t, module)
+            if type_decl is None:
+                return None
+            return self.der_contents_size(type_decl, defining_module, constraints)
+        elif isinstance(t, ChoiceType):
+            # Unknown alternatives are re-encoded as decoded, at any size.
+            if any(isinstance(c, ExtensionMarker) for c in module.resolve_components(t, self.referenced_modules)):
+                return None
+            return _max(self.der_size(c.type_decl, module) for c in self.components(t, module))
+        elif isinstance(t, ConstructedType):
+            return _sum(self.der_size(c.type_decl, module) for c in self.components(t, module))
+        elif isinstance(t, CollectionType):
+            upper = _size_upper_bound(constraints)
+            item_size = self.der_size(t.type_decl, module)
+            if upper is None or item_size is None:
+                return None
+            return upper * item_size
+
+        type_name = t.type_name
+        if type_name == 'ENUMERATED' and isinstance(t, ValueListType):
+            # Unknown extensions are decoded to ints of any size.
+            if any(isinstance(v, ExtensionMarker) for v in t.named_values):
+                return None
+            return max(_integer_size(int(v.value)) for v in t.named_values if isinstance(v, NamedValue))
+        elif type_name == 'INTEGER':
+            lower, upper = self.value_bounds(constraints)
+            if lower is None or upper is None:
+                return None
+            return max(_integer_size(lower), _integer_size(upper))
+        elif type_name in _DER_FIXED_SIZES:
+            return _DER_FIXED_SIZES[type_name]
+
+        upper = _size_upper_bound(constraints)
+        if upper is None:
+            return None
+        elif type_name == 'BIT STRING':
+            return 1 + (upper + 7) // 8
+        elif type_name in _DER_CHAR_SIZES:
+            return upper * _DER_CHAR_SIZES[type_name]
+
+        return None
+
+    def uper_bits(self, t, module, constraints=None):
+        """ Return the maximum number of bits of the encoding of the type
+        ``t``, or None, like ``der_size``.
+        """
+        if constraints is None:
+            constraints = module.effective_constraints(t, self.referenced_modules)
+
+        if isinstance(t, TaggedType):
+            return self.uper_bits(t.type_decl, module, constraints)
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.bounded_type(t, module)
+            if type_decl is None:
+                return None
+            return self.uper_bits(type_decl, defining_module, constraints)
+        elif isinstance(t, ChoiceType):
+            root, additions, extensible = self.split_extensions(module.resolve_components(t, self.referenced_modules))
+            bits = _sum([int(extensible) + (len(root) - 1).bit_length(),
+                         _max(self.uper_bits(c.type_decl, module) for c in root)])
+            if additions:
+                bits = _max([bits, _sum([1 + _small_number_bits(len(additions) - 1),
+                                         _max(self.uper_open_type_bits(c.type_decl, module) for c in additions)])])
+            return bits
+        elif isinstance(t, ConstructedType):
+            root, additions, extensible = self.split_extensions(module.resolve_components(t, self.referenced_modules))
+            bits = _sum([int(extensible) + len(self.optional_components(root))] +
+                        [self.uper_bits(c.type_decl, module) for c in root])
+            if additions:
+                bits = _sum([bits, _small_number_bits(len(additions) - 1) + len(additions)] +
+                            [self.uper_open_type_bits(c.type_decl, module) for c in additions])
+            return bits
+        elif isinstance(t, CollectionType):
+            bounds = self.size_bounds(constraints)
+            item_bits = self.uper_bits(t.type_decl, module)
+            if bounds is None or item_bits is None:
+                return None
+            return (bounds[1] - bounds[0]).bit_length() + bounds[1] * item_bits
+
+        kind = self.kind(t)
+        if kind == 'integer':
+            lower, upper = self.value_bounds(constraints)
+            if lower is None or upper is None:
+                return None
+            return (upper - lower).bit_length()
+        elif kind == 'enumerated':
+            root, additions, extensible = self.enumerations(t)
+            bits = int(extensible) + (len(root) - 1).bit_length()
+            if additions:
+                bits = max(bits, 1 + _small_number_bits(len(additions) - 1))
+            return bits
+        elif kind in _UPER_FIXED_BITS:
+            return _UPER_FIXED_BITS[kind]
+        elif kind in _UPER_CHAR_BITS:
+            bounds = self.size_bounds(constraints)
+            if bounds is None:
+                return None
+            return (bounds[1] - bounds[0]).bit_length() + bounds[1] * _UPER_CHAR_BITS[kind]
+
+        return None
+
+    def uper_open_type_bits(self, t, module):
+        """ Return the maximum number of bits of the encoding of the type
+        ``t`` as an open type, with a length determinant, or None.
+        """
+        bits = self.uper_bits(t, module)
+        if bits is None:
+            return None
+
+        octets = max((bits + 7) // 8, 1)
+        return (8 if octets < 0x80 else 16) + octets * 8
+
+    def bounded_type(self, t, module):
+        """ Return the module and type declaration the reference ``t``
+        refers to, or None for the type declaration if it's a recursive
+        type, or uses one.
+        """
+        if isinstance(t, DefinedType):
+            module_name = module.resolve_reference(t.type_name, t.module_ref) or module.name
+            if (module_name, t.type_name) in self.unbounded_types:
+                return module, None
+
+        return self.referenced_type(t, module, frozenset())
+
+    def components(self, t, module):
+        """ Return the components of ``t``, extension additions included. """
+        return [c for c in module.resolve_components(t, self.referenced_modules) if not isinstance(c, ExtensionMarker)]
+
+
+class DerSizeBackend(SizeBackend):
+    encodings = ('der',)
+
+
+class UperSizeBackend(SizeBackend):
+    encodings = ('uper',)
+
+
+def generate_sizes(sema_module, out_stream, referenced_modules):
+    return generate_codec(sema_module, out_stream, referenced_modules, [SizeBackend])
+
+
+def _der_encoding_size(identifier, contents_size):
+    """ Return the size of a DER encoding with ``identifier``, a (tag key,
+    constructed) tuple, and contents of ``contents_size`` octets, or None.
+    """
+    if contents_size is None:
+        return None
+
+    identifier_size = len(ber.encode_identifier(*identifier))
+    length_size = 1 if contents_size < 0x80 else 1 + (contents_size.bit_length() + 7) // 8
+    return identifier_size + length_size + contents_size
+
+
+def _small_number_bits(number):
+    """ Return the number of bits of a normally small non-negative whole
+    number in UPER, see X.691, 11.6.
+    """
+    if number < 64:
+        return 7
+
+    return 1 + 8 + max((number.bit_length() + 7) // 8, 1) * 8
+
+
+def _size_upper_bound(constraints):
+    """ Return the upper bound of a size constraint in ``constraints``, or
+    None if there's none.
+    """
+    for c in constraints:
+        if isinstance(c, SizeConstraint):
+            return _bounds(c.nested)[1]
+
+    return None
+
+
+def _sum(sizes):
+    """ Return the sum of ``sizes``, or None if any of them is None. """
+    sizes = list(sizes)
+    if None in sizes:
+        return None
+
+    return sum(sizes)
+
+
+def _max(sizes):
+    """ Return the largest of ``sizes``, or None if any of them is None. """
+    sizes = list(sizes)
+    if None in sizes:
+        return None
+
+    return max(sizes)
+
+
+# Contents sizes of types that don't depend on constraints. DER encodes
+# REALs as floats, with a 2-octet exponent and a mantissa of 53 bits.
+_DER_FIXED_SIZES = {
+    'BOOLEAN': 1,
+    'NULL': 0,
+    'REAL': 10,
+}
+
+# Octets per character of character string types, as encoded by
+# asn1ate.support.ber.
+_DER_CHAR_SIZES = {
+    'OCTET STRING': 1,
+    'UTF8String': 4,
+    'GeneralString': 1,
+    'NumericString': 1,
+    'PrintableString': 1,
+    'IA5String': 1,
+    'GraphicString': 1,
+    'GeneralizedTime': 1,
+    'UTCTime': 1,
+    'ObjectDescriptor': 1,
+    'VisibleString': 1,
+    'TeletexString': 1,
+    'UniversalString': 4,
+    'BMPString': 2,
+    'T61String': 1,
+    'VideotexString': 1,
+}
+
+# UPER bits of kinds of types that don't depend on constraints
+_UPER_FIXED_BITS = {
+    'boolean': 1,
+    'null': 0,
+}
+
+# UPER bits per bit, octet or character of kinds of types with a length
+_UPER_CHAR_BITS = {
+    'bits': 1,
+    'octets': 8,
+    'ascii': 7,
+    'numeric': 4,
+    'bmp': 16,
+    'universal': 32,
+}
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.sizegen',
+                         'Generate tables of the maximum size of DER and UPER encodings from an ASN.1 definition file.',
+                         generate_sizes,
+                         [],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
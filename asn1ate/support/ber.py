@@ -0,0 +1,703 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import mmap
+import reprlib
+
+
+class DecodeError(ValueError):
+    """ Malformed BER data, or data that doesn't match the expected type. """
+    pass
+
+
+class EncodeError(ValueError):
+    """ Value that doesn't match the type to encode. """
+    pass
+
+
+class ConstraintError(ValueError):
+    """ Value outside the constraints of its type, found by a generated
+    validator.
+    """
+    pass
+
+
+# Tag classes, as in the top two bits of the identifier octet.
+UNIVERSAL = 0
+APPLICATION = 1
+CONTEXT = 2
+PRIVATE = 3
+
+_TAG_CLASS_NAMES = ['UNIVERSAL', 'APPLICATION', 'CONTEXT', 'PRIVATE']
+
+
+def tag_key(tag_class, number):
+    """ Return the key ``read_tlv`` returns for a tag. Keys are ints that
+    combine class and number, and ignore whether the encoding is primitive
+    or constructed, which BER leaves up to the encoder for some types.
+    """
+    return number << 2 | tag_class
+
+
+def describe_tag(key):
+    """ Return a tag key in ASN.1 notation, e.g. ``[APPLICATION 3]``. """
+    if key & 3 == CONTEXT:
+        return '[%d]' % (key >> 2)
+
+    return '[%s %d]' % (_TAG_CLASS_NAMES[key & 3], key >> 2)
+
+
+def unexpected_tag(key, type_name):
+    """ Return a DecodeError for a value with tag key ``key``, or no value
+    if ``key`` is None, where a value of ``type_name`` was expected.
+    """
+    if key is None:
+        return DecodeError('Missing value of %s' % type_name)
+
+    return DecodeError('Unexpected tag %s in %s' % (describe_tag(key), type_name))
+
+
+def read_tlv(data, offset, end):
+    """ Read the identifier and length octets at ``offset`` in ``data``, a
+    memoryview of bytes, which must not go past ``end``.
+
+    Returns a (key, constructed, start, stop, next) tuple, where ``key`` is
+    the tag key, ``constructed`` is non-zero for constructed encodings,
+    contents are in ``data[start:stop]`` and the next value starts at
+    ``next``. At ``end``, ``key`` is None.
+    """
+    if offset >= end:
+        return None, 0, end, end, end
+
+    first = data[offset]
+    number = first & 0x1f
+    offset += 1
+    if number == 0x1f:
+        # High tag numbers follow in base 128, most significant first.
+        number = 0
+        while True:
+            if offset >= end:
+                raise DecodeError('Truncated tag')
+            octet = data[offset]
+            offset += 1
+            number = number << 7 | octet & 0x7f
+            if not octet & 0x80:
+                break
+
+    if offset >= end:
+        raise DecodeError('Truncated length')
+    length = data[offset]
+    offset += 1
+    if length & 0x80:
+        size = length & 0x7f
+        if not size:
+            # Indefinite length, up to an end-of-contents marker.
+            if not first & 0x20:
+                raise DecodeError('Indefinite length of primitive encoding')
+            stop = _find_end_of_contents(data, offset, end)
+            return number << 2 | first >> 6, first & 0x20, offset, stop, stop + 2
+
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+
+    stop = offset + length
+    if stop > end:
+        raise DecodeError('Length %d exceeds available data' % length)
+
+    return number << 2 | first >> 6, first & 0x20, offset, stop, stop
+
+
+def _find_end_of_contents(data, offset, end):
+    while offset + 1 < end:
+        if data[offset] == 0 and data[offset + 1] == 0:
+            return offset
+        offset = read_tlv(data, offset, end)[4]
+
+    raise DecodeError('Missing end-of-contents')
+
+
+def decode(decoder, keys, data, offset=0):
+    """ Decode the value at ``offset`` in ``data`` with ``decoder``, a
+    generated contents decoder, after checking that its tag is one of
+    ``keys``, or any tag if ``keys`` is None. ``data`` can be anything that
+    supports the buffer protocol, e.g. bytes, bytearray or mmap.
+
+    Returns the value and the offset of the next value in ``data``.
+    """
+    if not isinstance(data, memoryview):
+        data = memoryview(data)
+
+    key, constructed, start, stop, offset = read_tlv(data, offset, len(data))
+    if key is None:
+        raise DecodeError('No data')
+    if keys is not None and key not in keys:
+        raise DecodeError('Unexpected tag %s' % describe_tag(key))
+
+    return decoder(data, key, constructed, start, stop), offset
+
+
+def map_file(path):
+    """ Return the contents of the file at ``path``, memory-mapped
+    read-only, for ``iter_records`` and generated ``iter_<Type>`` readers.
+    Use it as a context manager to unmap the file when done.
+    """
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            if f.read(1):
+                raise
+            return memoryview(b'')  # Empty files can't be mapped
+
+
+def iter_records(data, offset=0):
+    """ Yield every value in ``data``, from ``offset`` to the end, e.g.
+    the records of a CDR file, as memoryview slices of ``data``, without
+    decoding or copying them. Only the identifier and length octets are
+    read to find where values end.
+
+    Slices of a memory-mapped file have to be released before the file
+    can be unmapped.
+    """
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    for start, _, _, _, _, offset in _scan_records(data, view, offset):
+        yield view[start:offset]
+
+
+def count_records(data, offset=0):
+    """ Return the number of values in ``data``, from ``offset`` to the
+    end, without decoding them.
+    """
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    return sum(1 for _ in _scan_records(data, view, offset))
+
+
+def iter_decode(decoder, keys, data, offset=0):
+    """ Yield the values in ``data``, from ``offset`` to the end, decoded
+    one at a time with ``decoder``, a generated contents decoder, after
+    checking that their tags are in ``keys``, or any tag if ``keys`` is
+    None.
+    """
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    for start, key, constructed, contents_start, stop, _ in _scan_records(data, view, offset):
+        if keys is not None and key not in keys:
+            raise DecodeError('Unexpected tag %s at offset %d' % (describe_tag(key), start))
+        yield decoder(view, key, constructed, contents_start, stop)
+
+
+def _scan_records(data, view, offset):
+    """ Yield the offset and ``read_tlv`` tuple of every value in ``view``,
+    a memoryview of ``data``. If ``data`` is memory-mapped, pages already
+    scanned are released as we go, so resident memory stays the same
+    regardless of the size of the file.
+    """
+    end = len(view)
+    madvise = getattr(data, 'madvise', None) if _MADV_DONTNEED is not None else None
+    released = offset - offset % mmap.PAGESIZE
+    while offset < end:
+        start = offset
+        key, constructed, contents_start, stop, offset = read_tlv(view, offset, end)
+        yield start, key, constructed, contents_start, stop, offset
+
+        if madvise is not None and offset - released >= _RELEASE_SIZE:
+            boundary = offset - offset % mmap.PAGESIZE
+            madvise(_MADV_DONTNEED, released, boundary - released)
+            released = boundary
+
+
+# Memory-mapped files are read sequentially, so pages are given back to the
+# OS in chunks of this size once scanned. Slices of them are still valid; the
+# pages are just read again if needed. madvise requires Python 3.8 or later.
+_RELEASE_SIZE = 1 << 24
+_MADV_DONTNEED = getattr(mmap, 'MADV_DONTNEED', None)
+
+
+class View(object):
+    """ Base class of generated views of SEQUENCE and SET values, which
+    decode components only when they're accessed, as properties named
+    after them. Views take the same arguments as contents decoders, and
+    keep a reference to ``data``.
+
+    The identifier and length octets of all components are read once, on
+    first access, and every access decodes its component from ``data``,
+    so errors in the encoding of a component are only found when it's
+    accessed. Constructed components are views too.
+    """
+
+    __slots__ = ('_data', '_offset', '_end', '_fields')
+
+    # Names of the component properties, set by subclasses.
+    _names = ()
+
+    def __init__(self, data, key, constructed, offset, end):
+        self._data = data
+        self._offset = offset
+        self._end = end
+        self._fields = None
+
+    def _scan(self):
+        """ Find the components in the contents octets, and set and return
+        ``_fields``, a list of (key, constructed, start, stop) per
+        component, or None if it's absent.
+        """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % (name, getattr(self, name)) for name in self._names))
+
+
+def no_constraints(value):
+    """ Validator of types whose values have no constraints to check. """
+    pass
+
+
+def constraint_error(value, type_name):
+    """ Return a ConstraintError for a value outside the constraints of
+    ``type_name``.
+    """
+    return ConstraintError('Value %s is outside the constraints of %s' % (reprlib.repr(value), type_name))
+
+
+# Tables for str.translate that delete the characters of the alphabets of
+# restricted character string types, see X.680, 41. Strings translate to
+# an empty string if they only have permitted characters.
+NUMERIC_STRING_ALPHABET = str.maketrans('', '', '0123456789 ')
+PRINTABLE_STRING_ALPHABET = str.maketrans('', '', 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+                                                  '0123456789 \'()+,-./:=?')
+VISIBLE_STRING_ALPHABET = str.maketrans('', '', ''.join(map(chr, range(0x20, 0x7f))))
+
+
+class Record(object):
+    """ Base class of generated record classes for SEQUENCE and SET
+    values, with a slot per component. Absent OPTIONAL and DEFAULT
+    components are None, and NULL values are ``NULL``.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name)
+                                                 for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__))
+
+
+class Choice(object):
+    """ Base class of generated classes for CHOICE values, with the
+    ``name`` of the chosen alternative and its ``value``.
+    """
+
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.name == other.name and self.value == other.value
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (type(self).__name__, self.name, self.value)
+
+
+class _Null(object):
+    """ Type of ``NULL``, the value of NULL in records, which unlike None
+    is present.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'NULL'
+
+    def __reduce__(self):
+        return 'NULL'
+
+
+NULL = _Null()
+
+
+def unchanged(value):
+    """ Converter of values that are the same as records. """
+    return value
+
+
+def null_from_value(value):
+    return NULL
+
+
+def null_to_value(value):
+    return None
+
+
+def to_pyasn1(value, spec):
+    """ Return a pyasn1 object of the simple type ``spec`` with ``value``. """
+    return spec.clone(value)
+
+
+def bit_string_from_pyasn1(value):
+    """ Return a (octets, unused bits) tuple for a pyasn1 BitString. """
+    size = len(value)
+    unused = -size % 8
+    return (int(value) << unused).to_bytes((size + 7) // 8, 'big'), unused
+
+
+def bit_string_to_pyasn1(value, spec):
+    octets, unused = value
+    return spec.clone(spec.fromOctetString(octets, internalFormat=True, padding=unused))
+
+
+def real_to_pyasn1(value, spec):
+    """ Return a pyasn1 Real like ``spec`` with the float ``value``, as an
+    exact (mantissa, 2, exponent) tuple, since pyasn1 rounds floats to
+    decimal.
+    """
+    if value == 0 or math.isinf(value) or math.isnan(value):
+        return spec.clone(value)
+
+    mantissa, exponent = math.frexp(value)
+    return spec.clone((int(mantissa * (1 << 53)), 2, exponent - 53))
+
+
+def null_from_pyasn1(value):
+    return NULL
+
+
+def null_to_pyasn1(value, spec):
+    return spec.clone(b'')
+
+
+def encode(encoder, identifier, value):
+    """ Return the DER encoding of ``value`` by ``encoder``, a generated
+    encoder, with the identifier octets ``identifier``.
+    """
+    out = bytearray()
+    encoder(out, identifier, value)
+    return bytes(out)
+
+
+def encode_identifier(key, constructed):
+    """ Return the identifier octets for tag key ``key``. """
+    number = key >> 2
+    first = (key & 3) << 6 | (0x20 if constructed else 0)
+    if number < 0x1f:
+        return bytes([first | number])
+
+    return bytes([first | 0x1f] + _base128(number))
+
+
+def encode_header(key, constructed, length):
+    """ Return the identifier and definite length octets for a value with
+    tag key ``key`` and ``length`` contents octets.
+    """
+    out = bytearray(encode_identifier(key, constructed))
+    put_length(out, length)
+    return bytes(out)
+
+
+def put_length(out, length):
+    """ Append definite length octets for ``length`` to ``out``. """
+    if length < 0x80:
+        out.append(length)
+    else:
+        size = (length.bit_length() + 7) // 8
+        out.append(0x80 | size)
+        out += length.to_bytes(size, 'big')
+
+
+def patch_length(out, mark):
+    """ Replace the placeholder length octet before ``mark`` in ``out`` with
+    the length of the contents after it. Encoders of constructed types
+    append the identifier and a placeholder, then the contents, so values
+    are encoded in one pass, and only long contents need to be moved to
+    make room for more length octets.
+    """
+    length = len(out) - mark
+    if length < 0x80:
+        out[mark - 1] = length
+    else:
+        size = (length.bit_length() + 7) // 8
+        out[mark - 1:mark] = bytes([0x80 | size]) + length.to_bytes(size, 'big')
+
+
+def _base128(number):
+    octets = [number & 0x7f]
+    number >>= 7
+    while number:
+        octets.append(0x80 | number & 0x7f)
+        number >>= 7
+
+    return octets[::-1]
+
+
+# Contents decoders for built-in types. All take the data, the tag key and
+# constructed flag of the value, and the bounds of its contents.
+
+def decode_boolean(data, key, constructed, offset, end):
+    return offset < end and data[offset] != 0
+
+
+def decode_integer(data, key, constructed, offset, end):
+    return int.from_bytes(data[offset:end], 'big', signed=True)
+
+
+def decode_null(data, key, constructed, offset, end):
+    return None
+
+
+def decode_octet_string(data, key, constructed, offset, end):
+    if not constructed:
+        return data[offset:end].tobytes()
+
+    # Constructed encodings are split into segments.
+    segments = []
+    while offset < end:
+        key, constructed, start, stop, offset = read_tlv(data, offset, end)
+        segments.append(decode_octet_string(data, key, constructed, start, stop))
+
+    return b''.join(segments)
+
+
+def decode_bit_string(data, key, constructed, offset, end):
+    """ Return a (octets, unused bits) tuple. """
+    if not constructed:
+        if offset >= end:
+            raise DecodeError('Empty BIT STRING')
+        return data[offset + 1:end].tobytes(), data[offset]
+
+    segments = []
+    unused = 0
+    while offset < end:
+        key, constructed, start, stop, offset = read_tlv(data, offset, end)
+        segment, unused = decode_bit_string(data, key, constructed, start, stop)
+        segments.append(segment)
+
+    return b''.join(segments), unused
+
+
+def decode_object_identifier(data, key, constructed, offset, end):
+    """ Return the arcs as a tuple of ints. """
+    arcs = []
+    arc = 0
+    for index in range(offset, end):
+        octet = data[index]
+        arc = arc << 7 | octet & 0x7f
+        if not octet & 0x80:
+            arcs.append(arc)
+            arc = 0
+
+    if not arcs:
+        raise DecodeError('Empty OBJECT IDENTIFIER')
+
+    # The first subidentifier combines the first two arcs.
+    first = min(arcs[0] // 40, 2)
+    return (first, arcs[0] - first * 40) + tuple(arcs[1:])
+
+
+def decode_real(data, key, constructed, offset, end):
+    if offset >= end:
+        return 0.0
+
+    first = data[offset]
+    if first & 0x80:
+        # Binary encoding, see X.690, 8.5.7.
+        base = (first >> 4) & 3
+        if base == 3:
+            raise DecodeError('Reserved base in REAL value 0x%02x' % first)
+        base_bits = (1, 3, 4)[base]
+        scale = (first >> 2) & 3
+        exponent_size = (first & 3) + 1
+        offset += 1
+        if exponent_size == 4 and offset < end:
+            exponent_size = data[offset]
+            offset += 1
+        if offset + exponent_size > end:
+            raise DecodeError('REAL exponent exceeds its contents')
+        exponent = int.from_bytes(data[offset:offset + exponent_size], 'big', signed=True)
+        mantissa = int.from_bytes(data[offset + exponent_size:end], 'big')
+        value = math.ldexp(mantissa, scale + exponent * base_bits)
+        return -value if first & 0x40 else value
+    elif first & 0x40:
+        special = {0x40: float('inf'), 0x41: float('-inf'), 0x42: float('nan'), 0x43: -0.0}
+        if first not in special:
+            raise DecodeError('Unknown special REAL value 0x%02x' % first)
+        return special[first]
+    else:
+        # Decimal encoding, in ISO 6093 form.
+        try:
+            return float(data[offset + 1:end].tobytes().decode('ascii').replace(',', '.'))
+        except ValueError:
+            raise DecodeError('Invalid decimal REAL value')
+
+
+def decode_string(data, key, constructed, offset, end):
+    """ Decode 8-bit character strings and time types. """
+    return decode_octet_string(data, key, constructed, offset, end).decode('latin-1')
+
+
+def decode_utf8_string(data, key, constructed, offset, end):
+    return decode_octet_string(data, key, constructed, offset, end).decode('utf-8')
+
+
+def decode_bmp_string(data, key, constructed, offset, end):
+    return decode_octet_string(data, key, constructed, offset, end).decode('utf-16-be')
+
+
+def decode_universal_string(data, key, constructed, offset, end):
+    return decode_octet_string(data, key, constructed, offset, end).decode('utf-32-be')
+
+
+def decode_any(data, key, constructed, offset, end):
+    """ Return the complete encoding of the value, with a definite length,
+    to be decoded later.
+    """
+    return encode_header(key, constructed, end - offset) + data[offset:end].tobytes()
+
+
+# Contents encoders for built-in types, for DER. All append the identifier
+# octets ``identifier``, length and contents of ``value`` to the bytearray
+# ``out``.
+
+def encode_boolean(out, identifier, value):
+    out += identifier
+    out += b'\x01\xff' if value else b'\x01\x00'
+
+
+def encode_integer(out, identifier, value):
+    # Two's complement, in as few octets as possible.
+    size = (value if value >= 0 else ~value).bit_length() // 8 + 1
+    out += identifier
+    put_length(out, size)
+    out += value.to_bytes(size, 'big', signed=True)
+
+
+def encode_null(out, identifier, value):
+    out += identifier
+    out.append(0)
+
+
+def encode_octet_string(out, identifier, value):
+    out += identifier
+    put_length(out, len(value))
+    out += value
+
+
+def encode_bit_string(out, identifier, value):
+    """ Encode a (octets, unused bits) tuple. """
+    octets, unused = value
+    out += identifier
+    put_length(out, len(octets) + 1)
+    out.append(unused)
+    out += octets
+
+
+def encode_object_identifier(out, identifier, value):
+    """ Encode a tuple of arcs. """
+    contents = object_identifier_contents(value)
+    out += identifier
+    put_length(out, len(contents))
+    out += contents
+
+
+def object_identifier_contents(arcs):
+    """ Return the contents octets of an OBJECT IDENTIFIER with ``arcs``. """
+    if len(arcs) < 2:
+        raise EncodeError('OBJECT IDENTIFIER %r has less than two arcs' % (arcs,))
+
+    contents = []
+    for arc in (arcs[0] * 40 + arcs[1],) + tuple(arcs[2:]):
+        contents.extend(_base128(arc))
+
+    return bytes(contents)
+
+
+def encode_real(out, identifier, value):
+    contents = real_contents(value)
+    out += identifier
+    put_length(out, len(contents))
+    out += contents
+
+
+def real_contents(value):
+    """ Return the DER contents octets of a REAL with the float ``value``. """
+    if value == 0:
+        return b'\x43' if math.copysign(1, value) < 0 else b''
+    elif math.isinf(value):
+        return b'\x40' if value > 0 else b'\x41'
+    elif math.isnan(value):
+        return b'\x42'
+
+    # Binary encoding in base 2, with an odd mantissa, see X.690, 11.3.1.
+    mantissa, exponent = math.frexp(abs(value))
+    mantissa, exponent = int(mantissa * (1 << 53)), exponent - 53
+    while not mantissa & 1:
+        mantissa >>= 1
+        exponent += 1
+
+    exponent_size = (exponent if exponent >= 0 else ~exponent).bit_length() // 8 + 1
+    first = 0x80 | (0x40 if value < 0 else 0)
+    if exponent_size <= 3:
+        header = bytes([first | exponent_size - 1])
+    else:
+        header = bytes([first | 3, exponent_size])
+
+    return (header + exponent.to_bytes(exponent_size, 'big', signed=True) +
+            mantissa.to_bytes((mantissa.bit_length() + 7) // 8, 'big'))
+
+
+def encode_string(out, identifier, value):
+    """ Encode 8-bit character strings and time types. """
+    encode_octet_string(out, identifier, value.encode('latin-1'))
+
+
+def encode_utf8_string(out, identifier, value):
+    encode_octet_string(out, identifier, value.encode('utf-8'))
+
+
+def encode_bmp_string(out, identifier, value):
+    encode_octet_string(out, identifier, value.encode('utf-16-be'))
+
+
+def encode_universal_string(out, identifier, value):
+    encode_octet_string(out, identifier, value.encode('utf-32-be'))
+
+
+def encode_any(out, identifier, value):
+    """ Append ``value``, a complete encoding, as is. """
+    out += value
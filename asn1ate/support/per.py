@@ -0,0 +1,375 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from asn1ate.support import ber
+from asn1ate.support.ber import DecodeError, EncodeError
+
+# Runtime support for unaligned PER (X.691) codecs generated by
+# asn1ate.upergen.
+#
+# Encoders append bits to an int, which starts out as 1, so that leading
+# zero bits are kept: ``bits << width | number`` appends ``width`` bits.
+# Encoders take the bits so far and a value, and return the new bits.
+#
+# Decoders read from the whole message as one int, at a bit position that
+# counts the bits left after it: ``pos -= width`` then ``data >> pos & mask``
+# reads ``width`` bits. Decoders take the data and position, and return the
+# value and the new position. Reading past the end of the data shifts by a
+# negative count, which raises ValueError, and invalid indexes of CHOICE
+# alternatives etc. raise LookupError, both turned into DecodeError.
+
+
+def encode(encoder, value):
+    """ Return the encoding of ``value`` by ``encoder``, a generated
+    encoder, padded to whole octets.
+    """
+    bits = encoder(1, value)
+    size = bits.bit_length() - 1
+    if not size:
+        return b'\x00'  # X.691, 11.1.3
+
+    padding = -size % 8
+    return (bits << padding).to_bytes((size + padding) // 8 + 1, 'big')[1:]
+
+
+def decode(decoder, data):
+    """ Decode the value encoded in ``data`` with ``decoder``, a generated
+    decoder. ``data`` can be anything that supports the buffer protocol.
+    """
+    try:
+        value, pos = decoder(int.from_bytes(data, 'big'), len(data) * 8)
+    except DecodeError:
+        raise
+    except (ValueError, LookupError) as e:
+        raise DecodeError('Truncated or malformed data (%s)' % e)
+
+    return value
+
+
+def out_of_range(value, type_name):
+    """ Return an EncodeError for a value that can't be encoded as
+    ``type_name``, because it's outside its constraints.
+    """
+    return EncodeError('Value %r is out of range of %s' % (value, type_name))
+
+
+def size_out_of_range(size, type_name):
+    return EncodeError('Size %d is out of range of %s' % (size, type_name))
+
+
+def encode_length(bits, length):
+    """ Append an unconstrained length determinant, see X.691, 11.9.3.
+    Lengths that need fragmentation are not supported.
+    """
+    if length < 0x80:
+        return bits << 8 | length
+    elif length < 0x4000:
+        return bits << 16 | 0x8000 | length
+
+    raise EncodeError('Length %d needs fragmentation, which is not supported' % length)
+
+
+def decode_length(data, pos):
+    pos -= 8
+    first = data >> pos & 0xff
+    if not first & 0x80:
+        return first, pos
+    elif not first & 0x40:
+        pos -= 8
+        return (first & 0x3f) << 8 | data >> pos & 0xff, pos
+
+    raise DecodeError('Fragmented lengths are not supported')
+
+
+def encode_small_number(bits, number):
+    """ Append a normally small non-negative whole number, see X.691,
+    11.6.
+    """
+    if number < 64:
+        return bits << 7 | number
+
+    return encode_semi_constrained_integer(bits << 1 | 1, number)
+
+
+def decode_small_number(data, pos):
+    pos -= 7
+    number = data >> pos & 0x7f
+    if number < 64:
+        return number, pos
+
+    return decode_semi_constrained_integer(data, pos + 6)
+
+
+def encode_octets(bits, octets):
+    return bits << (len(octets) << 3) | int.from_bytes(octets, 'big')
+
+
+def decode_octets(data, pos, length):
+    pos -= length << 3
+    return (data >> pos & (1 << (length << 3)) - 1).to_bytes(length, 'big'), pos
+
+
+def decode_bit_string(data, pos, length):
+    """ Read ``length`` bits as an (octets, unused bits) tuple, like BER
+    decoders return BIT STRINGs.
+    """
+    pos -= length
+    unused = -length % 8
+    octets = ((data >> pos & (1 << length) - 1) << unused).to_bytes((length + 7) >> 3, 'big')
+    return (octets, unused), pos
+
+
+def encode_open_type(bits, encoder, value):
+    """ Append the value of an extension addition, as an octet string with
+    its complete encoding, see X.691, 11.2.
+    """
+    octets = encode(encoder, value)
+    return encode_octets(encode_length(bits, len(octets)), octets)
+
+
+def decode_open_type(data, pos, decoder):
+    length, pos = decode_length(data, pos)
+    octets, pos = decode_octets(data, pos, length)
+    return decode(decoder, octets), pos
+
+
+def encode_extensions(bits, value, encoders):
+    """ Append the bitmap and values of the extension additions of a
+    SEQUENCE or SET, given the (name, encoder) of each addition. Values
+    with no additions present have no bitmap.
+    """
+    bits = encode_small_number(bits, len(encoders) - 1)
+    for name, _ in encoders:
+        bits = bits << 1 | (name in value)
+    for name, encoder in encoders:
+        if name in value:
+            bits = encode_open_type(bits, encoder, value[name])
+
+    return bits
+
+
+def decode_extensions(data, pos, value, decoders):
+    """ Read the bitmap and values of the extension additions of a
+    SEQUENCE or SET into the dict ``value``, given the (name, decoder) of
+    each known addition. Unknown additions are skipped.
+    """
+    count, pos = decode_small_number(data, pos)
+    count += 1
+    pos -= count
+    present = data >> pos & (1 << count) - 1
+    for index in range(count):
+        if present >> (count - 1 - index) & 1:
+            if index < len(decoders):
+                name, decoder = decoders[index]
+                value[name], pos = decode_open_type(data, pos, decoder)
+            else:
+                length, pos = decode_length(data, pos)
+                pos -= length << 3
+
+    return pos
+
+
+def encode_choice_extension(bits, index, encoder, value):
+    """ Append the index and value of a CHOICE alternative that is an
+    extension addition, after the extension bit.
+    """
+    return encode_open_type(encode_small_number(bits, index), encoder, value)
+
+
+def decode_choice_extension(data, pos, alternatives):
+    """ Read the (name, value) of a CHOICE alternative that is an extension
+    addition, given the (name, decoder) of each known addition. Values of
+    unknown additions are (None, encoding).
+    """
+    index, pos = decode_small_number(data, pos)
+    if index < len(alternatives):
+        name, decoder = alternatives[index]
+        component, pos = decode_open_type(data, pos, decoder)
+        return (name, component), pos
+
+    length, pos = decode_length(data, pos)
+    octets, pos = decode_octets(data, pos, length)
+    return (None, octets), pos
+
+
+# Encoders and decoders for types whose encoding doesn't depend on
+# PER-visible constraints, or that are unconstrained.
+
+def encode_boolean(bits, value):
+    return bits << 1 | (1 if value else 0)
+
+
+def decode_boolean(data, pos):
+    pos -= 1
+    return data >> pos & 1 == 1, pos
+
+
+def encode_null(bits, value):
+    return bits
+
+
+def decode_null(data, pos):
+    return None, pos
+
+
+def encode_unconstrained_integer(bits, value):
+    # Two's complement, in as few octets as possible.
+    size = (value if value >= 0 else ~value).bit_length() // 8 + 1
+    return encode_length(bits, size) << (size << 3) | value & (1 << (size << 3)) - 1
+
+
+def decode_unconstrained_integer(data, pos):
+    size, pos = decode_length(data, pos)
+    pos -= size << 3
+    value = data >> pos & (1 << (size << 3)) - 1
+    if value >> ((size << 3) - 1):
+        value -= 1 << (size << 3)
+
+    return value, pos
+
+
+def encode_semi_constrained_integer(bits, value):
+    """ Append ``value``, less the lower bound, as a non-negative integer in
+    as few octets as possible.
+    """
+    size = max((value.bit_length() + 7) >> 3, 1)
+    return encode_length(bits, size) << (size << 3) | value
+
+
+def decode_semi_constrained_integer(data, pos):
+    size, pos = decode_length(data, pos)
+    pos -= size << 3
+    return data >> pos & (1 << (size << 3)) - 1, pos
+
+
+def encode_real(bits, value):
+    return encode_any(bits, ber.real_contents(value))
+
+
+def decode_real(data, pos):
+    octets, pos = decode_any(data, pos)
+    return ber.decode_real(memoryview(octets), None, 0, 0, len(octets)), pos
+
+
+def encode_object_identifier(bits, value):
+    return encode_any(bits, ber.object_identifier_contents(value))
+
+
+def decode_object_identifier(data, pos):
+    octets, pos = decode_any(data, pos)
+    return ber.decode_object_identifier(memoryview(octets), None, 0, 0, len(octets)), pos
+
+
+def encode_any(bits, value):
+    """ Append ``value``, a complete encoding, as an octet string. """
+    return encode_octets(encode_length(bits, len(value)), value)
+
+
+def decode_any(data, pos):
+    length, pos = decode_length(data, pos)
+    return decode_octets(data, pos, length)
+
+
+def encode_string(bits, value):
+    """ Encode character strings without a fixed number of bits per
+    character, other than UTF8String.
+    """
+    return encode_any(bits, value.encode('latin-1'))
+
+
+def decode_string(data, pos):
+    octets, pos = decode_any(data, pos)
+    return octets.decode('latin-1'), pos
+
+
+def encode_utf8_string(bits, value):
+    return encode_any(bits, value.encode('utf-8'))
+
+
+def decode_utf8_string(data, pos):
+    octets, pos = decode_any(data, pos)
+    return octets.decode('utf-8'), pos
+
+
+# Characters of strings with a fixed number of bits per character, after
+# their length determinant, see X.691, 30.5. IA5String, VisibleString,
+# PrintableString and the time types have 7 bits per character.
+
+def encode_ascii_chars(bits, value):
+    for octet in value.encode('ascii'):
+        bits = bits << 7 | octet
+
+    return bits
+
+
+def decode_ascii_chars(data, pos, length):
+    chars = []
+    for _ in range(length):
+        pos -= 7
+        chars.append(data >> pos & 0x7f)
+
+    return bytes(chars).decode('ascii'), pos
+
+
+def encode_numeric_chars(bits, value):
+    # Characters are numbered by their position in the alphabet.
+    try:
+        for char in value:
+            bits = bits << 4 | _NUMERIC_INDEXES[char]
+    except KeyError:
+        raise EncodeError('Invalid character in NumericString %r' % value)
+
+    return bits
+
+
+def decode_numeric_chars(data, pos, length):
+    chars = []
+    for _ in range(length):
+        pos -= 4
+        chars.append(_NUMERIC_ALPHABET[data >> pos & 0xf])
+
+    return ''.join(chars), pos
+
+
+def encode_bmp_chars(bits, value):
+    return encode_octets(bits, value.encode('utf-16-be'))
+
+
+def decode_bmp_chars(data, pos, length):
+    octets, pos = decode_octets(data, pos, length << 1)
+    return octets.decode('utf-16-be'), pos
+
+
+def encode_universal_chars(bits, value):
+    return encode_octets(bits, value.encode('utf-32-be'))
+
+
+def decode_universal_chars(data, pos, length):
+    octets, pos = decode_octets(data, pos, length << 2)
+    return octets.decode('utf-32-be'), pos
+
+
+_NUMERIC_ALPHABET = ' 0123456789'
+_NUMERIC_INDEXES = dict((char, index) for index, char in enumerate(_NUMERIC_ALPHABET))
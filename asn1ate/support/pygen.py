@@ -30,7 +30,13 @@ except ImportError:
     # Python 3
     from io import StringIO
 
+import os
 import os.path
+import shutil
+import zipfile
+import tempfile
+import py_compile
+import multiprocessing
 from datetime import datetime
 
 
@@ -44,6 +50,128 @@ def auto_generated_header(source_filename, version):
     return os.linesep.join(lines)
 
 
+def write_file_atomically(path, text):
+    """ Write ``text`` to a temporary file next to ``path`` and rename it
+    into place, so readers never see a partially written file.
+    """
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        _replace(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_file_if_changed(path, text):
+    """ Like ``write_file_atomically``, but leave ``path`` alone if it
+    already has the same code, ignoring the auto-generated header, which
+    changes with the modification time of the source. Returns True if the
+    file was written.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            if _strip_header(f.read()) == _strip_header(text):
+                return False
+
+    write_file_atomically(path, text)
+    return True
+
+
+def _strip_header(text):
+    if text.startswith('# Auto-generated by asn1ate'):
+        return text.partition('\n\n')[2]
+
+    return text
+
+
+# os.rename replaces existing files atomically on POSIX.
+_replace = getattr(os, 'replace', os.rename)
+
+
+def compile_file(path):
+    """ Byte-compile the Python file at ``path`` to its ``__pycache__``.
+
+    Where supported (Python 3.7 or later), the bytecode is checked against
+    a hash of the source rather than its modification time (PEP 552), so it
+    stays valid when files are copied without preserving timestamps.
+    """
+    py_compile.compile(path, doraise=True, **_invalidation_mode('CHECKED_HASH'))
+
+
+def write_zip_bundle(zip_path, root, paths):
+    """ Write the Python files at ``paths`` to a zip file, named relative to
+    ``root``, with bytecode next to each file. Add the zip file to
+    ``sys.path`` to import the files from it with ``zipimport``, which
+    can't cache bytecode itself.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='asn1ate-')
+    temp_path = '%s.%d.tmp' % (zip_path, os.getpid())
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            for path in sorted(paths):
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                bytecode_path = os.path.join(temp_dir, 'bytecode.pyc')
+
+                # The zip file is never modified in place, so skip checking
+                # the bytecode against the source.
+                py_compile.compile(path, cfile=bytecode_path, dfile=os.path.join(zip_path, name), doraise=True,
+                                   **_invalidation_mode('UNCHECKED_HASH'))
+                bundle.write(path, name)
+                bundle.write(bytecode_path, name + 'c')
+        _replace(temp_path, zip_path)
+    finally:
+        shutil.rmtree(temp_dir)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _invalidation_mode(name):
+    if hasattr(py_compile, 'PycInvalidationMode'):
+        return {'invalidation_mode': getattr(py_compile.PycInvalidationMode, name)}
+
+    return {}  # Timestamps only before Python 3.7
+
+
+def parallel_map(function, items, jobs=1):
+    """ Return ``[function(item) for item in items]``, computed by up to
+    ``jobs`` forked worker processes.
+
+    Workers inherit ``function`` and ``items``, e.g. a semantic model, from
+    the parent process, so only results need to be picklable. Without
+    ``os.fork``, items are processed serially.
+    """
+    global _fork_state
+
+    if jobs <= 1 or len(items) <= 1 or not hasattr(os, 'fork'):
+        return [function(item) for item in items]
+
+    if hasattr(multiprocessing, 'get_context'):
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing  # Python 2 always forks
+
+    _fork_state = (function, items)
+    pool = context.Pool(min(jobs, len(items)))
+    try:
+        return pool.map(_call_forked, range(len(items)), chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+        _fork_state = None
+
+
+# Function and items of the running parallel_map, inherited by workers.
+_fork_state = None
+
+
+def _call_forked(index):
+    function, items = _fork_state
+    return function(items[index])
+
+
 class NullBackend(object):
     """ Code generator to create an empty file.
     Used to create __init__.py files.
@@ -71,7 +199,9 @@ class PythonWriter(object):
         self.current_indent -= self.indent_size
 
     def write_line(self, line):
-        if line is not None:
+        if isinstance(line, PythonCode):
+            self.write_code(PythonCode(line, _NEWLINE))
+        elif line is not None:
             line = self._indent(line) if line else line
             self.out.write('%s\n' % line)
 
@@ -81,6 +211,10 @@ class PythonWriter(object):
 
     def write_block(self, block):
         """ Reindents after every line break. """
+        if isinstance(block, PythonCode):
+            self.write_code(PythonCode(_Block(block)))
+            return
+
         block = block.rstrip()
         for line in block.split('\n'):
             self.write_line(line)
@@ -88,6 +222,10 @@ class PythonWriter(object):
     def write_enumeration(self, items):
         self.write_block(',\n'.join(items))
 
+    def write_code(self, code):
+        """ Render a PythonCode tree at the current indentation. """
+        _render_code(code, self.out, self.current_indent, self.indent_size)
+
     def get_fragment(self):
         return PythonFragment(self.indent_size)
 
@@ -95,13 +233,152 @@ class PythonWriter(object):
         return ' ' * self.current_indent + line
 
 
-class PythonFragment(PythonWriter):
+class PythonCode(object):
+    """ Lightweight intermediate representation of generated Python code.
+
+    Code is a list of parts: text, line breaks, indentation changes, blocks
+    and nested code. Nesting only stores a reference, so generators can wrap
+    each other's output without copying or reindenting it, and the whole
+    tree is rendered in a single pass by ``PythonWriter.write_code``.
+
+    Text concatenated with ``+`` continues the current line, like string
+    concatenation would.
+    """
+
+    def __init__(self, *parts):
+        self.parts = list(parts)
+
+    def __add__(self, other):
+        return PythonCode(self, other)
+
+    def __radd__(self, other):
+        return PythonCode(other, self)
+
+    def __bool__(self):
+        return bool(self.parts)
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __str__(self):
+        out = StringIO()
+        _render_code(self, out, 0, 4)
+        return out.getvalue()
+
+
+class PythonFragment(PythonCode):
     """ A buffering python writer, useful for nested structures.
+
+    Writes are recorded as PythonCode rather than rendered to text, so
+    fragments can be nested cheaply.
     """
 
     def __init__(self, indent_size=4):
-        self.buf = StringIO()
-        super(PythonFragment, self).__init__(self.buf, indent_size)
+        super(PythonFragment, self).__init__()
+        self.indent_size = indent_size
 
-    def __str__(self):
-        return self.buf.getvalue()
+    def push_indent(self):
+        self.parts.append(_INDENT)
+
+    def pop_indent(self):
+        self.parts.append(_DEDENT)
+
+    def write_line(self, line):
+        if line is not None:
+            self.parts.append(line)
+            self.parts.append(_NEWLINE)
+
+    def write_blanks(self, count=1):
+        self.parts.extend([_NEWLINE] * count)
+
+    def write_block(self, block):
+        """ Trailing line breaks in the block are dropped. """
+        self.parts.append(_Block(block))
+
+    def write_code(self, code):
+        """ Add code as-is, without dropping trailing line breaks. """
+        self.parts.append(code)
+
+    def write_enumeration(self, items):
+        parts = []
+        for item in items:
+            if parts:
+                parts.extend((',', _NEWLINE))
+            parts.append(item)
+
+        self.write_block(PythonCode(*parts))
+
+    def get_fragment(self):
+        return PythonFragment(self.indent_size)
+
+
+class _Block(object):
+    def __init__(self, code):
+        self.code = code
+
+
+# Markers for line breaks and indentation changes in PythonCode
+_NEWLINE = object()
+_INDENT = object()
+_DEDENT = object()
+_END = object()
+
+try:
+    _string_types = (str, unicode)  # Python 2
+except NameError:
+    _string_types = (str,)  # Python 3
+
+
+def _render_code(code, out, indent, indent_size):
+    """ Write ``code`` to ``out`` in one pass over the tree.
+
+    Line breaks are held back until more text follows, so blocks can drop
+    their trailing line breaks, like ``PythonWriter.write_block`` does with
+    text. Indentation changes are local to the code they appear in. The tree
+    is walked with an explicit stack to allow deep nesting.
+    """
+    pending = 0  # Line breaks not yet written
+    line_open = False
+    written = 0  # Text parts written so far
+
+    stack = [(iter([code]), indent, None)]
+    while stack:
+        parts, outer_indent, block_state = stack[-1]
+        part = next(parts, _END)
+        if part is _END:
+            # End of parts; a block keeps one line break, but no trailing
+            # empty lines.
+            stack.pop()
+            indent = outer_indent
+            if block_state is not None:
+                pending_before, written_before = block_state
+                pending = (pending_before if written == written_before else 0) + 1
+        elif part is None:
+            pass
+        elif isinstance(part, _string_types):
+            for i, text in enumerate(part.split('\n')):
+                if i:
+                    pending += 1
+                if text:
+                    if pending or not line_open:
+                        out.write('\n' * pending)
+                        out.write(' ' * indent)
+                    out.write(text)
+                    line_open = True
+                    pending = 0
+                    written += 1
+        elif part is _NEWLINE:
+            pending += 1
+        elif part is _INDENT:
+            indent += indent_size
+        elif part is _DEDENT:
+            indent -= indent_size
+        elif isinstance(part, _Block):
+            block = part.code
+            parts = block.parts if isinstance(block, PythonCode) else [block]
+            stack.append((iter(parts), indent, (pending, written)))
+        elif isinstance(part, PythonCode):
+            stack.append((iter(part.parts), indent, None))
+        else:
+            raise Exception('Unexpected code part: %r' % (part,))
+
+    out.write('\n' * pending)
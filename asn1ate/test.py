@@ -27,9 +27,13 @@ from __future__ import print_function  # Python 2 compatibility
 
 import os
 import sys
+import json
+import binascii
+import importlib
 import argparse  # Requires Python 2.7 or later, but that's OK for a test driver
-from asn1ate import parser, sema, pyasn1gen, __version__
-from asn1ate.support import pygen
+from asn1ate import (parser, sema, pyasn1gen, berdecgen, derencgen, upergen, columngen, viewgen, validgen, recordgen,
+                     sizegen, __version__)
+from asn1ate.support import ber, pygen
 
 
 def parse_args():
@@ -43,27 +47,124 @@ def parse_args():
                        help='Parse, build semantic model and generate pyasn1 code. (Default)')
     group.add_argument('--outdir', default=None, required=False,
                        help='Write Python modules to a temporary output dir instead of to stdout.')
+    ap.add_argument('--open-types', default=None, required=False,
+                    help='JSON file mapping ANY DEFINED BY components to open types.')
+    ap.add_argument('--lazy', action='store_true', default=False, required=False,
+                    help='Generate modules that build types on first use.')
+    ap.add_argument('--hoist', action='store_true', default=False, required=False,
+                    help='Share identical inline expressions through module-level constants.')
+    ap.add_argument('--named-classes', action='store_true', default=False, required=False,
+                    help='Generate classes for anonymous inline types.')
+    ap.add_argument('--jobs', type=int, default=1, required=False,
+                    help='Generate up to this many modules in parallel.')
+    ap.add_argument('--oid-names', action='store_true', default=False, required=False,
+                    help='Generate a reverse lookup dict for object identifier values.')
+    ap.add_argument('--berdec', action='store_true', default=False, required=False,
+                    help='Generate BER decoders instead of pyasn1 code.')
+    ap.add_argument('--derenc', action='store_true', default=False, required=False,
+                    help='Generate DER encoders instead of pyasn1 code, with BER decoders if --berdec is given.')
+    ap.add_argument('--uper', action='store_true', default=False, required=False,
+                    help='Generate unaligned PER codecs instead of pyasn1 code.')
+    ap.add_argument('--columns', action='store_true', default=False, required=False,
+                    help='Generate BER decoders with NumPy batch decoders instead of pyasn1 code.')
+    ap.add_argument('--views', action='store_true', default=False, required=False,
+                    help='Generate BER decoders with lazy views instead of pyasn1 code.')
+    ap.add_argument('--record-classes', action='store_true', default=False, required=False,
+                    help='Generate record classes and converters instead of pyasn1 code, with BER decoders and '
+                         'DER encoders if --berdec or --derenc is given.')
+    ap.add_argument('--validators', action='store_true', default=False, required=False,
+                    help='Generate validators of constraints instead of pyasn1 code, with BER decoders or DER '
+                         'encoders if --berdec or --derenc is given.')
+    ap.add_argument('--invalid', default=None, required=False,
+                    help='JSON file mapping type names to hex BER encodings of values the validators generated '
+                         'with --berdec --validators --outdir must reject.')
+    ap.add_argument('--sizes', action='store_true', default=False, required=False,
+                    help='Generate tables of the maximum size of DER and UPER encodings instead of pyasn1 code.')
 
     return ap.parse_args()
 
 
-def generate_code_to_file(input_name, module, modules, file):
-    print(pygen.auto_generated_header(input_name, __version__),
+def generate_code_to_file(args, module, modules, file):
+    print(pygen.auto_generated_header(args.file, __version__),
           file=file)
-    pyasn1gen.generate_pyasn1(module, file, modules)
+    if args.uper:
+        upergen.generate_uper(module, file, modules)
+        return
+    elif args.columns:
+        columngen.generate_columns(module, file, modules)
+        return
+    elif args.views:
+        viewgen.generate_views(module, file, modules)
+        return
+    elif args.sizes:
+        sizegen.generate_sizes(module, file, modules)
+        return
+    elif args.record_classes:
+        recordgen.generate_records(module, file, modules, decoders=args.berdec, encoders=args.derenc)
+        return
+    elif args.derenc:
+        derencgen.generate_derenc(module, file, modules, decoders=args.berdec, validators=args.validators)
+        return
+    elif args.berdec:
+        berdecgen.generate_berdec(module, file, modules, validators=args.validators)
+        return
+    elif args.validators:
+        validgen.generate_validators(module, file, modules)
+        return
+
+    pyasn1gen.generate_pyasn1(module, file, modules, lazy=args.lazy, hoist=args.hoist,
+                              oid_names=args.oid_names, named_classes=args.named_classes)
 
 
 def generate_module_code(args, module, modules):
+    file = pygen.StringIO()
+    generate_code_to_file(args, module, modules, file)
+    return file.getvalue()
+
+
+def write_module_code(args, module, code):
     if not args.outdir:
-        generate_code_to_file(args.file, module, modules, sys.stdout)
+        sys.stdout.write(code)
     else:
         output_file = pyasn1gen._sanitize_module(module.name) + '.py'
         output_file = os.path.join(args.outdir, output_file)
         if os.path.exists(output_file):
             raise Exception('ERROR: output file %s already exists' % output_file)
 
-        with open(output_file, 'w') as file:
-            generate_code_to_file(args.file, module, modules, file)
+        pygen.write_file_atomically(output_file, code)
+
+
+def check_invalid(args, modules):
+    """ Check that every value in the ``--invalid`` file is rejected by
+    the validators generated to ``--outdir``. Returns the number of values
+    that are not.
+    """
+    with open(args.invalid) as f:
+        invalid = json.load(f)
+
+    sys.path.insert(0, args.outdir)
+    generated = [importlib.import_module(pyasn1gen._sanitize_module(module.name)) for module in modules]
+    failures = 0
+    for type_name, encodings in sorted(invalid.items()):
+        python_name = pyasn1gen._translate_type(type_name)
+        for module in generated:
+            if hasattr(module, 'validate_' + python_name):
+                break
+        else:
+            print('ERROR: no validator for %s' % type_name)
+            failures += 1
+            continue
+
+        for encoding in encodings:
+            value, _ = getattr(module, 'decode_' + python_name)(binascii.unhexlify(encoding))
+            try:
+                getattr(module, 'validate_' + python_name)(value)
+            except ber.ConstraintError:
+                continue
+            print('ERROR: %s value %r (%s) is not rejected' % (type_name, value, encoding))
+            failures += 1
+
+    return failures
 
 
 # Simplistic command-line driver
@@ -76,20 +177,33 @@ def main():
         print('ERROR: can only use --outdir with --gen')
         return 1
 
+    if args.invalid and not (args.outdir and args.berdec and args.validators):
+        print('ERROR: can only use --invalid with --berdec --validators --outdir')
+        return 1
+
     parse_tree = parser.parse_asn1(asn1def)
     if args.parse:
         parser.print_parse_tree(parse_tree)
         return 0
 
     modules = sema.build_semantic_model(parse_tree)
+    if args.open_types:
+        with open(args.open_types) as f:
+            sema.apply_open_type_map(modules, json.load(f))
+
     if args.sema:
         for module in modules:
             print(module)
         return 0
 
     if args.gen:
-        for module in modules:
-            generate_module_code(args, module, modules)
+        module_codes = pygen.parallel_map(lambda module: generate_module_code(args, module, modules),
+                                          modules, args.jobs)
+        for module, code in zip(modules, module_codes):
+            write_module_code(args, module, code)
+
+        if args.invalid and check_invalid(args, modules):
+            return 1
 
     return 0
 
@@ -0,0 +1,841 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import pygen
+from asn1ate.sema import *
+from asn1ate.codecgen import CodecBackend, generate_codec, _bounds
+
+
+class UperBackend(CodecBackend):
+    """ Base class of the backends for unaligned PER (X.691) decoders and
+    encoders, with what both need to know about types.
+
+    PER encodings depend on PER-visible constraints, so every bit width,
+    length determinant, CHOICE index and presence bitmap is computed here,
+    at generation time, from the effective constraints and components of
+    each type, and generated code doesn't look at constraints at all.
+    Constraints at a reference to a type change its encoding, so such
+    references get functions of their own. Tags don't matter, except to
+    order CHOICE alternatives and SET components.
+
+    Values are the same plain Python objects as for the BER decoders
+    generated by ``asn1ate.berdecgen``, but unknown extensions of CHOICEs
+    decode to (None, encoding), and unknown extensions of ENUMERATEDs to
+    None. Lengths of 16K or more, which need fragmentation, are not
+    supported.
+    """
+
+    runtime_module = 'asn1ate.support.per'
+
+    def resolve(self, t):
+        """ Return the module and type declaration ``t`` resolves to,
+        through references and tags.
+        """
+        module, seen = self.sema_module, frozenset()
+        while True:
+            if isinstance(t, TaggedType):
+                t = t.type_decl
+            elif isinstance(t, ReferencedType):
+                module, t = self.referenced_type(t, module, seen)
+                seen |= set([(module.name, id(t))])
+            else:
+                return module, t
+
+    def kind(self, t):
+        """ Return how values of the simple type ``t`` are encoded, e.g.
+        'integer' or 'octets'. Constructed types have no kind.
+        """
+        if isinstance(t, ValueListType):
+            return 'enumerated' if t.type_name == 'ENUMERATED' else 'integer'
+        elif isinstance(t, BitStringType):
+            return 'bits'
+        elif isinstance(t, SimpleType):
+            return _KINDS.get(t.type_name, 'any')
+
+        return None
+
+    def value_bounds(self, constraints):
+        """ Return the (lower, upper) bounds of a value constraint in
+        ``constraints``, with None for no bound.
+        """
+        for c in constraints:
+            if not isinstance(c, SizeConstraint):
+                return _bounds(c)
+
+        return None, None
+
+    def size_bounds(self, constraints):
+        """ Return the (lower, upper) bounds of a size constraint in
+        ``constraints``, or None if lengths have no upper bound below 64K,
+        and need a length determinant, see X.691, 11.9.4.
+        """
+        for c in constraints:
+            if isinstance(c, SizeConstraint):
+                lower, upper = _bounds(c.nested)
+                if upper is not None and upper < 0x10000:
+                    return lower or 0, upper
+
+        return None
+
+    def integer_bounds(self, t):
+        """ Return the (lower, upper) bounds of ``t`` if it's an INTEGER
+        with both, which is encoded in a bit-field of fixed width, and can
+        be encoded inline.
+        """
+        _, type_decl = self.resolve(t)
+        if self.kind(type_decl) != 'integer':
+            return None
+
+        lower, upper = self.value_bounds(self.constraints(t))
+        if lower is None or upper is None:
+            return None
+
+        return lower, upper
+
+    def split_extensions(self, components):
+        """ Return the root components, extension additions, and whether
+        ``components`` are extensible.
+        """
+        root, additions = [], []
+        markers = 0
+        for c in components:
+            if isinstance(c, ExtensionMarker):
+                markers += 1
+            elif markers == 1:
+                additions.append(c)
+            else:
+                root.append(c)
+
+        return root, additions, markers > 0
+
+    def fields(self, t):
+        """ Return the root components and extension additions of a
+        SEQUENCE or SET, in the order they're encoded, and whether it's
+        extensible. SET components are encoded in canonical order.
+        """
+        root, additions, extensible = self.split_extensions(self.resolve_components(t))
+        if isinstance(t, SetType):
+            root = sorted(root, key=self.canonical_order)
+            additions = sorted(additions, key=self.canonical_order)
+
+        return root, additions, extensible
+
+    def alternatives(self, t):
+        """ Return the root alternatives and extension additions of a
+        CHOICE, in order of their indexes, and whether it's extensible.
+        """
+        root, additions, extensible = self.split_extensions(self.resolve_components(t))
+        return sorted(root, key=self.canonical_order), additions, extensible
+
+    def enumerations(self, t):
+        """ Return the values of the root enumerations and extension
+        additions of an ENUMERATED, in order of their indexes, and whether
+        it's extensible.
+        """
+        root, additions, extensible = self.split_extensions(t.named_values)
+        return sorted(int(v.value) for v in root), sorted(int(v.value) for v in additions), extensible
+
+    def generate_defined_type(self, t, function_name, constraints=None):
+        if t.constraint is None:
+            return super(UperBackend, self).generate_defined_type(t, function_name)
+
+        # Constraints at the reference change the encoding of the referenced
+        # type, so it gets a function of its own.
+        module, type_decl = self.resolve(t)
+        if module is not self.sema_module and isinstance(type_decl, (ConstructedType, CollectionType)):
+            raise Exception('Constrained reference %s to a type in another module is not supported' % t)
+
+        return self.generators[type(type_decl)](type_decl, function_name, self.constraints(t))
+
+    def generate_tagged_type(self, t, function_name, constraints=None):
+        return self.generate(t.type_decl, function_name)
+
+    def write_table(self, table_name, entries):
+        """ Add a module-level tuple of ``entries``. """
+        table = pygen.PythonFragment()
+        table.write_line('%s = (' % table_name)
+        table.push_indent()
+        for entry in entries:
+            table.write_line(entry)
+        table.pop_indent()
+        table.write_line(')')
+        self.module.tables.append(table)
+
+    def optional_components(self, root):
+        """ Return the root components of a SEQUENCE or SET with a bit in
+        its presence bitmap, in order.
+        """
+        return [c for c in root if c.optional or c.default_value is not None]
+
+
+class UperDecoderBackend(UperBackend):
+    """ Backend to generate unaligned PER decoders from semantic tree.
+
+    Every type gets a decoder, a function that reads a value at a bit
+    position in the data, and returns it along with the new position, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo INTEGER (0..8191) OPTIONAL
+        # }
+        def _pd_Seq(data, pos):
+            value = {}
+            pos -= 1
+            flags = data >> pos & 1
+            if flags & 1:
+                pos -= 13
+                value['foo'] = data >> pos & 8191
+            return value, pos
+
+    For every type assignment, ``decode_<Type>(data)`` decodes the value
+    encoded in ``data``, and ``DECODERS`` maps type names to these
+    functions. The generated code requires Python 3.
+    """
+
+    prefix = '_pd_'
+    parameters = 'data, pos'
+    registry_name = 'DECODERS'
+
+    def __init__(self, sema_module, module, referenced_modules):
+        super(UperDecoderBackend, self).__init__(sema_module, module, referenced_modules)
+        self.runtime_name('decode')
+
+        self.generators = {
+            ChoiceType: self.decoder_choice_type,
+            SequenceType: self.decoder_fields_type,
+            SetType: self.decoder_fields_type,
+            SequenceOfType: self.decoder_collection_type,
+            SetOfType: self.decoder_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.decoder_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.decoder_simple_type,
+            BitStringType: self.decoder_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'decode_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(data):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return decode(_pd_%s, data)' % python_name)
+        fragment.pop_indent()
+        return public_name, fragment
+
+    def decoder_simple_type(self, t, function_name, constraints=None):
+        kind = self.kind(t)
+        if constraints is None:
+            constraints = self.constraints(t)
+
+        if kind == 'integer':
+            lower, upper = self.value_bounds(constraints)
+            if lower is None:
+                return self.runtime_name('decode_unconstrained_integer')
+
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            if upper is None:
+                decoder = self.runtime_name('decode_semi_constrained_integer')
+                fragment.write_line('number, pos = %s(data, pos)' % decoder)
+                fragment.write_line('return %s, pos' % _offset('number', -lower))
+            else:
+                fragment.write_line('return %s, pos' % self.write_read_bits(fragment, upper - lower, lower))
+            self.end_function(fragment)
+        elif kind == 'enumerated':
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            self.write_enumerated(fragment, function_name, t)
+            self.end_function(fragment)
+        elif kind in _LENGTH_DECODERS:
+            size_bounds = self.size_bounds(constraints)
+            if size_bounds is None and kind == 'octets':
+                return self.runtime_name('decode_any')
+
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            length = self.write_length(fragment, size_bounds)
+            fragment.write_line('return %s(data, pos, %s)' % (self.runtime_name(_LENGTH_DECODERS[kind]), length))
+            self.end_function(fragment)
+        else:
+            return self.runtime_name(_SIMPLE_DECODERS[kind])
+
+        return function_name
+
+    def write_enumerated(self, fragment, function_name, t):
+        root, additions, extensible = self.enumerations(t)
+        table_name = self.unique_name('_%s_VALUES' % function_name[len(self.prefix):])
+        values = ', '.join(str(v) for v in root + additions)
+        self.module.tables.append('%s = (%s%s)' % (table_name, values, ',' if len(root + additions) == 1 else ''))
+
+        if extensible:
+            fragment.write_line('pos -= 1')
+            fragment.write_line('if data >> pos & 1:')
+            fragment.push_indent()
+            fragment.write_line('index, pos = %s(data, pos)' % self.runtime_name('decode_small_number'))
+            fragment.write_line('return (%s[%d + index] if index < %d else None), pos' % (table_name, len(root),
+                                                                                          len(additions)))
+            fragment.pop_indent()
+
+        fragment.write_line('return %s[%s], pos' % (table_name, self.write_read_bits(fragment, len(root) - 1)))
+
+    def decoder_fields_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        root, additions, extensible = self.fields(t)
+        optional = self.optional_components(root)
+
+        # The extension bit and presence bitmap are read in one go.
+        body = pygen.PythonFragment()
+        body.write_line('value = {}')
+        if extensible or optional:
+            body.write_line('flags = %s' % self.write_read_bits(body, (1 << int(extensible) + len(optional)) - 1))
+
+        for c in root:
+            if c in optional:
+                body.write_line('if flags & %d:' % (1 << (len(optional) - 1 - optional.index(c))))
+                body.push_indent()
+                self.write_decode(body, c.type_decl, "value['%s']" % c.identifier, c.identifier)
+                body.pop_indent()
+
+                default = self.default_literal(c)
+                if default is not None:
+                    body.write_line('else:')
+                    body.push_indent()
+                    body.write_line("value['%s'] = %s" % (c.identifier, default))
+                    body.pop_indent()
+            else:
+                self.write_decode(body, c.type_decl, "value['%s']" % c.identifier, c.identifier)
+
+        if extensible:
+            table = self.extensions_table(function_name, additions)
+            body.write_line('if flags & %d:' % (1 << len(optional)))
+            body.push_indent()
+            body.write_line('pos = %s(data, pos, value, %s)' % (self.runtime_name('decode_extensions'), table))
+            body.pop_indent()
+        body.write_line('return value, pos')
+
+        fragment = self.start_function(function_name)
+        fragment.write_block(body)
+        self.end_function(fragment)
+
+        return function_name
+
+    def extensions_table(self, function_name, additions):
+        """ Return the name of a table of the (name, decoder) of extension
+        additions, or an empty tuple if there are none.
+        """
+        if not additions:
+            return '()'
+
+        table_name = self.unique_name('_%s_EXTENSIONS' % function_name[len(self.prefix):])
+        entries = ["('%s', %s)," % (c.identifier, self.generate_component(c.identifier, c.type_decl))
+                   for c in additions]
+        self.write_table(table_name, entries)
+        return table_name
+
+    def decoder_choice_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        root, additions, extensible = self.alternatives(t)
+        decoders = [(c.identifier, self.generate_component(c.identifier, c.type_decl)) for c in root]
+
+        fragment = self.start_function(function_name)
+        if extensible:
+            table = self.extensions_table(function_name, additions)
+            fragment.write_line('pos -= 1')
+            fragment.write_line('if data >> pos & 1:')
+            fragment.push_indent()
+            fragment.write_line('return %s(data, pos, %s)' % (self.runtime_name('decode_choice_extension'), table))
+            fragment.pop_indent()
+
+        if len(decoders) == 1:
+            fragment.write_line('name, decoder = %r, %s' % decoders[0])
+        else:
+            table_name = self.unique_name('_%s_ALTERNATIVES' % function_name[len(self.prefix):])
+            self.write_table(table_name, ["('%s', %s)," % d for d in decoders])
+            fragment.write_line('name, decoder = %s[%s]' % (table_name,
+                                                            self.write_read_bits(fragment, len(decoders) - 1)))
+        fragment.write_line('component, pos = decoder(data, pos)')
+        fragment.write_line('return (name, component), pos')
+        self.end_function(fragment)
+
+        return function_name
+
+    def decoder_collection_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        if constraints is None:
+            constraints = self.constraints(t)
+
+        body = pygen.PythonFragment()
+        count = self.write_length(body, self.size_bounds(constraints))
+        body.write_line('items = []')
+        body.write_line('for _ in range(%s):' % count)
+        body.push_indent()
+        self.write_decode(body, t.type_decl, 'item', 'item')
+        body.write_line('items.append(item)')
+        body.pop_indent()
+        body.write_line('return items, pos')
+
+        fragment = self.start_function(function_name)
+        fragment.write_block(body)
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_decode(self, fragment, t, target, name):
+        """ Write code to decode a value of the component ``name`` of type
+        ``t`` to ``target``. Booleans and INTEGERs with both bounds are
+        decoded inline.
+        """
+        _, type_decl = self.resolve(t)
+        bounds = self.integer_bounds(t)
+        if bounds is not None:
+            lower, upper = bounds
+            fragment.write_line('%s = %s' % (target, self.write_read_bits(fragment, upper - lower, lower)))
+        elif self.kind(type_decl) == 'boolean':
+            fragment.write_line('%s = %s == 1' % (target, self.write_read_bits(fragment, 1)))
+        elif self.kind(type_decl) == 'null':
+            fragment.write_line('%s = None' % target)
+        else:
+            fragment.write_line('%s, pos = %s(data, pos)' % (target, self.generate_component(name, t)))
+
+    def write_read_bits(self, fragment, upper, lower=0):
+        """ Write code to read a number from 0 to ``upper`` in as few bits as
+        possible, and return an expression for it plus ``lower``.
+        """
+        width = upper.bit_length()
+        if not width:
+            return str(lower)
+
+        fragment.write_line('pos -= %d' % width)
+        if lower:
+            return _offset('(data >> pos & %d)' % ((1 << width) - 1), -lower)
+
+        return 'data >> pos & %d' % ((1 << width) - 1)
+
+    def write_length(self, fragment, bounds):
+        """ Write code to read a length with ``bounds`` from
+        ``size_bounds``, and return an expression for it.
+        """
+        if bounds is None:
+            fragment.write_line('length, pos = %s(data, pos)' % self.runtime_name('decode_length'))
+            return 'length'
+
+        lower, upper = bounds
+        if lower == upper:
+            return str(lower)
+
+        fragment.write_line('length = %s' % self.write_read_bits(fragment, upper - lower, lower))
+        return 'length'
+
+
+class UperEncoderBackend(UperBackend):
+    """ Backend to generate unaligned PER encoders from semantic tree.
+
+    Every type gets an encoder, a function that appends the bits of a value
+    to an int, and returns it, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo INTEGER (0..8191) OPTIONAL
+        # }
+        def _pe_Seq(bits, value):
+            bits = bits << 1 | ('foo' in value)
+            if 'foo' in value:
+                number = value['foo']
+                if not 0 <= number <= 8191:
+                    raise out_of_range(number, 'Seq.foo')
+                bits = bits << 13 | number
+            return bits
+
+    Values that PER can't represent, e.g. out of range INTEGERs, raise
+    EncodeError, and missing components raise KeyError. Components equal
+    to their numeric or boolean DEFAULT value are left out.
+
+    For every type assignment, ``encode_<Type>(value)`` returns the
+    encoding of ``value`` as bytes, and ``ENCODERS`` maps type names to
+    these functions. The generated code requires Python 3.
+    """
+
+    prefix = '_pe_'
+    parameters = 'bits, value'
+    registry_name = 'ENCODERS'
+
+    def __init__(self, sema_module, module, referenced_modules):
+        super(UperEncoderBackend, self).__init__(sema_module, module, referenced_modules)
+        self.runtime_name('encode')
+
+        self.generators = {
+            ChoiceType: self.encoder_choice_type,
+            SequenceType: self.encoder_fields_type,
+            SetType: self.encoder_fields_type,
+            SequenceOfType: self.encoder_collection_type,
+            SetOfType: self.encoder_collection_type,
+            TaggedType: self.generate_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.encoder_simple_type,
+            DefinedType: self.generate_defined_type,
+            ValueListType: self.encoder_simple_type,
+            BitStringType: self.encoder_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'encode_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(value):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return encode(_pe_%s, value)' % python_name)
+        fragment.pop_indent()
+        return public_name, fragment
+
+    def encoder_simple_type(self, t, function_name, constraints=None):
+        kind = self.kind(t)
+        if constraints is None:
+            constraints = self.constraints(t)
+
+        if kind == 'integer':
+            lower, upper = self.value_bounds(constraints)
+            if lower is None:
+                return self.runtime_name('encode_unconstrained_integer')
+
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            if upper is None:
+                fragment.write_line('if value < %d:' % lower)
+                self.write_raise(fragment, 'out_of_range', 'value')
+                fragment.write_line('return %s(bits, %s)' % (self.runtime_name('encode_semi_constrained_integer'),
+                                                             _offset('value', lower)))
+            else:
+                self.write_integer(fragment, 'value', lower, upper, 'return %s')
+            self.end_function(fragment)
+        elif kind == 'enumerated':
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            self.write_enumerated(fragment, function_name, t)
+            self.end_function(fragment)
+        elif kind in _LENGTH_ENCODERS:
+            size_bounds = self.size_bounds(constraints)
+            if size_bounds is None and kind == 'octets':
+                return self.runtime_name('encode_any')
+
+            function_name = self.function_name(function_name)
+            fragment = self.start_function(function_name)
+            if kind == 'bits':
+                fragment.write_line('octets, unused = value')
+                fragment.write_line('length = (len(octets) << 3) - unused')
+            else:
+                fragment.write_line('length = len(value)')
+            length = self.write_length(fragment, size_bounds)
+
+            if kind == 'bits':
+                fragment.write_line("return bits << %s | int.from_bytes(octets, 'big') >> unused" % length)
+            elif kind == 'octets':
+                fragment.write_line("return bits << %s | int.from_bytes(value, 'big')" %
+                                    (int(length) * 8 if length.isdigit() else '(length << 3)'))
+            else:
+                fragment.write_line('return %s(bits, value)' % self.runtime_name(_LENGTH_ENCODERS[kind]))
+            self.end_function(fragment)
+        else:
+            return self.runtime_name(_SIMPLE_ENCODERS[kind])
+
+        return function_name
+
+    def write_enumerated(self, fragment, function_name, t):
+        root, additions, extensible = self.enumerations(t)
+        table_name = self.unique_name('_%s_INDEXES' % function_name[len(self.prefix):])
+        self.module.tables.append('%s = {%s}' % (table_name, ', '.join('%d: %d' % (v, i)
+                                                                      for i, v in enumerate(root + additions))))
+
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('index = %s[value]' % table_name)
+        fragment.pop_indent()
+        fragment.write_line('except KeyError:')
+        self.write_raise(fragment, 'out_of_range', 'value')
+        if additions:
+            fragment.write_line('if index >= %d:' % len(root))
+            fragment.push_indent()
+            fragment.write_line('return %s(bits << 1 | 1, index - %d)' % (self.runtime_name('encode_small_number'),
+                                                                          len(root)))
+            fragment.pop_indent()
+
+        width = int(extensible) + (len(root) - 1).bit_length()
+        fragment.write_line('return bits << %d | index' % width if width else 'return bits')
+
+    def encoder_fields_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        root, additions, extensible = self.fields(t)
+        optional = self.optional_components(root)
+
+        body = pygen.PythonFragment()
+        if additions:
+            body.write_line('extended = %s' % ' or '.join("'%s' in value" % c.identifier for c in additions))
+
+        # The extension bit and presence bitmap are written in one go. The
+        # extension bit is always 0 without known extension additions.
+        flags = [('(%s)' % self.presence_test(c), len(optional) - 1 - index) for index, c in enumerate(optional)]
+        if additions:
+            flags.insert(0, ('extended', len(optional)))
+        flag_terms = [flag if not shift else '%s << %d' % (flag, shift) for flag, shift in flags]
+        flag_count = int(extensible) + len(optional)
+        if len(flag_terms) > 1:
+            body.write_line('bits = (bits << %d |' % flag_count)
+            body.write_line('        %s)' % ' |\n        '.join(flag_terms))
+        elif flag_terms:
+            body.write_line('bits = bits << %d | %s' % (flag_count, flag_terms[0]))
+        elif flag_count:
+            body.write_line('bits <<= %d' % flag_count)
+
+        for c in root:
+            if self.zero_width(c.type_decl):
+                # Only the presence bit, if any, is encoded.
+                continue
+            elif c in optional:
+                body.write_line('if %s:' % self.presence_test(c))
+                body.push_indent()
+                self.write_encode(body, c.type_decl, "value['%s']" % c.identifier, c.identifier)
+                body.pop_indent()
+            else:
+                self.write_encode(body, c.type_decl, "value['%s']" % c.identifier, c.identifier)
+
+        if additions:
+            table_name = self.unique_name('_%s_EXTENSION_ENCODERS' % function_name[len(self.prefix):])
+            entries = ["('%s', %s)," % (c.identifier, self.generate_component(c.identifier, c.type_decl))
+                       for c in additions]
+            self.write_table(table_name, entries)
+            body.write_line('if extended:')
+            body.push_indent()
+            body.write_line('bits = %s(bits, value, %s)' % (self.runtime_name('encode_extensions'), table_name))
+            body.pop_indent()
+        body.write_line('return bits')
+
+        fragment = self.start_function(function_name)
+        fragment.write_block(body)
+        self.end_function(fragment)
+
+        return function_name
+
+    def presence_test(self, component):
+        default = self.default_literal(component)
+        if default is not None:
+            return "'%s' in value and value['%s'] != %s" % (component.identifier, component.identifier, default)
+
+        return "'%s' in value" % component.identifier
+
+    def encoder_choice_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        root, additions, extensible = self.alternatives(t)
+        table_name = self.unique_name('_%s_ENCODERS' % function_name[len(self.prefix):])
+
+        table = pygen.PythonFragment()
+        table.write_line('%s = {' % table_name)
+        table.push_indent()
+        for index, c in enumerate(root + additions):
+            table.write_line("'%s': (%d, %s)," % (c.identifier, index,
+                                                  self.generate_component(c.identifier, c.type_decl)))
+        table.pop_indent()
+        table.write_line('}')
+        self.module.tables.append(table)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, component = value')
+        fragment.write_line('try:')
+        fragment.push_indent()
+        fragment.write_line('index, encoder = %s[name]' % table_name)
+        fragment.pop_indent()
+        fragment.write_line('except KeyError:')
+        fragment.push_indent()
+        fragment.write_line("raise EncodeError('Unknown alternative %%s of %s' %% name)" % self.description())
+        self.runtime_name('EncodeError')
+        fragment.pop_indent()
+        if additions:
+            fragment.write_line('if index >= %d:' % len(root))
+            fragment.push_indent()
+            fragment.write_line('return %s(bits << 1 | 1, index - %d, encoder, component)' %
+                                (self.runtime_name('encode_choice_extension'), len(root)))
+            fragment.pop_indent()
+
+        width = int(extensible) + (len(root) - 1).bit_length()
+        fragment.write_line('return encoder(bits << %d | index, component)' % width if width else
+                            'return encoder(bits, component)')
+        self.end_function(fragment)
+
+        return function_name
+
+    def encoder_collection_type(self, t, function_name, constraints=None):
+        function_name = self.function_name(function_name)
+        if constraints is None:
+            constraints = self.constraints(t)
+
+        fragment = self.start_function(function_name)
+        fragment.write_line('length = len(value)')
+        self.write_length(fragment, self.size_bounds(constraints))
+        if not self.zero_width(t.type_decl):
+            fragment.write_line('for item in value:')
+            fragment.push_indent()
+            self.write_encode(fragment, t.type_decl, 'item', 'item')
+            fragment.pop_indent()
+        fragment.write_line('return bits')
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_encode(self, fragment, t, expression, name):
+        """ Write code to encode ``expression``, the value of the component
+        ``name`` of type ``t``. Booleans and INTEGERs with both bounds are
+        encoded inline.
+        """
+        _, type_decl = self.resolve(t)
+        bounds = self.integer_bounds(t)
+        if bounds is not None:
+            fragment.write_line('number = %s' % expression)
+            self.component_path.append(name)
+            self.write_integer(fragment, 'number', bounds[0], bounds[1], 'bits = %s')
+            self.component_path.pop()
+        elif self.kind(type_decl) == 'boolean':
+            fragment.write_line('bits = bits << 1 | (1 if %s else 0)' % expression)
+        elif self.kind(type_decl) != 'null':
+            fragment.write_line('bits = %s(bits, %s)' % (self.generate_component(name, t), expression))
+
+    def zero_width(self, t):
+        """ Return whether ``write_encode`` writes no code for values of
+        ``t``, i.e. for NULLs.
+        """
+        return self.kind(self.resolve(t)[1]) == 'null'
+
+    def write_integer(self, fragment, name, lower, upper, result):
+        """ Write code to check the range of the number ``name`` and encode
+        it in a bit-field, with the new bits formatted by ``result``.
+        """
+        if lower == upper:
+            fragment.write_line('if %s != %d:' % (name, lower))
+        else:
+            fragment.write_line('if not %d <= %s <= %d:' % (lower, name, upper))
+        self.write_raise(fragment, 'out_of_range', name)
+
+        width = (upper - lower).bit_length()
+        if width:
+            fragment.write_line(result % ('bits << %d | %s' % (width, _offset(name, lower))))
+        elif result != 'bits = %s':
+            fragment.write_line(result % 'bits')
+
+    def write_length(self, fragment, bounds):
+        """ Write code to check and encode ``length``, with ``bounds`` from
+        ``size_bounds``. Returns an expression for the length.
+        """
+        if bounds is None:
+            fragment.write_line('bits = %s(bits, length)' % self.runtime_name('encode_length'))
+            return 'length'
+
+        lower, upper = bounds
+        if lower == upper:
+            fragment.write_line('if length != %d:' % lower)
+        else:
+            fragment.write_line('if not %d <= length <= %d:' % (lower, upper))
+        self.write_raise(fragment, 'size_out_of_range', 'length')
+
+        if lower == upper:
+            return str(lower)
+
+        fragment.write_line('bits = bits << %d | %s' % ((upper - lower).bit_length(), _offset('length', lower)))
+        return 'length'
+
+    def write_raise(self, fragment, error, value):
+        fragment.push_indent()
+        fragment.write_line("raise %s(%s, '%s')" % (self.runtime_name(error), value, self.description()))
+        fragment.pop_indent()
+
+
+def generate_uper(sema_module, out_stream, referenced_modules):
+    return generate_codec(sema_module, out_stream, referenced_modules, [UperDecoderBackend, UperEncoderBackend])
+
+
+def _offset(expression, lower):
+    """ Return ``expression`` less ``lower``. """
+    if lower > 0:
+        return '%s - %d' % (expression, lower)
+    elif lower < 0:
+        return '%s + %d' % (expression, -lower)
+
+    return expression
+
+
+# How values of built-in types are encoded
+_KINDS = {
+    'INTEGER': 'integer',
+    'BOOLEAN': 'boolean',
+    'NULL': 'null',
+    'ENUMERATED': 'enumerated',
+    'REAL': 'real',
+    'BIT STRING': 'bits',
+    'OCTET STRING': 'octets',
+    'OBJECT IDENTIFIER': 'object_identifier',
+    'UTF8String': 'utf8_string',
+    'NumericString': 'numeric',
+    'PrintableString': 'ascii',
+    'IA5String': 'ascii',
+    'VisibleString': 'ascii',
+    'GeneralizedTime': 'ascii',
+    'UTCTime': 'ascii',
+    'BMPString': 'bmp',
+    'UniversalString': 'universal',
+    'GeneralString': 'string',
+    'GraphicString': 'string',
+    'ObjectDescriptor': 'string',
+    'TeletexString': 'string',
+    'T61String': 'string',
+    'VideotexString': 'string',
+}
+
+# Runtime functions for kinds of types that don't depend on constraints
+_SIMPLE_DECODERS = dict((kind, 'decode_' + kind) for kind in ['boolean', 'null', 'real', 'object_identifier',
+                                                              'utf8_string', 'string', 'any'])
+_SIMPLE_ENCODERS = dict((kind, 'encode_' + kind) for kind in _SIMPLE_DECODERS)
+
+# Runtime functions for the contents of kinds of types with a length
+_LENGTH_DECODERS = {
+    'octets': 'decode_octets',
+    'bits': 'decode_bit_string',
+    'ascii': 'decode_ascii_chars',
+    'numeric': 'decode_numeric_chars',
+    'bmp': 'decode_bmp_chars',
+    'universal': 'decode_universal_chars',
+}
+_LENGTH_ENCODERS = dict((kind, name.replace('decode_', 'encode_')) for kind, name in _LENGTH_DECODERS.items())
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.upergen',
+                         'Generate unaligned PER decoders and encoders from an ASN.1 definition file.',
+                         generate_uper,
+                         [],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
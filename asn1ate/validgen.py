@@ -0,0 +1,351 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import pygen
+from asn1ate.sema import *
+from asn1ate.codecgen import CodecBackend, generate_codec, _bounds
+
+
+class ValidatorBackend(CodecBackend):
+    """ Backend to generate validators, which check values against the
+    constraints of their type, compiled to plain Python conditions, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo INTEGER (0..255),
+        #     bar IA5String (SIZE(1..16)) OPTIONAL
+        # }
+        def _c_Seq(value):
+            item = value['foo']
+            if not 0 <= item <= 255:
+                raise constraint_error(item, 'Seq.foo')
+            if 'bar' in value:
+                item = value['bar']
+                if not 1 <= len(item) <= 16 or not item.isascii():
+                    raise constraint_error(item, 'Seq.bar')
+
+    Value range and size constraints become comparisons, with bounds
+    folded at generation time, ENUMERATED values are looked up in a
+    frozenset of the values of the type, and the alphabets of NumericString,
+    PrintableString and VisibleString are checked with ``str.translate``
+    tables from ``asn1ate.support.ber``. Checks of simple types are inlined
+    in the validators of the SEQUENCE, SET, CHOICE and collection types they
+    are components of, and components without any constraints to check,
+    at any depth, are skipped.
+
+    Values are the same plain Python objects decoders generated by
+    ``asn1ate.berdecgen`` return, and their types are not checked. Missing
+    components raise KeyError. Constraints other than integer value ranges,
+    sizes and the alphabets above, e.g. on REAL values or inner subtyping,
+    are not checked.
+
+    For every type assignment, ``validate_<Type>(value)`` raises
+    ``ber.ConstraintError`` if ``value`` is outside the constraints of the
+    type, and ``VALIDATORS`` maps type names to these functions. The
+    generated code requires Python 3.7 or later.
+    """
+
+    prefix = '_c_'
+    parameters = 'value'
+    registry_name = 'VALIDATORS'
+
+    def __init__(self, sema_module, module, referenced_modules, **options):
+        super(ValidatorBackend, self).__init__(sema_module, module, referenced_modules)
+
+        self.generators = {
+            ChoiceType: self.validator_choice_type,
+            SequenceType: self.validator_record_type,
+            SetType: self.validator_record_type,
+            SequenceOfType: self.validator_collection_type,
+            SetOfType: self.validator_collection_type,
+            TaggedType: self.validator_tagged_type,
+            SelectionType: self.generate_selection_type,
+            SimpleType: self.validator_simple_type,
+            DefinedType: self.validator_defined_type,
+            ValueListType: self.validator_simple_type,
+            BitStringType: self.validator_simple_type,
+        }
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'validate_' + python_name
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(value):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('_c_%s(value)' % python_name)
+        fragment.pop_indent()
+
+        return public_name, fragment
+
+    def validator_simple_type(self, t, function_name):
+        conditions = self.invalid_conditions(t, 'value')
+        if not conditions:
+            return self.runtime_name('no_constraints')
+
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        self.write_raise(fragment, conditions, 'value', self.description())
+        self.end_function(fragment)
+
+        return function_name
+
+    def validator_defined_type(self, t, function_name):
+        conditions = self.reference_conditions(t, 'value')
+        if not conditions:
+            return self.generate_defined_type(t, function_name)
+
+        # Constraints on the reference itself, e.g. Alias (SIZE(8)), need a
+        # validator of its own. Items of collections are still checked by
+        # the validator of the referenced type.
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        self.write_raise(fragment, conditions, 'value', self.description())
+        _, builtin = self.resolved_type(t)
+        if isinstance(builtin, CollectionType):
+            fragment.write_line('%s(value)' % self.generate_defined_type(t, None))
+        self.end_function(fragment)
+
+        return function_name
+
+    def validator_tagged_type(self, t, function_name):
+        return self.generate(t.type_decl, function_name)
+
+    def validator_record_type(self, t, function_name):
+        components = [c for c in self.resolve_components(t) if not isinstance(c, ExtensionMarker)]
+        if not any(self.needs_check(c.type_decl) for c in components):
+            return self.runtime_name('no_constraints')
+
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        for c in components:
+            if not self.needs_check(c.type_decl):
+                continue
+
+            optional = c.optional or c.default_value is not None
+            if optional:
+                fragment.write_line("if '%s' in value:" % c.identifier)
+                fragment.push_indent()
+            self.write_check(fragment, c.identifier, c.type_decl, "value['%s']" % c.identifier)
+            if optional:
+                fragment.pop_indent()
+        self.end_function(fragment)
+
+        return function_name
+
+    def validator_choice_type(self, t, function_name):
+        components = [c for c in self.resolve_components(t)
+                      if not isinstance(c, ExtensionMarker) and self.needs_check(c.type_decl)]
+        if not components:
+            return self.runtime_name('no_constraints')
+
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        fragment.write_line('name, item = value')
+        for index, c in enumerate(components):
+            fragment.write_line("%s name == '%s':" % ('elif' if index else 'if', c.identifier))
+            fragment.push_indent()
+            self.write_check(fragment, c.identifier, c.type_decl, 'item')
+            fragment.pop_indent()
+        self.end_function(fragment)
+
+        return function_name
+
+    def validator_collection_type(self, t, function_name):
+        if not self.needs_check(t):
+            return self.runtime_name('no_constraints')
+
+        function_name = self.function_name(function_name)
+        fragment = self.start_function(function_name)
+        conditions = self.size_conditions(self.constraints(t), 'len(value)')
+        if conditions:
+            self.write_raise(fragment, conditions, 'value', self.description())
+        if self.needs_check(t.type_decl):
+            fragment.write_line('for item in value:')
+            fragment.push_indent()
+            self.write_check(fragment, 'item', t.type_decl, 'item')
+            fragment.pop_indent()
+        self.end_function(fragment)
+
+        return function_name
+
+    def write_check(self, fragment, name, t, expression):
+        """ Write code to check ``expression``, a value of the type ``t``
+        of the component ``name``. Simple types are checked inline.
+        """
+        self.component_path.append(name)
+        try:
+            conditions = self.invalid_conditions(t, 'item')
+            if conditions:
+                if expression != 'item':
+                    fragment.write_line('item = %s' % expression)
+                self.write_raise(fragment, conditions, 'item', self.description())
+            else:
+                fragment.write_line('%s(%s)' % (self.generate(t), expression))
+        finally:
+            self.component_path.pop()
+
+    def write_raise(self, fragment, conditions, expression, description):
+        fragment.write_line('if %s:' % ' or '.join(conditions))
+        fragment.push_indent()
+        fragment.write_line("raise %s(%s, '%s')" % (self.runtime_name('constraint_error'), expression, description))
+        fragment.pop_indent()
+
+    def invalid_conditions(self, t, expression, module=None):
+        """ Return conditions for ``expression``, a value of the type ``t``,
+        to be outside its constraints, or an empty list if ``t`` isn't a
+        simple type or has no constraints to check.
+        """
+        module = module or self.sema_module
+        _, builtin = self.resolved_type(t, module)
+        if not isinstance(builtin, (SimpleType, ValueListType, BitStringType)):
+            return []
+
+        constraints = module.effective_constraints(t, self.referenced_modules)
+        conditions = []
+        if builtin.type_name in ('INTEGER', 'REAL'):
+            conditions += self.value_conditions(constraints, expression)
+        elif builtin.type_name == 'ENUMERATED' and isinstance(builtin, ValueListType):
+            if not any(isinstance(v, ExtensionMarker) for v in builtin.named_values):
+                values = sorted(int(v.value) for v in builtin.named_values if isinstance(v, NamedValue))
+                values_name = self.module.constant('_VALUES', 'frozenset([%s])' % ', '.join(map(str, values)))
+                conditions.append('%s not in %s' % (expression, values_name))
+        elif builtin.type_name == 'BIT STRING':
+            conditions += self.size_conditions(constraints, 'len(%s[0]) * 8 - %s[1]' % (expression, expression))
+        elif builtin.type_name in _SIZED_TYPES:
+            conditions += self.size_conditions(constraints, 'len(%s)' % expression)
+
+        alphabet = _ALPHABETS.get(builtin.type_name)
+        if alphabet == 'ascii':
+            conditions.append('not %s.isascii()' % expression)
+        elif alphabet:
+            conditions.append('%s.translate(%s)' % (expression, self.runtime_name(alphabet)))
+
+        return conditions
+
+    def reference_conditions(self, t, expression, module=None):
+        """ Like ``invalid_conditions``, for the reference ``t``, also for
+        the size constraints of collections, which references can add to.
+        """
+        module = module or self.sema_module
+        _, builtin = self.resolved_type(t, module)
+        if isinstance(builtin, CollectionType):
+            return self.size_conditions(module.effective_constraints(t, self.referenced_modules),
+                                        'len(%s)' % expression)
+
+        return self.invalid_conditions(t, expression, module)
+
+    def value_conditions(self, constraints, expression):
+        conditions = []
+        for c in constraints:
+            if not isinstance(c, SizeConstraint):
+                conditions += _range_conditions(_bounds(c), expression)
+
+        return conditions
+
+    def size_conditions(self, constraints, expression):
+        conditions = []
+        for c in constraints:
+            if isinstance(c, SizeConstraint):
+                conditions += _range_conditions(_bounds(c.nested), expression)
+
+        return conditions
+
+    def needs_check(self, t, module=None, seen=frozenset()):
+        """ Return True if values of the type ``t`` have constraints to
+        check, in them or their components. References in ``t`` are
+        resolved in ``module``.
+        """
+        module = module or self.sema_module
+        if isinstance(t, TaggedType):
+            return self.needs_check(t.type_decl, module, seen)
+        elif isinstance(t, ReferencedType):
+            if self.reference_conditions(t, 'value', module):
+                return True  # Constraints on the reference itself
+            defining_module, type_decl = self.referenced_type(t, module, frozenset())
+            if id(type_decl) in seen:
+                return False
+            return self.needs_check(type_decl, defining_module, seen | set([id(type_decl)]))
+        elif isinstance(t, ConstructedType):
+            return any(self.needs_check(c.type_decl, module, seen)
+                       for c in module.resolve_components(t, self.referenced_modules)
+                       if not isinstance(c, ExtensionMarker))
+        elif isinstance(t, CollectionType):
+            return (bool(self.size_conditions(module.effective_constraints(t, self.referenced_modules), 'len(value)'))
+                    or self.needs_check(t.type_decl, module, seen))
+
+        return bool(self.invalid_conditions(t, 'value', module))
+
+
+def generate_validators(sema_module, out_stream, referenced_modules):
+    return generate_codec(sema_module, out_stream, referenced_modules, [ValidatorBackend])
+
+
+def _range_conditions(bounds, expression):
+    """ Return conditions for ``expression`` to be outside ``bounds``, a
+    (lower, upper) tuple with None for no bound.
+    """
+    lower, upper = bounds
+    if lower is not None and lower == upper:
+        return ['%s != %d' % (expression, lower)]
+    elif lower is not None and upper is not None:
+        return ['not %d <= %s <= %d' % (lower, expression, upper)]
+    elif lower is not None:
+        return ['%s < %d' % (expression, lower)]
+    elif upper is not None:
+        return ['%s > %d' % (expression, upper)]
+
+    return []
+
+
+# Types whose values have a size in octets or characters.
+_SIZED_TYPES = set([
+    'OCTET STRING', 'UTF8String', 'GeneralString', 'NumericString', 'PrintableString', 'IA5String',
+    'GraphicString', 'ObjectDescriptor', 'VisibleString', 'TeletexString', 'UniversalString', 'BMPString',
+    'T61String', 'VideotexString',
+])
+
+# Checks of the alphabets of restricted character string types, as
+# str.translate tables in asn1ate.support.ber.
+_ALPHABETS = {
+    'NumericString': 'NUMERIC_STRING_ALPHABET',
+    'PrintableString': 'PRINTABLE_STRING_ALPHABET',
+    'IA5String': 'ascii',
+    'VisibleString': 'VISIBLE_STRING_ALPHABET',
+}
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.validgen',
+                         'Generate validators of constraints from an ASN.1 definition file.',
+                         generate_validators,
+                         [],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
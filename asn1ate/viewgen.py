@@ -0,0 +1,320 @@
+# Copyright (c) 2013-2018, Schneider Electric Buildings AB
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of Schneider Electric Buildings AB nor the
+#       names of contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import sys
+from asn1ate import codecgen
+from asn1ate.support import ber, pygen
+from asn1ate.sema import *
+from asn1ate.pyasn1gen import _sanitize_identifier
+from asn1ate.berdecgen import BerDecoderBackend, _READ_NEXT
+from asn1ate.codecgen import generate_codec
+
+
+class ViewBackend(BerDecoderBackend):
+    """ Backend to generate lazy views of BER values, which only decode
+    the components that are accessed. Every SEQUENCE and SET type gets a
+    subclass of ``ber.View``, e.g.
+
+        # Seq ::= SEQUENCE {
+        #     foo [0] INTEGER,
+        #     bar [1] Other OPTIONAL
+        # }
+        class SeqView(View):
+            __slots__ = ()
+            _names = ('foo', 'bar')
+
+            def _scan(self):
+                data, offset, end = self._data, self._offset, self._end
+                fields = [None] * 2
+                key, constructed, start, stop, offset = read_tlv(data, offset, end)
+                if key == 2:  # [0]
+                    fields[0] = key, constructed, start, stop
+                    ...
+
+            @property
+            def foo(self):
+                field = (self._fields or self._scan())[0]
+                return decode_integer(self._data, *field)
+
+    ``_scan`` matches components against tag keys like the BER decoders,
+    but only reads their identifier and length octets. Properties decode
+    their component from the position found, with the contents decoder of
+    its type. Absent OPTIONAL components are None, and absent DEFAULT
+    components have their default value if it's numeric or boolean.
+    Other types are decoded by functions like those of the BER decoders,
+    except that SEQUENCE and SET values in them, e.g. in CHOICEs or
+    SEQUENCE OFs, are views too.
+
+    Views are generated along with the BER decoders. Views of type
+    assignments are public, as ``<Type>View``, and ``view_<Type>(data,
+    offset=0)`` returns a view of the value at ``offset`` in ``data`` and
+    the offset after it. ``VIEWS`` maps type names to these functions,
+    and types named in ``records`` also get ``iter_<Type>_views(data,
+    offset=0)``, which yields views of concatenated values.
+    """
+
+    prefix = '_v_'
+    registry_name = 'VIEWS'
+
+    def __init__(self, sema_module, module, referenced_modules, records=()):
+        super(ViewBackend, self).__init__(sema_module, module, referenced_modules, records)
+        self.generators[SequenceType] = self.view_sequence_type
+        self.generators[SetType] = self.view_set_type
+
+    def generate_public_function(self, assignment, python_name):
+        public_name = 'view_' + python_name
+        keys = self.tag_keys(assignment.type_decl)
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('def %s(data, offset=0):' % public_name)
+        fragment.push_indent()
+        fragment.write_line('return decode(_v_%s, %s, data, offset)' % (python_name, self.key_set(keys)))
+        fragment.pop_indent()
+
+        if assignment.type_name in self.records:
+            fragment.write_blanks(2)
+            fragment.write_line('def iter_%s_views(data, offset=0):' % python_name)
+            fragment.push_indent()
+            fragment.write_line('return %s(_v_%s, %s, data, offset)' % (self.runtime_name('iter_decode'), python_name,
+                                                                         self.key_set(keys)))
+            fragment.pop_indent()
+
+        return public_name, fragment
+
+    def generate(self, t, function_name=None):
+        # Type assignments without SEQUENCE or SET values in them decode
+        # the same with views, so they share the BER decoder.
+        if function_name is not None and not self.component_path and not self.has_views(t):
+            return BerDecoderBackend.prefix + self.assignment_name
+
+        return super(ViewBackend, self).generate(t, function_name)
+
+    def has_views(self, t, module=None, seen=frozenset()):
+        """ Return True if values of the type ``t`` have SEQUENCE or SET
+        values in them, which are decoded as views. References in ``t``
+        are resolved in ``module``.
+        """
+        module = module or self.sema_module
+        if isinstance(t, (SequenceType, SetType)):
+            return True
+        elif isinstance(t, TaggedType):
+            return self.has_views(t.type_decl, module, seen)
+        elif isinstance(t, ReferencedType):
+            defining_module, type_decl = self.referenced_type(t, module, frozenset())
+            if id(type_decl) in seen:
+                return False
+            return self.has_views(type_decl, defining_module, seen | set([id(type_decl)]))
+        elif isinstance(t, ChoiceType):
+            return any(self.has_views(c.type_decl, module, seen)
+                       for c in module.resolve_components(t, self.referenced_modules)
+                       if not isinstance(c, ExtensionMarker))
+        elif isinstance(t, CollectionType):
+            return self.has_views(t.type_decl, module, seen)
+
+        return False
+
+    def class_name(self):
+        """ Return a name for the view class of the type being generated,
+        public if it's the type of an assignment.
+        """
+        if not self.component_path:
+            return self.unique_name(self.assignment_name + 'View')
+
+        return self.function_name(None)
+
+    def view_sequence_type(self, t, function_name):
+        components = self.resolve_components(t)
+        fields = [c for c in components if not isinstance(c, ExtensionMarker)]
+
+        scan = self.start_scan(fields)
+        scan.write_line(_READ_NEXT)
+        self.runtime_name('read_tlv')
+
+        extensible = False
+        for index, c in enumerate(components):
+            if isinstance(c, ExtensionMarker):
+                extensible = True
+                continue
+
+            keys = self.tag_keys(c.type_decl)
+            if extensible:
+                # Skip unknown extensions ahead of the remaining components.
+                remaining_keys = self.union_keys(components[index:])
+                if remaining_keys is not None:
+                    scan.write_line('while key is not None and key not in %s:' % self.key_set(remaining_keys))
+                    scan.push_indent()
+                    scan.write_line(_READ_NEXT)
+                    scan.pop_indent()
+
+            comment = '  # %s' % ber.describe_tag(list(keys)[0]) if keys is not None and len(keys) == 1 else ''
+            scan.write_line('if %s:%s' % (self.key_test(keys), comment))
+            scan.push_indent()
+            scan.write_line('fields[%d] = key, constructed, start, stop' % fields.index(c))
+            scan.write_line(_READ_NEXT)
+            scan.pop_indent()
+            if not c.optional and c.default_value is None:
+                scan.write_line('else:')
+                scan.push_indent()
+                scan.write_line("raise DecodeError('Missing component %s of %s')" % (c.identifier,
+                                                                                    self.description()))
+                self.runtime_name('DecodeError')
+                scan.pop_indent()
+
+        if not extensible:
+            scan.write_line('if key is not None:')
+            scan.push_indent()
+            scan.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+            scan.pop_indent()
+
+        return self.generate_view_class(fields, scan)
+
+    def view_set_type(self, t, function_name):
+        components = self.resolve_components(t)
+        fields = [c for c in components if not isinstance(c, ExtensionMarker)]
+
+        entries = []
+        wildcard = None
+        for index, c in enumerate(fields):
+            keys = self.tag_keys(c.type_decl)
+            if keys is None:
+                wildcard = index
+                continue
+
+            for key in sorted(keys):
+                entries.append('%d: %d,  # %s' % (key, index, ber.describe_tag(key)))
+
+        table_name = self.unique_name('_%s_INDEXES' % '_'.join([self.assignment_name] + self.component_path))
+        table = pygen.PythonFragment()
+        if entries:
+            table.write_line('%s = {' % table_name)
+            table.push_indent()
+            for entry in entries:
+                table.write_line(entry)
+            table.pop_indent()
+            table.write_line('}')
+        else:
+            table.write_line('%s = {}' % table_name)
+        self.module.tables.append(table)
+
+        scan = self.start_scan(fields)
+        scan.write_line('while offset < end:')
+        scan.push_indent()
+        scan.write_line(_READ_NEXT)
+        self.runtime_name('read_tlv')
+        scan.write_line('try:')
+        scan.push_indent()
+        scan.write_line('index = %s[key]' % table_name)
+        scan.pop_indent()
+        scan.write_line('except KeyError:')
+        scan.push_indent()
+        if wildcard is not None:
+            scan.write_line('index = %d' % wildcard)
+        elif any(isinstance(c, ExtensionMarker) for c in components):
+            scan.write_line('continue  # Unknown extension')
+        else:
+            scan.write_line("raise unexpected_tag(key, '%s')" % self.description())
+            self.runtime_name('unexpected_tag')
+        scan.pop_indent()
+        scan.write_line('fields[index] = key, constructed, start, stop')
+        scan.pop_indent()
+
+        for index, c in enumerate(fields):
+            if not c.optional and c.default_value is None:
+                scan.write_line('if fields[%d] is None:' % index)
+                scan.push_indent()
+                scan.write_line("raise DecodeError('Missing component %s of %s')" % (c.identifier,
+                                                                                    self.description()))
+                self.runtime_name('DecodeError')
+                scan.pop_indent()
+
+        return self.generate_view_class(fields, scan)
+
+    def start_scan(self, fields):
+        """ Start the ``_scan`` method of a view with ``fields``. """
+        scan = pygen.PythonFragment()
+        scan.write_line('def _scan(self):')
+        scan.push_indent()
+        scan.write_line('data, offset, end = self._data, self._offset, self._end')
+        scan.write_line('fields = [None] * %d' % len(fields))
+        return scan
+
+    def generate_view_class(self, fields, scan):
+        """ Generate the view class of a SEQUENCE or SET with ``fields``,
+        with the ``_scan`` method ``scan``, and return its name.
+        """
+        class_name = self.class_name()
+        names = [_sanitize_identifier(c.identifier) for c in fields]
+
+        scan.write_line('self._fields = fields')
+        scan.write_line('return fields')
+        scan.pop_indent()
+
+        fragment = pygen.PythonFragment()
+        fragment.write_line('class %s(%s):' % (class_name, self.runtime_name('View')))
+        fragment.push_indent()
+        fragment.write_line('__slots__ = ()')
+        fragment.write_line('_names = %r' % (tuple(names),))
+        fragment.write_blanks(1)
+        fragment.write_block(scan)
+
+        for index, (c, name) in enumerate(zip(fields, names)):
+            decoder = self.generate_component(c.identifier, c.type_decl)
+            fragment.write_blanks(1)
+            fragment.write_line('@property')
+            fragment.write_line('def %s(self):' % name)
+            fragment.push_indent()
+            fragment.write_line('field = (self._fields or self._scan())[%d]' % index)
+            if c.optional or c.default_value is not None:
+                fragment.write_line('if field is None:')
+                fragment.push_indent()
+                fragment.write_line('return %s' % self.default_literal(c))
+                fragment.pop_indent()
+            fragment.write_line('return %s(self._data, *field)' % decoder)
+            fragment.pop_indent()
+
+        fragment.pop_indent()
+        self.module.functions.append(fragment)
+
+        return class_name
+
+
+def generate_views(sema_module, out_stream, referenced_modules, records=()):
+    return generate_codec(sema_module, out_stream, referenced_modules, [BerDecoderBackend, ViewBackend],
+                          records=records)
+
+
+# Simplistic command-line driver
+def main(argv=None):
+    return codecgen.main('python -m asn1ate.viewgen',
+                         'Generate BER decoders and lazy views of values from an ASN.1 definition file.',
+                         generate_views,
+                         [codecgen.RECORDS_ARG],
+                         argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
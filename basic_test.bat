@@ -8,11 +8,137 @@ REM 2) The end result is valid Python
 REM Note that it does not say anything about correctness or
 REM completeness of the generated code.
 
+SET PYTHONPATH=%CD%
 FOR %%t IN (testdata\*.asn) DO (
   @ECHO Checking %%t
   RD /s /q _testdir
   MD _testdir
-  python asn1ate\test.py --outdir=_testdir %%t
+  REM Pick up an open type map next to the ASN.1 file, if any
+  IF EXIST %%~dpnt.json (
+    python asn1ate\test.py --outdir=_testdir --open-types=%%~dpnt.json %%t
+  ) ELSE (
+    python asn1ate\test.py --outdir=_testdir %%t
+  )
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  REM Same for the generated BER decoders, DER encoders, UPER codecs, batch
+  REM decoders, views, validators, records and maximum sizes
+  python asn1ate\test.py --berdec --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --berdec --derenc --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --uper --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --columns --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --views --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  REM Check values the validators must reject, listed next to the ASN.1
+  REM file, if any
+  IF EXIST %%~dpnt.invalid.json (
+    python asn1ate\test.py --berdec --validators --outdir=_testdir --invalid=%%~dpnt.invalid.json %%t
+  ) ELSE (
+    python asn1ate\test.py --berdec --validators --outdir=_testdir %%t
+  )
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --record-classes --berdec --derenc --outdir=_testdir %%t
+  IF %ERRORLEVEL% NEQ 0 (
+     EXIT /B %ERRORLEVEL%
+  )
+
+  FOR %%m IN (_testdir\*.py) DO (
+    python %%m
+    IF %ERRORLEVEL% NEQ 0 (
+       EXIT /B %ERRORLEVEL%
+    )
+  )
+
+  RD /s /q _testdir
+  MD _testdir
+  python asn1ate\test.py --sizes --outdir=_testdir %%t
   IF %ERRORLEVEL% NEQ 0 (
      EXIT /B %ERRORLEVEL%
   )
@@ -16,10 +16,79 @@ do
     echo "Checking $f";
     rm -rf _testdir/
     mkdir -p _testdir/
-    python asn1ate/test.py --outdir=_testdir $f
+    # Pick up an open type map next to the ASN.1 file, if any
+    if [ -f "${f%.asn}.json" ]; then
+        python asn1ate/test.py --outdir=_testdir --open-types="${f%.asn}.json" $f
+    else
+        python asn1ate/test.py --outdir=_testdir $f
+    fi
     # Run python over _testdir/*.py
     for m in _testdir/*.py;
     do
         python $m
     done
+    # Same for the generated BER decoders, DER encoders, UPER codecs, batch
+    # decoders, views, validators, records and maximum sizes
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --berdec --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --berdec --derenc --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --uper --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --columns --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --views --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    # Check values the validators must reject, listed next to the ASN.1
+    # file, if any
+    if [ -f "${f%.asn}.invalid.json" ]; then
+        python asn1ate/test.py --berdec --validators --outdir=_testdir --invalid="${f%.asn}.invalid.json" $f
+    else
+        python asn1ate/test.py --berdec --validators --outdir=_testdir $f
+    fi
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --record-classes --berdec --derenc --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
+    rm -rf _testdir/
+    mkdir -p _testdir/
+    python asn1ate/test.py --sizes --outdir=_testdir $f
+    for m in _testdir/*.py;
+    do
+        python $m
+    done
 done